@@ -0,0 +1,316 @@
+"""
+Micro-benchmarks for the rfc5424 logging handler.
+
+Measures the throughput and latency of building messages and of logging them over
+the different transports to local stand-in syslog collectors.
+
+Usage::
+
+    python benchmarks/bench.py
+    python benchmarks/bench.py --records 20000 --workload plain --workload heavy_sd --target udp
+    python benchmarks/bench.py --json results.json
+
+Compare the output of two runs to catch performance regressions. The numbers are
+only comparable between runs on the same machine.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from rfc5424logging import Rfc5424SysLogHandler, Rfc5424SysLogAdapter  # noqa: E402
+
+ENTERPRISE_ID = 32473
+
+
+class Workload(object):
+    """
+    A kind of log call that is benchmarked.
+    """
+
+    def __init__(self, name, message, handler_kwargs=None, log_kwargs=None, adapter=False):
+        self.name = name
+        self.message = message
+        self.handler_kwargs = handler_kwargs or {}
+        self.log_kwargs = log_kwargs or {}
+        self.adapter = adapter
+
+    def log_function(self, logger):
+        if self.adapter:
+            adapter = Rfc5424SysLogAdapter(logger, {'msgid': 'bench'})
+            return lambda: adapter.info(self.message, **self.log_kwargs)
+        return lambda: logger.info(self.message, **self.log_kwargs)
+
+
+def heavy_structured_data():
+    return {
+        'request@%d' % ENTERPRISE_ID: OrderedDict(
+            ('param%d' % i, 'value with "quotes" and ]brackets[ %d' % i) for i in range(15)
+        ),
+        'origin': {'ip': '10.0.0.1', 'software': 'bench'},
+    }
+
+
+WORKLOADS = OrderedDict((workload.name, workload) for workload in [
+    Workload('plain', 'This is an interesting message'),
+    Workload(
+        'heavy_sd', 'This is an interesting message',
+        handler_kwargs={'structured_data': {'static': {'region': 'eu-west-1', 'cluster': 'c1', 'build': '1234'}},
+                        'enterprise_id': ENTERPRISE_ID},
+        log_kwargs={'extra': {'msgid': 'request', 'structured_data': heavy_structured_data()}},
+    ),
+    Workload('unicode', u'This is a ℛℯα∂α♭ℓℯ message Δ' * 4),
+    Workload('utc', 'This is an interesting message', handler_kwargs={'utc_timestamp': True}),
+    Workload(
+        'adapter', 'This is an interesting message', adapter=True,
+        handler_kwargs={'enterprise_id': ENTERPRISE_ID},
+        log_kwargs={'structured_data': {'sd_id': {'key': 'value'}}, 'procid': 'worker-1'},
+    ),
+])
+
+
+class Collector(object):
+    """
+    A local stand-in syslog server that reads and discards everything it receives.
+    """
+
+    def __init__(self, kind, tempdir, certfile=None):
+        self.kind = kind
+        self.certfile = certfile
+        self.received = 0
+        self._stopped = False
+        self._threads = []
+        if kind == 'udp':
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            self.sock.bind(('127.0.0.1', 0))
+            self.address = self.sock.getsockname()
+            self._start(self._read, self.sock)
+        elif kind == 'unix':
+            self.address = os.path.join(tempdir, 'syslog.sock')
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            self.sock.bind(self.address)
+            self._start(self._read, self.sock)
+        else:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.bind(('127.0.0.1', 0))
+            self.sock.listen(5)
+            self.address = self.sock.getsockname()
+            self.ssl_context = None
+            if kind == 'tls':
+                self.ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+                self.ssl_context.load_cert_chain(certfile)
+            self._start(self._accept)
+
+    def _start(self, target, *args):
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def _accept(self):
+        while not self._stopped:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            if self.ssl_context is not None:
+                try:
+                    conn = self.ssl_context.wrap_socket(conn, server_side=True)
+                except (OSError, ssl.SSLError):
+                    continue
+            self._start(self._read, conn)
+
+    def _read(self, sock):
+        while not self._stopped:
+            try:
+                data = sock.recv(1024 * 1024)
+            except OSError:
+                return
+            if not data and sock.type == socket.SOCK_STREAM:
+                return
+            self.received += len(data)
+
+    def handler_kwargs(self):
+        if self.kind in ('udp', 'unix'):
+            return {'address': self.address}
+        kwargs = {'address': self.address, 'socktype': socket.SOCK_STREAM}
+        if self.kind == 'tls':
+            kwargs.update({'tls_enable': True, 'tls_ca_bundle': self.certfile})
+        return kwargs
+
+    def close(self):
+        self._stopped = True
+        self.sock.close()
+
+
+def create_certificate(tempdir):
+    """
+    Creates a self-signed certificate for the TLS collector with the openssl command line tool.
+    """
+    if shutil.which('openssl') is None:
+        return None
+    certfile = os.path.join(tempdir, 'collector.pem')
+    try:
+        subprocess.check_call(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+             '-addext', 'subjectAltName=IP:127.0.0.1', '-keyout', certfile, '-out', certfile],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return certfile
+
+
+class NullTransport(object):
+    def transmit(self, syslog_msg):
+        pass
+
+    def transmit_many(self, syslog_msgs):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_benchmark(workload, handler, records, measure_build):
+    logger = logging.getLogger('bench.%s' % workload.name)
+    logger.handlers = []
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    log = workload.log_function(logger)
+
+    if measure_build:
+        # Only measure building the message of an already created record
+        record_logger = logging.getLogger('bench.records')
+        record_logger.propagate = False
+        if workload.adapter:
+            # The record the adapter would create, with the fields it takes from the keyword arguments
+            adapter = Rfc5424SysLogAdapter(record_logger, {'msgid': 'bench'})
+            _, kwargs = adapter.process(workload.message, dict(workload.log_kwargs))
+            extra = dict(kwargs['extra'])
+        else:
+            extra = dict(workload.log_kwargs.get('extra', {}))
+        record = record_logger.makeRecord(
+            record_logger.name, logging.INFO, __file__, 0, workload.message, (), None, extra=extra
+        )
+        log = lambda: handler.build_msg(record)  # noqa: E731
+
+    # Warm up caches
+    for _ in range(min(1000, records)):
+        log()
+
+    latencies = []
+    timer = time.perf_counter
+    start = timer()
+    for _ in range(records):
+        before = timer()
+        log()
+        latencies.append(timer() - before)
+    handler.flush()
+    elapsed = timer() - start
+
+    # Allocations are measured in a separate, smaller run because tracing slows everything down.
+    # tracemalloc.reset_peak() needs Python 3.9.
+    allocation_records = min(records, 2000)
+    alloc_per_record = float('nan')
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.start()
+        peak_total = 0
+        for _ in range(allocation_records):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            log()
+            _, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - current
+        tracemalloc.stop()
+        alloc_per_record = peak_total / float(allocation_records)
+
+    logger.removeHandler(handler)
+    latencies.sort()
+    return OrderedDict([
+        ('records_per_second', records / elapsed),
+        ('p50_us', percentile(latencies, 0.50) * 1e6),
+        ('p99_us', percentile(latencies, 0.99) * 1e6),
+        ('alloc_bytes_per_record', alloc_per_record),
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=10000, help='Number of records per benchmark')
+    parser.add_argument('--workload', action='append', choices=list(WORKLOADS),
+                        help='Workloads to run (default: all)')
+    parser.add_argument('--target', action='append', choices=['build', 'udp', 'tcp', 'tls', 'unix'],
+                        help='What to measure: only building the message or logging over a transport '
+                             '(default: all)')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    workloads = [WORKLOADS[name] for name in (args.workload or WORKLOADS)]
+    targets = args.target or ['build', 'udp', 'tcp', 'tls', 'unix']
+    tempdir = tempfile.mkdtemp()
+    certfile = create_certificate(tempdir) if 'tls' in targets else None
+
+    results = []
+    header = '%-10s %-6s %14s %10s %10s %14s' % ('workload', 'target', 'records/s', 'p50 us', 'p99 us', 'alloc B/rec')
+    print(header)
+    print('-' * len(header))
+    try:
+        for target in targets:
+            if target == 'tls' and certfile is None:
+                print('Skipping TLS, the openssl command is needed to create a certificate')
+                continue
+            if target == 'unix' and not hasattr(socket, 'AF_UNIX'):
+                continue
+            collector = None if target == 'build' else Collector(target, tempdir, certfile)
+            for workload in workloads:
+                kwargs = dict(workload.handler_kwargs)
+                if collector is None:
+                    kwargs['address'] = ('127.0.0.1', 514)
+                else:
+                    kwargs.update(collector.handler_kwargs())
+                handler = Rfc5424SysLogHandler(**kwargs)
+                if collector is None:
+                    handler.transport.close()
+                    handler.transport = NullTransport()
+                result = run_benchmark(workload, handler, args.records, measure_build=collector is None)
+                handler.close()
+                print('%-10s %-6s %14.0f %10.1f %10.1f %14.0f' % (
+                    (workload.name, target) + tuple(result.values())))
+                result.update([('workload', workload.name), ('target', target)])
+                results.append(result)
+            if collector is not None:
+                collector.close()
+    finally:
+        shutil.rmtree(tempdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
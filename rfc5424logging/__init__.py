@@ -1,3 +1,5 @@
+import sys
+
 from .adapter import Rfc5424SysLogAdapter, EMERGENCY, ALERT, NOTICE
 from .handler import (
     Rfc5424SysLogHandler,
@@ -23,19 +25,51 @@ from .handler import (
     LOG_LOCAL6,
     LOG_LOCAL7,
 )
-from .transport import FRAMING_NON_TRANSPARENT, FRAMING_OCTET_COUNTING
+from .context import ContextStructuredData
+from .filters import RateLimitFilter, SamplingFilter, StructuredDataFilter
+from .lazy import LazyValue
+from .queues import Rfc5424QueueHandler, Rfc5424QueueListener
+from .spool import FSYNC_NEVER, FSYNC_SEGMENT, FSYNC_ALWAYS
+from .transport import (
+    FRAMING_NON_TRANSPARENT,
+    FRAMING_OCTET_COUNTING,
+    BALANCE_ROUND_ROBIN,
+    BALANCE_LEAST_BYTES,
+    BALANCE_FAILOVER,
+)
+from .writer import OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_BELOW_LEVEL
+
+if sys.version_info >= (3, 7):
+    from .aio import AsyncRfc5424SysLogHandler  # noqa: F401
 
 __version__ = "1.4.3"
 
 __all__ = [
     'Rfc5424SysLogHandler',
     'Rfc5424SysLogAdapter',
+    'Rfc5424QueueHandler',
+    'Rfc5424QueueListener',
+    'LazyValue',
+    'ContextStructuredData',
+    'RateLimitFilter',
+    'SamplingFilter',
+    'StructuredDataFilter',
     'EMERGENCY',
     'ALERT',
     'NOTICE',
     'NILVALUE',
     'FRAMING_NON_TRANSPARENT',
     'FRAMING_OCTET_COUNTING',
+    'BALANCE_ROUND_ROBIN',
+    'BALANCE_LEAST_BYTES',
+    'BALANCE_FAILOVER',
+    'OVERFLOW_BLOCK',
+    'OVERFLOW_DROP_NEWEST',
+    'OVERFLOW_DROP_OLDEST',
+    'OVERFLOW_DROP_BELOW_LEVEL',
+    'FSYNC_NEVER',
+    'FSYNC_SEGMENT',
+    'FSYNC_ALWAYS',
     'LOG_KERN',
     'LOG_USER',
     'LOG_MAIL',
@@ -57,3 +91,6 @@ __all__ = [
     'LOG_LOCAL6',
     'LOG_LOCAL7',
 ]
+
+if sys.version_info >= (3, 7):
+    __all__.append('AsyncRfc5424SysLogHandler')
@@ -2,6 +2,9 @@ import logging
 from .handler import NOTICE, EMERGENCY, ALERT
 from logging import CRITICAL, ERROR, WARNING, INFO, DEBUG
 
+# Keyword arguments that override a field of the message
+OVERRIDE_KEYS = ('hostname', 'appname', 'procid', 'msgid')
+
 
 class Rfc5424SysLogAdapter(logging.LoggerAdapter):
     _extra_levels_enabled = False
@@ -53,30 +56,45 @@ class Rfc5424SysLogAdapter(logging.LoggerAdapter):
 
         We don't touch other keyword arguments so we don't interfere with possible
         other logger adapters
-        """
-        hostname = kwargs.pop('hostname', None)
-        appname = kwargs.pop('appname', None)
-        procid = kwargs.pop('procid', None)
-        msgid = kwargs.pop('msgid', None)
-        structured_data = kwargs.pop('sd', None)
-
-        if structured_data is None:
-            structured_data = kwargs.pop('structured_data', None)
 
-        extra = self.extra.copy()
-        extra.update(kwargs.get('extra', {}))
-        kwargs['extra'] = extra
+        Without any of those keyword arguments, the ``extra`` dictionary of the adapter is
+        passed as is. It's only read when creating the record, so it doesn't need to be copied.
+        """
+        if not kwargs:
+            kwargs['extra'] = self.extra
+            return msg, kwargs
+
+        overrides = None
+        for key in OVERRIDE_KEYS:
+            value = kwargs.pop(key, None)
+            if value:
+                if overrides is None:
+                    overrides = {}
+                overrides[key] = value
 
-        if hostname:
-            kwargs['extra']['hostname'] = hostname
-        if appname:
-            kwargs['extra']['appname'] = appname
-        if procid:
-            kwargs['extra']['procid'] = procid
-        if msgid:
-            kwargs['extra']['msgid'] = msgid
+        structured_data = kwargs.pop('sd', None)
+        if 'structured_data' in kwargs:
+            structured_data_kwarg = kwargs.pop('structured_data')
+            if structured_data is None:
+                structured_data = structured_data_kwarg
         if structured_data:
-            kwargs['extra']['structured_data'] = structured_data
+            if overrides is None:
+                overrides = {}
+            overrides['structured_data'] = structured_data
+
+        caller_extra = kwargs.get('extra')
+        if not caller_extra and overrides is None:
+            kwargs['extra'] = self.extra
+            return msg, kwargs
+
+        # A new dictionary with the later layers taking precedence. Cheaper than a ChainMap
+        # since the logger iterates over all keys when creating the record.
+        extra = dict(self.extra)
+        if caller_extra:
+            extra.update(caller_extra)
+        if overrides is not None:
+            extra.update(overrides)
+        kwargs['extra'] = extra
 
         return msg, kwargs
 
@@ -88,7 +106,10 @@ class Rfc5424SysLogAdapter(logging.LoggerAdapter):
                 level = logging.CRITICAL
             elif level == NOTICE:
                 level = logging.WARNING
-        super(Rfc5424SysLogAdapter, self).log(level, msg, *args, **kwargs)
+        # Python 2 doesn't check the level before processing the keyword arguments
+        if self.isEnabledFor(level):
+            msg, kwargs = self.process(msg, kwargs)
+            self.logger.log(level, msg, *args, **kwargs)
 
     def emergency(self, msg=None, *args, **kwargs):
         self.log(EMERGENCY, msg, *args, **kwargs)
@@ -0,0 +1,301 @@
+import asyncio
+import logging
+import socket
+from collections import deque
+
+from rfc5424logging import transport
+from rfc5424logging.handler import Rfc5424SysLogHandler, is_address_list
+from rfc5424logging.stats import timer
+from rfc5424logging.writer import print_error
+
+
+class AsyncStreamTransport:
+    """
+    Sends framed messages over a TCP or TLS connection using asyncio streams.
+    """
+
+    def __init__(self, address, timeout, framing, ssl_context=None):
+        self.address = address
+        self.timeout = timeout
+        self.framing = framing
+        self.ssl_context = ssl_context
+        self.writer = None
+
+    async def connect(self):
+        host, port = self.address
+        return await asyncio.open_connection(
+            host, port, ssl=self.ssl_context, server_hostname=host if self.ssl_context else None
+        )
+
+    async def open(self):
+        _, self.writer = await asyncio.wait_for(self.connect(), self.timeout)
+
+    def frame(self, syslog_msg):
+        return transport.frame_message(syslog_msg, self.framing)
+
+    async def transmit_many(self, syslog_msgs):
+        if self.writer is None:
+            await self.open()
+        self.writer.write(b"".join([self.frame(syslog_msg) for syslog_msg in syslog_msgs]))
+        # Waits while the server doesn't keep up
+        await self.writer.drain()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class AsyncUnixStreamTransport(AsyncStreamTransport):
+    """
+    Sends messages over a Unix stream socket. Like ``UnixSocketTransport``, messages are not framed.
+    """
+
+    def __init__(self, address, timeout):
+        super().__init__(address, timeout, framing=None)
+
+    async def connect(self):
+        return await asyncio.open_unix_connection(self.address)
+
+    def frame(self, syslog_msg):
+        return syslog_msg
+
+
+class AsyncDatagramTransport:
+    """
+    Sends messages as UDP datagrams or over a Unix datagram socket.
+    """
+
+    def __init__(self, address, timeout):
+        self.address = address
+        self.timeout = timeout
+        self.transport = None
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        if isinstance(self.address, str):
+            endpoint = loop.create_datagram_endpoint(
+                asyncio.DatagramProtocol, remote_addr=self.address, family=socket.AF_UNIX
+            )
+        else:
+            endpoint = loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=tuple(self.address))
+        self.transport, _ = await asyncio.wait_for(endpoint, self.timeout)
+
+    async def transmit_many(self, syslog_msgs):
+        if self.transport is None:
+            await self.open()
+        for syslog_msg in syslog_msgs:
+            self.transport.sendto(syslog_msg)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+
+class AsyncRfc5424SysLogHandler(Rfc5424SysLogHandler):
+    """
+    A handler class which sends RFC 5424 formatted logging records to a syslog server
+    from an asyncio event loop.
+
+    Messages are built by the thread that logs them and put in a buffer. A task running in the
+    event loop sends the buffered messages, so logging never blocks the event loop. Records can
+    be logged from the event loop as well as from other threads.
+    """
+
+    def __init__(self, *args, loop=None, buffer_size=10000, batch_size=100, retry_interval=1, **kwargs):
+        """
+        Takes the same arguments as ``Rfc5424SysLogHandler``, except for ``stream`` and the ``queue_*``,
+        ``udp_*`` and ``spool_*`` arguments, and also:
+
+        Args:
+            loop (asyncio.AbstractEventLoop):
+                The event loop that sends the messages. Defaults to the loop running when the first
+                record is logged.
+            buffer_size (int):
+                The maximum number of messages waiting to be sent. When the buffer is full,
+                new messages are dropped.
+            batch_size (int):
+                The maximum number of messages that are written together.
+            retry_interval (float):
+                The number of seconds to wait before reconnecting after a failure.
+        """
+        for name in ('stream', 'queue_size', 'udp_batch_count', 'udp_connect', 'spool_directory'):
+            if kwargs.get(name):
+                raise ValueError("%s is not supported by the asyncio handler" % name)
+
+        self.loop = loop
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self.dropped = 0
+        self._buffer = deque()
+        self._sending = False
+        self._task = None
+        self._wakeup = None
+        self._idle = None
+        super().__init__(*args, **kwargs)
+
+    def _setup_transport(self):
+        if is_address_list(self.address):
+            raise ValueError("Multiple addresses are not supported by the asyncio handler")
+        if isinstance(self.address, str):
+            if self.socktype == socket.SOCK_STREAM:
+                self.transport = AsyncUnixStreamTransport(self.address, self.timeout)
+            else:
+                self.transport = AsyncDatagramTransport(self.address, self.timeout)
+        elif isinstance(self.address, (tuple, list)):
+            if self.socktype == socket.SOCK_STREAM:
+                ssl_context = None
+                if self.tls_enable:
+                    ssl_context = transport.build_ssl_context(
+                        self.tls_ca_bundle, self.tls_verify,
+                        self.tls_client_cert, self.tls_client_key, self.tls_key_password
+                    )
+                self.transport = AsyncStreamTransport(self.address, self.timeout, self.framing, ssl_context)
+            else:
+                self.transport = AsyncDatagramTransport(self.address, self.timeout)
+        else:
+            raise ValueError("Unsupported address type")
+
+    def _in_loop(self):
+        """
+        Returns whether the current thread runs the event loop of the handler.
+        """
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if self.loop is None:
+            if running_loop is None:
+                raise RuntimeError("No event loop to send the message from. "
+                                   "Pass one to the handler with the loop argument.")
+            self.loop = running_loop
+        return running_loop is self.loop
+
+    def _enqueue(self, syslog_msg):
+        # Only called from within the event loop
+        if len(self._buffer) >= self.buffer_size:
+            self.dropped += 1
+            return
+        self._buffer.append(syslog_msg)
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._idle = asyncio.Event()
+            self._task = self.loop.create_task(self._run())
+        self._idle.clear()
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._buffer:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            start = timer()
+            try:
+                await self.transport.transmit_many(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._stats.record_send_error()
+                print_error()
+                self.transport.close()
+                # Retry the batch after reconnecting
+                self._buffer.extendleft(reversed(batch))
+                while len(self._buffer) > self.buffer_size:
+                    self._buffer.pop()
+                    self.dropped += 1
+                await asyncio.sleep(self.retry_interval)
+            else:
+                self._stats.record_transmit(timer() - start)
+
+    def emit(self, record):
+        """
+        Emit a record.
+
+        The record is formatted and put in the buffer of messages to send.
+        """
+        start = timer()
+        try:
+            syslog_msg = self.build_msg(record)
+        except Exception:
+            self._stats.record_build_error()
+            self.handleError(record)
+            return
+        self._stats.record_build(timer() - start, len(syslog_msg))
+
+        try:
+            if self._in_loop():
+                self._enqueue(syslog_msg)
+            else:
+                self.loop.call_soon_threadsafe(self._enqueue, syslog_msg)
+        except Exception:
+            self.handleError(record)
+
+    def emit_many(self, records):
+        for record in records:
+            self.emit(record)
+
+    async def drain(self):
+        """
+        Waits until all buffered messages are sent.
+        """
+        # Messages logged from other threads reach the buffer through call_soon_threadsafe(),
+        # one round-trip through the event loop runs the callbacks that were scheduled so far
+        await asyncio.sleep(0)
+        if self._idle is not None:
+            await self._idle.wait()
+
+    def stats(self):
+        stats = super().stats()
+        stats['dropped'] = self.dropped
+        return stats
+
+    def flush(self):
+        """
+        Does nothing, blocking until the buffered messages are sent would block the event loop.
+        Use ``drain()`` from within the event loop instead.
+        """
+
+    def _stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.transport.close()
+
+    async def aclose(self, timeout=10):
+        """
+        Sends the buffered messages and closes the connection.
+
+        Messages that weren't sent after ``timeout`` seconds, for example because the server
+        is down, are dropped. Pass ``None`` to wait without limit.
+        """
+        try:
+            await asyncio.wait_for(self.drain(), timeout)
+        except asyncio.TimeoutError:
+            self.dropped += len(self._buffer)
+            self._buffer.clear()
+        self.close()
+
+    def close(self):
+        """
+        Closes the connection. Messages that are still buffered are dropped, use ``aclose()``
+        to send them first.
+        """
+        self.acquire()
+        try:
+            if self._stats_timer is not None:
+                self._stats_timer.stop()
+                self._stats_timer = None
+            if self.loop is not None and not self.loop.is_closed():
+                if self._in_loop():
+                    self._stop()
+                else:
+                    self.loop.call_soon_threadsafe(self._stop)
+            logging.Handler.close(self)
+        finally:
+            self.release()
@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+
+from rfc5424logging import encoding
+
+try:
+    import contextvars
+except ImportError:  # pragma: no cover
+    contextvars = None
+
+
+class EncodedStructuredData(object):
+    """
+    Structured data that was encoded when it was set on a ``ContextStructuredData``.
+    """
+    __slots__ = ('elements', 'joined', 'ids')
+
+    def __init__(self, elements):
+        # (SD-ID, encoded SD-ELEMENT) tuples like the compiled structured data of the handler
+        self.elements = elements
+        self.joined = b''.join(element for _, element in elements)
+        self.ids = frozenset(sd_id for sd_id, _ in elements)
+
+
+class ContextStructuredData(object):
+    """
+    Structured data for everything that is logged in the current context, backed by a context variable.
+
+    Set it at the start of a request and every message built in that thread or asyncio task contains it.
+    The structured data is encoded once when it is set, so lazy values are computed then as well.
+    Pass the provider to the ``structured_data_providers`` of the handler.
+
+    Context variables are never garbage collected, so create providers once, at module level.
+
+    Example:
+
+        >>> request_sd = ContextStructuredData('request', enterprise_id=32473)
+        >>> handler = Rfc5424SysLogHandler(structured_data_providers=[request_sd])
+        >>> with request_sd.using({'request': {'id': request_id, 'client': client_ip}}):
+        ...     handle(request)
+    """
+
+    def __init__(self, name, enterprise_id=None):
+        """
+        Args:
+            name (str):
+                The name of the context variable.
+            enterprise_id (str):
+                The enterprise ID used for SD-IDs without one.
+        """
+        if contextvars is None:
+            raise RuntimeError("Context structured data needs Python 3.7 or newer")
+        self.enterprise_id = None if enterprise_id is None else str(enterprise_id)
+        self._var = contextvars.ContextVar('rfc5424logging.' + name, default=None)
+
+    def encode(self, structured_data):
+        """
+        Returns the ``EncodedStructuredData`` of a dictionary of SD-IDs and their SD-PARAMs.
+        """
+        enterprise_id = self.enterprise_id
+        if enterprise_id is not None:
+            enterprise_id = encoding.filter_printusascii(enterprise_id)
+        return EncodedStructuredData([
+            (sd_id, encoding.sd_element(sd_id, sd_params, enterprise_id))
+            for sd_id, sd_params in list(structured_data.items())
+        ])
+
+    def set(self, structured_data):
+        """
+        Encodes the structured data and sets it for the current context.
+
+        Returns a token for ``reset()``.
+        """
+        encoded = self.encode(structured_data) if structured_data else None
+        return self._var.set(encoded)
+
+    def reset(self, token):
+        """
+        Restores the structured data from before the ``set()`` that returned the token.
+        """
+        self._var.reset(token)
+
+    def get(self):
+        """
+        Returns the ``EncodedStructuredData`` of the current context or None.
+        """
+        return self._var.get()
+
+    @contextmanager
+    def using(self, structured_data):
+        """
+        Sets the structured data for the duration of a ``with`` block.
+        """
+        token = self.set(structured_data)
+        try:
+            yield
+        finally:
+            self.reset(token)
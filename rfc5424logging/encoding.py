@@ -0,0 +1,167 @@
+import sys
+
+from rfc5424logging import lazy
+from rfc5424logging.utils import LRUCache
+
+PY2 = sys.version_info[0] == 2
+
+if PY2:
+    TEXT_TYPES = (str, unicode)  # noqa: F821
+    INTEGER_TYPES = (int, long)  # noqa: F821
+else:
+    TEXT_TYPES = (str,)
+    INTEGER_TYPES = (int,)
+
+# As defined in RFC5424 Section 7
+REGISTERED_SD_IDs = ('timeQuality', 'origin', 'meta')
+
+# Bytes that are not PRINTUSASCII (%d33-126), used as deletion tables for bytes.translate()
+NON_PRINTUSASCII = bytes(bytearray(i for i in range(256) if not 33 <= i <= 126))
+# SD-NAME = 1*32PRINTUSASCII except '=', SP, ']', %d34 (")
+NON_SD_NAME = NON_PRINTUSASCII + b'=]"'
+
+# Maximum number of distinct SD-IDs and SD-PARAM names that are kept around.
+SD_NAME_CACHE_SIZE = 1024
+# Maximum number of encoded SD-PARAM values that are kept around and the
+# maximum length of the values that are cached.
+SD_VALUE_CACHE_SIZE = 4096
+SD_VALUE_CACHE_MAX_LENGTH = 256
+
+_sd_names = LRUCache(SD_NAME_CACHE_SIZE)
+_sd_values = LRUCache(SD_VALUE_CACHE_SIZE)
+
+
+def _delete(text, table):
+    if isinstance(text, bytes):
+        # Python 2 str
+        return text.translate(None, table)
+    # Characters outside of ASCII are never allowed, drop them while encoding
+    filtered = text.encode('ascii', 'ignore').translate(None, table)
+    if len(filtered) == len(text):
+        # Nothing was removed, return the string untouched
+        return text
+    return filtered.decode('ascii')
+
+
+def filter_printusascii(text):
+    """
+    Returns the string without the characters that are not PRINTUSASCII.
+    """
+    return _delete(text, NON_PRINTUSASCII)
+
+
+def sd_name(name):
+    """
+    Returns the name with only the characters allowed in an SD-NAME, the SD-ID
+    or the name of an SD-PARAM.
+
+    The result is cached, as the same names show up in almost every record.
+    """
+    cacheable = type(name) in TEXT_TYPES
+    if cacheable:
+        cleaned = _sd_names.get(name)
+        if cleaned is not None:
+            return cleaned
+    else:
+        name = str(name)
+
+    cleaned = _delete(name, NON_SD_NAME)
+    if cacheable:
+        _sd_names.set(name, cleaned)
+    return cleaned
+
+
+def _escape_text(text):
+    # Most values contain none of the characters, testing for them is a lot
+    # cheaper than replacing them.
+    if '\\' in text or '"' in text or ']' in text:
+        text = text.replace('\\', '\\\\').replace('"', '\\"').replace(']', '\\]')
+    return text.encode('utf-8', 'replace')
+
+
+def _escape_bytes(value):
+    # The escaped characters are ASCII, which never occur within a multi-byte
+    # UTF-8 sequence, so UTF-8 encoded bytes can be escaped as they are.
+    if b'\\' in value or b'"' in value or b']' in value:
+        value = value.replace(b'\\', b'\\\\').replace(b'"', b'\\"').replace(b']', b'\\]')
+    return value
+
+
+def sd_param_value(value):
+    """
+    Returns the escaped and UTF-8 encoded PARAM-VALUE of an SD-PARAM.
+
+    ``None`` is sent as an empty value, bytes are expected to be UTF-8 encoded
+    already and other objects are converted with ``str()``. Short strings are
+    cached, as structured data values tend to repeat across records.
+    """
+    value_type = type(value)
+    if value_type is bytes:
+        # On Python 2, this is also the str type
+        return _escape_bytes(value)
+    if value_type in TEXT_TYPES:
+        encoded = _sd_values.get(value)
+        if encoded is None:
+            encoded = _escape_text(value)
+            if len(value) <= SD_VALUE_CACHE_MAX_LENGTH:
+                _sd_values.set(value, encoded)
+        return encoded
+    if value is None:
+        return b''
+    if value_type is bool or value_type is float or value_type in INTEGER_TYPES:
+        # Never need escaping
+        return str(value).encode('ascii')
+    # Arbitrary objects might render differently over time, they are not cached
+    text = str(value)
+    if isinstance(text, bytes):
+        return _escape_bytes(text)
+    return _escape_text(text)
+
+
+def sd_element(sd_id, sd_params, enterprise_id, record=None):
+    """
+    Returns a single encoded SD-ELEMENT.
+
+    Lazy SD-PARAM values are computed here, memoized on the record if there is one.
+    """
+    # Clean structured data ID
+    sd_id = sd_name(sd_id)
+    if '@' not in sd_id and sd_id not in REGISTERED_SD_IDs and enterprise_id is None:
+        raise ValueError("Enterprise ID has not been set. Cannot build structured data ID. "
+                         "Please set a enterprise ID when initializing the logging handler "
+                         "or include one in the structured data ID.")
+    elif '@' in sd_id:
+        sd_id, enterprise_id = sd_id.rsplit('@', 1)
+
+    if len(enterprise_id) > 30:
+        raise ValueError("Enterprise ID is too long. Impossible to build structured data ID.")
+
+    sd_id = sd_id.replace('@', '')
+    if len(sd_id) + len(enterprise_id) > 32:
+        sd_id = sd_id[:31 - len(enterprise_id)]
+    if sd_id not in REGISTERED_SD_IDs:
+        sd_id = '@'.join((sd_id, enterprise_id))
+    sd_id = sd_id.encode('ascii', 'replace')
+
+    cleaned_sd_params = []
+    # ignore sd params not int key-value format
+    if isinstance(sd_params, dict):
+        sd_params = sd_params.items()
+    else:
+        sd_params = []
+
+    # Clean key-value pairs
+    for (param_name, param_value) in sd_params:
+        param_name = sd_name(param_name).encode('ascii', 'replace')[:32]
+        if lazy.is_lazy(param_value):
+            param_value = lazy.resolve(param_value, record)
+        param_value = sd_param_value(param_value)
+
+        sd_param = b''.join((param_name, b'="', param_value, b'"'))
+        cleaned_sd_params.append(sd_param)
+
+    cleaned_sd_params = b' '.join(cleaned_sd_params)
+
+    # build structured data element
+    spacer = b' ' if cleaned_sd_params else b''
+    return b''.join((b'[', sd_id, spacer, cleaned_sd_params, b']'))
@@ -0,0 +1,206 @@
+import logging
+import random
+import threading
+import time
+import zlib
+
+from rfc5424logging import encoding, lazy
+from rfc5424logging.utils import LRUCache
+
+clock = getattr(time, 'monotonic', time.time)
+
+# Maximum number of distinct keys that are tracked by default
+RATE_LIMIT_MAX_KEYS = 10000
+
+
+class StructuredDataFilter(logging.Filter):
+    """
+    Base of the filters that add an SD-ELEMENT to the records they let through.
+
+    The SD-PARAMs are kept in an attribute of the record that only this filter uses, not in its
+    ``structured_data``. The ``Rfc5424SysLogHandler`` that has the filter adds the SD-ELEMENT to
+    the message, other handlers of the same record don't see it. On a logger, the filter still
+    drops records, but no handler sends its SD-ELEMENT.
+    """
+
+    def __init__(self, sd_id):
+        super(StructuredDataFilter, self).__init__()
+        self.sd_id = sd_id
+        # Unique per filter, so two handlers with their own filter don't overwrite each other
+        self._attr = '_rfc5424logging_sd_%x' % id(self)
+
+    def set_sd_params(self, record, sd_params):
+        """
+        Sets the SD-PARAMs of the filter's SD-ELEMENT for a record, or None for no element.
+        """
+        setattr(record, self._attr, sd_params)
+
+    def get_sd_params(self, record):
+        """
+        Returns the SD-PARAMs the filter set for a record or None.
+        """
+        return getattr(record, self._attr, None)
+
+
+class RateLimitFilter(StructuredDataFilter):
+    """
+    Limits how often the same message is logged with a token bucket per logger, message ID and
+    message template.
+
+    Every key may log ``burst`` records at once and ``rate`` records per second after that. Records
+    over the limit are dropped before any of their message is built. The next record of the key that
+    passes reports how many were dropped in the meantime as the ``count`` SD-PARAM of the ``sd_id``
+    SD-ELEMENT, so a flood of duplicates collapses into a few messages.
+
+    The buckets of at most ``max_keys`` keys are kept, the least recently used ones are forgotten.
+    The count of a key is only reported by its next record, so it's lost when no record of the key
+    follows or its bucket is forgotten first. ``dropped`` counts all dropped records regardless.
+    """
+
+    def __init__(self, rate=1, burst=10, sd_id='repeated', max_keys=RATE_LIMIT_MAX_KEYS):
+        """
+        Args:
+            rate (float):
+                The number of records per second each key may log.
+            burst (int):
+                The number of records each key may log at once.
+            sd_id (str):
+                The SD-ID of the element with the number of dropped records. The enterprise ID of
+                the handler is added unless it contains one.
+            max_keys (int):
+                The maximum number of keys that are tracked.
+        """
+        super(RateLimitFilter, self).__init__(sd_id)
+        if rate <= 0 or burst < 1:
+            raise ValueError("Rate must be positive and burst at least 1")
+        self.rate = float(rate)
+        self.burst = burst
+        self.dropped = 0
+        self._buckets = LRUCache(max_keys)
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        try:
+            key = (record.name, getattr(record, 'msgid', None), record.msg)
+            hash(key)
+        except TypeError:
+            self.set_sd_params(record, None)
+            return True
+
+        now = clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # [tokens, last update, dropped records]
+                bucket = [self.burst, now, 0]
+                self._buckets.set(key, bucket)
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.dropped += 1
+                return False
+            bucket[0] -= 1
+            repeated = bucket[2]
+            bucket[2] = 0
+
+        # Also cleared, in case the record passed the filter before
+        self.set_sd_params(record, {'count': repeated} if repeated else None)
+        return True
+
+
+class SamplingFilter(StructuredDataFilter):
+    """
+    Keeps a fraction of the records, depending on their level and message ID.
+
+    Records of ``keep_level`` or higher are always kept. Below that, records of a level in ``level_rates``
+    are kept with that probability and levels that aren't listed are always kept. A rate in ``msgid_rates``
+    takes precedence over that of the level. Kept records that were sampled carry the rate in the ``rate``
+    SD-PARAM of the ``sd_id`` SD-ELEMENT, so downstream counts can be scaled up again.
+
+    With ``trace_id`` set, the decision is made by a hash of that SD-PARAM of the record's structured data
+    instead of at random, so either all or none of the records of a request are kept.
+    """
+
+    def __init__(
+            self, level_rates=None, msgid_rates=None, trace_id=None, keep_level=logging.WARNING, sd_id='sample'
+    ):
+        """
+        Args:
+            level_rates (dict):
+                The fraction of the records to keep per level, like ``{logging.INFO: 0.1}``.
+            msgid_rates (dict):
+                The fraction of the records to keep per message ID.
+            trace_id (str):
+                The name of the SD-PARAM, in any SD-ELEMENT of the record, whose value decides
+                whether a record is kept.
+            keep_level (int):
+                Records of this level or higher are never sampled. Defaults to ``logging.WARNING``.
+            sd_id (str):
+                The SD-ID of the element with the sample rate. The enterprise ID of the handler is
+                added unless it contains one.
+        """
+        super(SamplingFilter, self).__init__(sd_id)
+        self.level_rates = dict(level_rates or {})
+        self.msgid_rates = dict(msgid_rates or {})
+        for rate in list(self.level_rates.values()) + list(self.msgid_rates.values()):
+            if not 0 <= rate <= 1:
+                raise ValueError("Sample rates must be between 0 and 1")
+        self.trace_id = trace_id
+        self.keep_level = keep_level
+        self.dropped = 0
+        self._random = random.random
+        self._lock = threading.Lock()
+
+    def get_rate(self, record):
+        """
+        Returns the fraction of records like this one that are kept.
+        """
+        if record.levelno >= self.keep_level:
+            return 1
+        if self.msgid_rates:
+            msgid = getattr(record, 'msgid', None)
+            if msgid is not None:
+                try:
+                    return self.msgid_rates[msgid]
+                except (KeyError, TypeError):
+                    pass
+        return self.level_rates.get(record.levelno, 1)
+
+    def get_trace_id(self, record):
+        """
+        Returns the value of the ``trace_id`` SD-PARAM of the record or None.
+        """
+        structured_data = getattr(record, 'structured_data', None)
+        if not isinstance(structured_data, dict):
+            return None
+        for sd_params in structured_data.values():
+            if isinstance(sd_params, dict) and self.trace_id in sd_params:
+                return sd_params[self.trace_id]
+        return None
+
+    def sample(self, record):
+        """
+        Returns a number in ``[0, 1)`` that is compared to the sample rate.
+        """
+        if self.trace_id is not None:
+            trace_id = self.get_trace_id(record)
+            if lazy.is_lazy(trace_id):
+                trace_id = lazy.resolve(trace_id, record)
+            if trace_id is not None:
+                trace_id = encoding.sd_param_value(trace_id)
+                return (zlib.crc32(trace_id) & 0xffffffff) / 4294967296.0
+        return self._random()
+
+    def filter(self, record):
+        rate = self.get_rate(record)
+        if rate >= 1:
+            self.set_sd_params(record, None)
+            return True
+        if rate <= 0 or self.sample(record) >= rate:
+            with self._lock:
+                self.dropped += 1
+            return False
+        self.set_sd_params(record, {'rate': rate})
+        return True
@@ -3,19 +3,20 @@ import socket
 import sys
 from codecs import BOM_UTF8
 from collections import OrderedDict
-from datetime import datetime
-from logging import Handler
+from logging import Handler, LogRecord, ERROR, WARNING
 
 from pytz import utc
 from tzlocal import get_localzone
 
-from rfc5424logging import transport
+from rfc5424logging import encoding, filters, lazy, spool, transport, writer
+from rfc5424logging.stats import HandlerStats, timer
+from rfc5424logging.timestamp import TimestampFormatter
+from rfc5424logging.utils import LRUCache
 
 NILVALUE = '-'
 
 SP = b' '
-# As defined in RFC5424 Section 7
-REGISTERED_SD_IDs = ('timeQuality', 'origin', 'meta')
+REGISTERED_SD_IDs = encoding.REGISTERED_SD_IDs
 SYSLOG_VERSION = '1'
 
 EMERGENCY = 70
@@ -25,6 +26,14 @@ NOTICE = 25
 
 PY2 = sys.version_info[0] == 2
 
+if PY2:
+    CACHEABLE_FIELD_TYPES = (str, unicode, int, long)  # noqa: F821
+else:
+    CACHEABLE_FIELD_TYPES = (str, int)
+
+# Maximum number of distinct header prefixes that are kept around.
+HEADER_CACHE_SIZE = 256
+
 
 #  facility codes
 LOG_KERN = 0       # kernel messages
@@ -50,6 +59,43 @@ LOG_LOCAL6 = 22    # reserved for local use
 LOG_LOCAL7 = 23    # reserved for local use
 
 
+def is_address_list(address):
+    """
+    Returns whether the address is a list of addresses rather than a single ``[host, port]`` list.
+    """
+    return isinstance(address, list) and bool(address) and isinstance(address[0], (tuple, list))
+
+
+def _is_overridden(handler, name):
+    """
+    Returns whether the class of the handler overrides a method of ``Rfc5424SysLogHandler``.
+    """
+    method = getattr(type(handler), name)
+    # On Python 2, methods of a class are unbound methods wrapping the function
+    return getattr(method, '__func__', method) is not getattr(
+        getattr(Rfc5424SysLogHandler, name), '__func__', getattr(Rfc5424SysLogHandler, name)
+    )
+
+
+class PreparedRecord(object):
+    """
+    The encoded parts of a syslog message, captured from a log record by
+    ``Rfc5424SysLogHandler.prepare_record()``.
+
+    Only the timestamp still has to be formatted to assemble the message.
+    """
+    __slots__ = ('created', 'levelno', 'pri_version', 'host_app_proc', 'msgid', 'structured_data', 'msg')
+
+    def __init__(self, created, levelno, pri_version, host_app_proc, msgid, structured_data, msg):
+        self.created = created
+        self.levelno = levelno
+        self.pri_version = pri_version
+        self.host_app_proc = host_app_proc
+        self.msgid = msgid
+        self.structured_data = structured_data
+        self.msg = msg
+
+
 class Rfc5424SysLogHandler(Handler):
     """
     A handler class which sends RFC 5424 formatted logging records to a syslog server.
@@ -107,6 +153,32 @@ class Rfc5424SysLogHandler(Handler):
             tls_client_key=None,
             tls_key_password=None,
             stream=None,
+            queue_size=None,
+            queue_overflow=writer.OVERFLOW_BLOCK,
+            queue_overflow_level=WARNING,
+            queue_batch_size=100,
+            udp_batch_count=None,
+            udp_batch_bytes=65536,
+            flush_interval=0.05,
+            udp_connect=False,
+            udp_resolve_ttl=None,
+            tcp_buffer_size=None,
+            flush_level=ERROR,
+            stats_callback=None,
+            stats_interval=60,
+            spool_directory=None,
+            spool_segment_size=16 * 1024 * 1024,
+            spool_max_size=1024 * 1024 * 1024,
+            spool_fsync=spool.FSYNC_SEGMENT,
+            reconnect_delay=None,
+            reconnect_max_delay=30,
+            load_balancing=transport.BALANCE_ROUND_ROBIN,
+            structured_data_providers=None,
+            rate_limit=None,
+            rate_limit_burst=10,
+            sample_rates=None,
+            msgid_sample_rates=None,
+            sample_trace_id=None,
     ):
         """
         Returns a new instance of the Rfc5424SysLogHandler class intended to communicate with
@@ -132,7 +204,8 @@ class Rfc5424SysLogHandler(Handler):
 
         Args:
             address (tuple|list):
-                address in the form of a (host, port) tuple or list
+                address in the form of a (host, port) tuple or list, or a list of such addresses
+                to spread the messages over several servers as set by ``load_balancing``
 
             facility (int):
                 One of the ``rfc5424logging.LOG_*`` values.
@@ -192,6 +265,95 @@ class Rfc5424SysLogHandler(Handler):
             stream (io.BufferedIOBase, file, io.TextIOBase):
                 Optionally a stream object to send the message to. See https://docs.python.org/3/library/io.html
                 for details.
+            queue_size (int):
+                When set, messages are sent from a background thread instead of from the thread that
+                logs them. At most this many messages wait in the queue to be sent.
+                Defaults to ``None``, which sends the messages right away.
+            queue_overflow (int):
+                One of the ``rfc5424logging.OVERFLOW_*`` values. Controls what happens when the queue is
+                full. Defaults to ``OVERFLOW_BLOCK``, which waits until there's room in the queue.
+            queue_overflow_level (int):
+                When ``queue_overflow`` is ``OVERFLOW_DROP_BELOW_LEVEL``, messages with a lower level are
+                dropped when the queue is full. Defaults to ``logging.WARNING``.
+            queue_batch_size (int):
+                The maximum number of queued messages that are sent together.
+                TCP and TLS connections send them with a single write.
+            udp_batch_count (int):
+                When set, UDP datagrams are collected and sent in batches of at most this many datagrams.
+                On Linux, a batch is sent with a single ``sendmmsg()`` system call.
+                Defaults to ``None``, which sends every datagram right away.
+            udp_batch_bytes (int):
+                A UDP batch is also sent when its datagrams hold this many bytes.
+            flush_interval (float):
+                The maximum number of seconds a message waits in a UDP batch or TCP buffer before it is sent.
+            udp_connect (bool):
+                Whether to connect the UDP socket to the server. This saves a route lookup for every
+                datagram and lets the handler notice when the server refuses them. The number of refused
+                datagrams is reported by ``stats()``. Batched UDP sockets are always connected.
+            udp_resolve_ttl (float):
+                When set, the server address is resolved again after this many seconds so DNS changes
+                are picked up. Defaults to ``None``, which resolves it only when opening the socket.
+            tcp_buffer_size (int):
+                When set, framed TCP and TLS messages are collected in a buffer that is sent once it holds
+                this many bytes. Defaults to ``None``, which sends every message right away.
+            flush_level (int):
+                Records of this level or higher immediately send the messages that are waiting in a
+                UDP batch or TCP buffer. In queued mode, the writer thread does so after sending the
+                batch with the record. Defaults to ``logging.ERROR``.
+            stats_callback (callable):
+                When set, called with the result of ``stats()`` every ``stats_interval`` seconds from a
+                background thread, for example to export the counters to a metrics system.
+            stats_interval (float):
+                The number of seconds between calls of ``stats_callback``. Defaults to 60.
+            spool_directory (str):
+                When set, messages that can't be sent are stored in segment files in this directory
+                and sent again by a background thread once the server is reachable. Defaults to ``None``,
+                which reports the error and drops the message. Only one process can use a spool directory.
+            spool_segment_size (int):
+                The size in bytes of a single spool segment file. Defaults to 16 MiB.
+            spool_max_size (int):
+                The maximum number of bytes in the spool. The oldest segments are deleted when the
+                spool grows larger. Defaults to 1 GiB.
+            spool_fsync (int):
+                One of the ``FSYNC_*`` values, when spooled messages are forced to disk.
+                Defaults to ``FSYNC_SEGMENT``.
+            reconnect_delay (float):
+                When set, a TCP or TLS connection that fails is restored by a background thread instead
+                of by the logging thread. Until then, records fail right away, or are spooled when
+                ``spool_directory`` is set. The first attempt is made after this many seconds and the
+                delay doubles after every failed attempt. Defaults to ``None``, which reconnects right
+                away from the logging thread.
+            reconnect_max_delay (float):
+                The maximum number of seconds between attempts to reconnect. Defaults to 30.
+            load_balancing (int):
+                One of the ``BALANCE_*`` values, how messages are spread when ``address`` is a list
+                of addresses. ``BALANCE_ROUND_ROBIN`` takes turns, ``BALANCE_LEAST_BYTES`` prefers the
+                server with the least buffered and sent bytes and ``BALANCE_FAILOVER`` sends to the
+                first server that works. Servers that fail are skipped for a while.
+                Defaults to ``BALANCE_ROUND_ROBIN``.
+            structured_data_providers (list):
+                ``ContextStructuredData`` instances whose structured data of the current context is added
+                to every message. It replaces handler level SD-ELEMENTs with the same SD-ID and is replaced
+                by those of the record itself.
+            rate_limit (float):
+                When set, records with the same logger, message ID and message template are limited to
+                this many per second by a ``RateLimitFilter``. Dropped records are counted in the
+                ``repeated`` SD-ELEMENT of the next record that passes, which needs ``enterprise_id``.
+                Defaults to ``None``.
+            rate_limit_burst (int):
+                The number of records with the same key that may be logged at once. Defaults to 10.
+            sample_rates (dict):
+                When set, the fraction of the records to keep per level below ``logging.WARNING``, like
+                ``{logging.INFO: 0.1}``, applied by a ``SamplingFilter``. Kept records carry the rate in
+                the ``sample`` SD-ELEMENT, which needs ``enterprise_id``. Defaults to ``None``, which keeps
+                all records.
+            msgid_sample_rates (dict):
+                The fraction of the records to keep per message ID below ``logging.WARNING``. It takes
+                precedence over the rate of the level. Defaults to ``None``.
+            sample_trace_id (str):
+                When set, the SD-PARAM of the record whose value decides whether the record is kept,
+                instead of chance, so that all records of a request are kept or dropped together.
+                Needs ``sample_rates`` or ``msgid_sample_rates``.
         """
         super(Rfc5424SysLogHandler, self).__init__()
 
@@ -216,7 +378,30 @@ class Rfc5424SysLogHandler(Handler):
         self.tls_client_key = tls_client_key
         self.tls_key_password = tls_key_password
         self.stream = stream
+        self.udp_batch_count = udp_batch_count
+        self.udp_batch_bytes = udp_batch_bytes
+        self.flush_interval = flush_interval
+        self.udp_connect = udp_connect
+        self.udp_resolve_ttl = udp_resolve_ttl
+        self.tcp_buffer_size = tcp_buffer_size
+        self.flush_level = flush_level
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.load_balancing = load_balancing
+        self.structured_data_providers = list(structured_data_providers or ())
+        self.rate_limit_filter = None
+        self.sampling_filter = None
         self.transport = None
+        self.writer = None
+        self.stats_callback = stats_callback
+        self._stats = HandlerStats()
+        self._stats_timer = None
+        self._header_cache = LRUCache(HEADER_CACHE_SIZE)
+        self._timestamp_formatter = (utc_timestamp, None)
+        self._get_structured_data_overridden = _is_overridden(self, 'get_structured_data')
+        self._header_getters_overridden = any(
+            _is_overridden(self, name) for name in ('get_hostname', 'get_appname', 'get_procid')
+        )
 
         if not (isinstance(self.facility, int) and LOG_KERN <= self.facility <= LOG_LOCAL7):
             raise ValueError("Facility is not valid")
@@ -226,28 +411,87 @@ class Rfc5424SysLogHandler(Handler):
         if not isinstance(self.structured_data, dict):
             self.structured_data = OrderedDict()
 
+        if rate_limit is not None:
+            if self.enterprise_id is None:
+                raise ValueError("Rate limiting needs an enterprise ID for the repeated SD-ELEMENT")
+            self.rate_limit_filter = filters.RateLimitFilter(rate_limit, rate_limit_burst)
+            self.addFilter(self.rate_limit_filter)
+        if sample_trace_id is not None and not (sample_rates or msgid_sample_rates):
+            raise ValueError("sample_trace_id needs sample_rates or msgid_sample_rates")
+        if sample_rates or msgid_sample_rates:
+            if self.enterprise_id is None:
+                raise ValueError("Sampling needs an enterprise ID for the sample SD-ELEMENT")
+            self.sampling_filter = filters.SamplingFilter(sample_rates, msgid_sample_rates, sample_trace_id)
+            self.addFilter(self.sampling_filter)
+
         self._setup_transport()
 
+        if spool_directory is not None:
+            self.transport = spool.SpoolingTransport(
+                self.transport, spool.Spool(spool_directory, spool_segment_size, spool_max_size, spool_fsync)
+            )
+
+        if queue_size is not None:
+            self.writer = writer.QueuedWriter(
+                self.transport, queue_size, queue_overflow, queue_overflow_level, queue_batch_size,
+                error_handler=self._report_send_error, stats=self._stats, flush_level=flush_level,
+            )
+
+        if stats_callback is not None:
+            self._stats_timer = transport.RepeatingTimer(stats_interval, self._report_stats)
+
     def _setup_transport(self):
         if self.stream is not None:
             self.transport = transport.StreamTransport(self.stream)
-        elif isinstance(self.address, str):
-            self.transport = transport.UnixSocketTransport(self.address, self.socktype)
-        elif isinstance(self.address, (tuple, list)):
+        elif is_address_list(self.address):
+            self.transport = transport.MultiEndpointTransport(
+                self.address, self._build_transport, self.load_balancing
+            )
+        else:
+            self.transport = self._build_transport(self.address)
+
+    def _build_transport(self, address):
+        if isinstance(address, str):
+            return transport.UnixSocketTransport(address, self.socktype)
+        elif isinstance(address, (tuple, list)):
             if self.socktype == socket.SOCK_STREAM:
                 if self.tls_enable:
-                    self.transport = transport.TLSSocketTransport(
-                        self.address, self.timeout, self.framing,
+                    return transport.TLSSocketTransport(
+                        address, self.timeout, self.framing,
                         self.tls_ca_bundle, self.tls_verify,
-                        self.tls_client_cert, self.tls_client_key, self.tls_key_password
+                        self.tls_client_cert, self.tls_client_key, self.tls_key_password,
+                        self.tcp_buffer_size, self.flush_interval, self.reconnect_delay, self.reconnect_max_delay
                     )
                 else:
-                    self.transport = transport.TCPSocketTransport(self.address, self.timeout, self.framing)
+                    return transport.TCPSocketTransport(
+                        address, self.timeout, self.framing, self.tcp_buffer_size, self.flush_interval,
+                        self.reconnect_delay, self.reconnect_max_delay
+                    )
+            elif self.udp_batch_count:
+                return transport.BatchedUDPSocketTransport(
+                    address, self.timeout,
+                    self.udp_batch_count, self.udp_batch_bytes, self.flush_interval, self.udp_resolve_ttl
+                )
             else:
-                self.transport = transport.UDPSocketTransport(self.address, self.timeout)
+                return transport.UDPSocketTransport(
+                    address, self.timeout, self.udp_connect, self.udp_resolve_ttl
+                )
         else:
             raise ValueError("Unsupported address type")
 
+    def get_timestamp_formatter(self):
+        """
+        Returns the formatter for the message timestamps.
+
+        The local timezone is only looked up once, when the formatter is created.
+        A new one is created when ``utc_timestamp`` is changed afterwards.
+        """
+        utc_timestamp, formatter = self._timestamp_formatter
+        if formatter is None or utc_timestamp != self.utc_timestamp:
+            formatter = TimestampFormatter(utc if self.utc_timestamp else get_localzone())
+            self._timestamp_formatter = (self.utc_timestamp, formatter)
+        return formatter
+
     def encode_priority(self, facility, priority):
         """
         Encode the facility and priority. You can pass in strings or
@@ -259,27 +503,36 @@ class Rfc5424SysLogHandler(Handler):
 
     @staticmethod
     def filter_printusascii(str_to_filter):
-        return ''.join([x for x in str_to_filter if 33 <= ord(x) <= 126])
+        return encoding.filter_printusascii(str_to_filter)
 
-    def get_hostname(self, record):
+    def _hostname_value(self, record):
         hostname = getattr(record, 'hostname', None)
         if not hostname:
             hostname = self.hostname
         if hostname is None or hostname == '':
             hostname = NILVALUE
-        return self.filter_printusascii(str(hostname))
+        return hostname
 
-    def get_appname(self, record):
+    def _appname_value(self, record):
         appname = getattr(record, 'appname', self.appname)
         if appname is None or appname == '':
             appname = getattr(record, 'name', NILVALUE)
-        return self.filter_printusascii(str(appname))
+        return appname
 
-    def get_procid(self, record):
+    def _procid_value(self, record):
         procid = getattr(record, 'procid', self.procid)
         if procid is None or procid == '':
             procid = getattr(record, 'process', NILVALUE)
-        return self.filter_printusascii(str(procid))
+        return procid
+
+    def get_hostname(self, record):
+        return self.filter_printusascii(str(self._hostname_value(record)))
+
+    def get_appname(self, record):
+        return self.filter_printusascii(str(self._appname_value(record)))
+
+    def get_procid(self, record):
+        return self.filter_printusascii(str(self._procid_value(record)))
 
     def get_msgid(self, record):
         msgid = getattr(record, 'msgid', NILVALUE)
@@ -305,6 +558,210 @@ class Rfc5424SysLogHandler(Handler):
             structured_data.update(record_sd)
         return structured_data
 
+    def get_header_fragments(self, record):
+        """
+        Returns the encoded ``PRI VERSION`` and ``HOSTNAME SP APP-NAME SP PROCID`` parts
+        of the header.
+
+        Both parts hardly ever change between records, so they are cached per
+        combination of facility, level and the (possibly overridden) field values.
+        Subclasses that override ``get_hostname()``, ``get_appname()`` or ``get_procid()``
+        have them called for every record instead.
+        """
+        if self._header_getters_overridden:
+            pri = '<%d>' % self.encode_priority(self.facility, record.levelname)
+            return (
+                b''.join((pri.encode('ascii'), SYSLOG_VERSION.encode('ascii'))),
+                SP.join((
+                    self.get_hostname(record).encode('ascii', 'replace')[:255],
+                    self.get_appname(record).encode('ascii', 'replace')[:48],
+                    self.get_procid(record).encode('ascii', 'replace')[:128],
+                )),
+            )
+
+        hostname = self._hostname_value(record)
+        appname = self._appname_value(record)
+        procid = self._procid_value(record)
+        levelname = record.levelname
+
+        if (type(hostname) in CACHEABLE_FIELD_TYPES
+                and type(appname) in CACHEABLE_FIELD_TYPES
+                and type(procid) in CACHEABLE_FIELD_TYPES):
+            key = (self.facility, levelname, hostname, appname, procid)
+        else:
+            # Arbitrary objects might render differently over time.
+            key = None
+
+        if key is not None:
+            fragments = self._header_cache.get(key)
+            if fragments is not None:
+                return fragments
+
+        pri = '<%d>' % self.encode_priority(self.facility, levelname)
+        pri_version = b''.join((pri.encode('ascii'), SYSLOG_VERSION.encode('ascii')))
+        hostname = self.filter_printusascii(str(hostname)).encode('ascii', 'replace')[:255]
+        appname = self.filter_printusascii(str(appname)).encode('ascii', 'replace')[:48]
+        procid = self.filter_printusascii(str(procid)).encode('ascii', 'replace')[:128]
+        fragments = (pri_version, SP.join((hostname, appname, procid)))
+
+        if key is not None:
+            self._header_cache.set(key, fragments)
+        return fragments
+
+    @property
+    def structured_data(self):
+        return self._structured_data
+
+    @structured_data.setter
+    def structured_data(self, value):
+        self._structured_data = value
+        # Compiled again on the next record
+        self._compiled_structured_data = None
+
+    def compile_structured_data(self, enterprise_id):
+        """
+        Returns the handler level structured data as a list of ``(SD-ID, encoded SD-ELEMENT)``
+        tuples, all elements joined together and the set of SD-IDs.
+
+        The result is cached until the ``structured_data`` attribute is replaced
+        or a record uses another enterprise ID. Elements with lazy values are built
+        for every record instead; their encoded SD-ELEMENT is None and so is the joined result.
+        """
+        compiled = self._compiled_structured_data
+        if compiled is None or compiled[0] != enterprise_id:
+            elements = []
+            if isinstance(self.structured_data, dict):
+                for sd_id, sd_params in list(self.structured_data.items()):
+                    if lazy.has_lazy_values(sd_params):
+                        elements.append((sd_id, None))
+                    else:
+                        elements.append((sd_id, self.build_sd_element(sd_id, sd_params, enterprise_id)))
+            if any(element is None for _, element in elements):
+                joined = None
+            else:
+                joined = b''.join(element for _, element in elements)
+            compiled = (
+                enterprise_id,
+                elements,
+                joined,
+                frozenset(sd_id for sd_id, _ in elements),
+            )
+            self._compiled_structured_data = compiled
+        return compiled[1:]
+
+    def build_sd_element(self, sd_id, sd_params, enterprise_id, record=None):
+        """
+        Returns a single encoded SD-ELEMENT.
+
+        Lazy SD-PARAM values are computed here, memoized on the record if there is one.
+        """
+        return encoding.sd_element(sd_id, sd_params, enterprise_id, record)
+
+    def build_structured_data(self, record):
+        """
+        Returns the encoded STRUCTURED-DATA part of the message.
+
+        The handler level structured data is compiled once. Only the structured data
+        of the record itself is encoded per message. An SD-ID of the record replaces
+        the handler level SD-ELEMENT with the same ID.
+
+        Subclasses that override ``get_structured_data()`` get every SD-ELEMENT it returns
+        encoded per message instead, merged with the context structured data the same way.
+        The SD-ELEMENTs of the handler's filters come last.
+        """
+        enterprise_id = self.get_enterprise_id(record)
+        record_sd = getattr(record, 'structured_data', None)
+        if not isinstance(record_sd, dict):
+            record_sd = None
+        context_sd = self._get_context_structured_data()
+
+        if self._get_structured_data_overridden:
+            # A subclass decides on the structured data of every record, nothing can be compiled
+            elements = [
+                (sd_id, self.build_sd_element(sd_id, sd_params, enterprise_id, record))
+                for sd_id, sd_params in list(self.get_structured_data(record).items())
+            ]
+            if context_sd is not None:
+                elements = self._merge_context_structured_data(elements, context_sd, record_sd)
+            elements = [element for _, element in elements]
+            elements.extend(self._build_filter_sd_elements(record, enterprise_id))
+            return b''.join(elements) or NILVALUE.encode('ascii')
+
+        handler_elements, handler_sd, handler_ids = self.compile_structured_data(enterprise_id)
+
+        if not record_sd and context_sd is None and handler_sd is not None:
+            structured_data = handler_sd
+        elif (not record_sd and handler_sd is not None and len(context_sd) == 1
+                and handler_ids.isdisjoint(context_sd[0].ids)):
+            # The usual case with context structured data, set once per request
+            structured_data = handler_sd + context_sd[0].joined
+        else:
+            elements = []
+            for sd_id, element in handler_elements:
+                if record_sd and sd_id in record_sd:
+                    element = self.build_sd_element(sd_id, record_sd[sd_id], enterprise_id, record)
+                elif element is None:
+                    element = self.build_sd_element(sd_id, self.structured_data[sd_id], enterprise_id, record)
+                elements.append((sd_id, element))
+            if context_sd is not None:
+                elements = self._merge_context_structured_data(elements, context_sd, record_sd)
+            used_ids = set(sd_id for sd_id, _ in elements)
+            if record_sd:
+                for sd_id, sd_params in list(record_sd.items()):
+                    if sd_id not in used_ids:
+                        elements.append((sd_id, self.build_sd_element(sd_id, sd_params, enterprise_id, record)))
+            structured_data = b''.join(element for _, element in elements)
+
+        filter_elements = self._build_filter_sd_elements(record, enterprise_id)
+        if filter_elements:
+            structured_data = b''.join([structured_data] + filter_elements)
+        return structured_data or NILVALUE.encode('ascii')
+
+    def _build_filter_sd_elements(self, record, enterprise_id):
+        """
+        Returns the encoded SD-ELEMENTs that the ``StructuredDataFilter`` instances of this
+        handler set for the record. Those of other handlers' filters are left out.
+        """
+        elements = []
+        for record_filter in self.filters:
+            if isinstance(record_filter, filters.StructuredDataFilter):
+                sd_params = record_filter.get_sd_params(record)
+                if sd_params is not None:
+                    elements.append(self.build_sd_element(record_filter.sd_id, sd_params, enterprise_id, record))
+        return elements
+
+    def _get_context_structured_data(self):
+        """
+        Returns the ``EncodedStructuredData`` of the providers that have structured data
+        in the current context, or None.
+        """
+        context_sd = None
+        for provider in self.structured_data_providers:
+            encoded = provider.get()
+            if encoded is not None:
+                if context_sd is None:
+                    context_sd = []
+                context_sd.append(encoded)
+        return context_sd
+
+    @staticmethod
+    def _merge_context_structured_data(elements, context_sd, record_sd):
+        """
+        Replaces the ``(SD-ID, SD-ELEMENT)`` tuples of the elements with those of the context
+        structured data, or adds them, unless the record has its own element with that SD-ID.
+        """
+        positions = dict((sd_id, i) for i, (sd_id, _) in enumerate(elements))
+        for encoded in context_sd:
+            for sd_id, element in encoded.elements:
+                if record_sd and sd_id in record_sd:
+                    continue
+                if sd_id in positions:
+                    elements[positions[sd_id]] = (sd_id, element)
+                else:
+                    positions[sd_id] = len(elements)
+                    elements.append((sd_id, element))
+        return elements
+
     def build_msg(self, record):
         # The syslog message has the following ABNF [RFC5234] definition:
         #
@@ -364,105 +821,68 @@ class Rfc5424SysLogHandler(Handler):
         #     NILVALUE = "-"
 
         # HEADER
-        pri = '<%d>' % self.encode_priority(self.facility, record.levelname)
-        version = SYSLOG_VERSION
-        timestamp = datetime.fromtimestamp(record.created, get_localzone())
-        if self.utc_timestamp:
-            timestamp = timestamp.astimezone(utc)
-        timestamp = timestamp.isoformat()
-        hostname = self.get_hostname(record)
-        appname = self.get_appname(record)
-        procid = self.get_procid(record)
+        pri_version, host_app_proc = self.get_header_fragments(record)
+        timestamp = self.get_timestamp_formatter().format(record.created)
         msgid = self.get_msgid(record)
-
-        pri = pri.encode('ascii')
-        version = version.encode('ascii')
-        timestamp = timestamp.encode('ascii')
-        hostname = hostname.encode('ascii', 'replace')[:255]
-        appname = appname.encode('ascii', 'replace')[:48]
-        procid = procid.encode('ascii', 'replace')[:128]
         msgid = msgid.encode('ascii', 'replace')[:32]
 
-        header = b''.join((pri, version, SP, timestamp, SP, hostname, SP, appname, SP, procid, SP, msgid))
+        header = b''.join((pri_version, SP, timestamp, SP, host_app_proc, SP, msgid))
 
         # STRUCTURED-DATA
-        enterprise_id = self.get_enterprise_id(record)
-        structured_data = self.get_structured_data(record)
-        cleaned_structured_data = []
-        for sd_id, sd_params in list(structured_data.items()):
-            # Clean structured data ID
-            sd_id = self.filter_printusascii(sd_id)
-            sd_id = sd_id.replace('=', '').replace(' ', '').replace(']', '').replace('"', '')
-            if '@' not in sd_id and sd_id not in REGISTERED_SD_IDs and enterprise_id is None:
-                raise ValueError("Enterprise ID has not been set. Cannot build structured data ID. "
-                                 "Please set a enterprise ID when initializing the logging handler "
-                                 "or include one in the structured data ID.")
-            elif '@' in sd_id:
-                sd_id, enterprise_id = sd_id.rsplit('@', 1)
-
-            if len(enterprise_id) > 30:
-                raise ValueError("Enterprise ID is too long. Impossible to build structured data ID.")
-
-            sd_id = sd_id.replace('@', '')
-            if len(sd_id) + len(enterprise_id) > 32:
-                sd_id = sd_id[:31 - len(enterprise_id)]
-            if sd_id not in REGISTERED_SD_IDs:
-                sd_id = '@'.join((sd_id, enterprise_id))
-            sd_id = sd_id.encode('ascii', 'replace')
-
-            cleaned_sd_params = []
-            # ignore sd params not int key-value format
-            if isinstance(sd_params, dict):
-                sd_params = sd_params.items()
-            else:
-                sd_params = []
-
-            # Clean key-value pairs
-            for (param_name, param_value) in sd_params:
-                param_name = self.filter_printusascii(str(param_name))
-                param_name = param_name.replace('=', '').replace(' ', '').replace(']', '').replace('"', '')
-                if param_value is None:
-                    param_value = ''
-
-                param_value = str(param_value)
-
-                if PY2:
-                    param_value = unicode(param_value, 'utf-8')  # noqa
-
-                param_value = param_value.replace('\\', '\\\\').replace('"', '\\"').replace(']', '\\]')
-
-                param_name = param_name.encode('ascii', 'replace')[:32]
-                param_value = param_value.encode('utf-8', 'replace')
-
-                sd_param = b''.join((param_name, b'="', param_value, b'"'))
-                cleaned_sd_params.append(sd_param)
-
-            cleaned_sd_params = SP.join(cleaned_sd_params)
-
-            # build structured data element
-            spacer = SP if cleaned_sd_params else b''
-            sd_element = b''.join((b'[', sd_id, spacer, cleaned_sd_params, b']'))
-            cleaned_structured_data.append(sd_element)
-
-        if cleaned_structured_data:
-            structured_data = b''.join(cleaned_structured_data)
-        else:
-            structured_data = NILVALUE.encode('ascii')
+        structured_data = self.build_structured_data(record)
 
         # MSG
-        if record.msg is None or record.msg == "":
+        msg = self.encode_msg(record)
+        if msg is None:
             pieces = (header, structured_data)
         else:
-            msg = self.format(record)
-            if self.msg_as_utf8:
-                msg = b''.join((BOM_UTF8, msg.encode('utf-8')))
-            else:
-                msg = msg.encode('utf-8')
             pieces = (header, structured_data, msg)
         syslog_msg = SP.join(pieces)
 
         return syslog_msg
 
+    def encode_msg(self, record):
+        """
+        Returns the formatted and encoded MSG part of the message or None when the record has no message.
+        """
+        if record.msg is None or record.msg == "":
+            return None
+        msg = self.format(record)
+        if self.msg_as_utf8:
+            return b''.join((BOM_UTF8, msg.encode('utf-8')))
+        return msg.encode('utf-8')
+
+    def prepare_record(self, record):
+        """
+        Captures everything but the timestamp of the message in a ``PreparedRecord``.
+
+        This is the bulk of the work of building a message. It's meant to run in the thread
+        that logs, so that ``assemble_msg()`` only has some bytes left to join.
+        """
+        pri_version, host_app_proc = self.get_header_fragments(record)
+        msgid = self.get_msgid(record).encode('ascii', 'replace')[:32]
+        return PreparedRecord(
+            record.created,
+            record.levelno,
+            pri_version,
+            host_app_proc,
+            msgid,
+            self.build_structured_data(record),
+            self.encode_msg(record),
+        )
+
+    def assemble_msg(self, prepared):
+        """
+        Returns the syslog message of a ``PreparedRecord``.
+        """
+        timestamp = self.get_timestamp_formatter().format(prepared.created)
+        header = b''.join((
+            prepared.pri_version, SP, timestamp, SP, prepared.host_app_proc, SP, prepared.msgid
+        ))
+        if prepared.msg is None:
+            return SP.join((header, prepared.structured_data))
+        return SP.join((header, prepared.structured_data, prepared.msg))
+
     def emit(self, record):
         """
         Emit a record.
@@ -470,18 +890,207 @@ class Rfc5424SysLogHandler(Handler):
         The record is formatted, and then sent to the syslog server. If
         exception information is present, it is NOT sent to the server.
         """
+        stats = self._stats
+        start = timer()
         try:
             syslog_msg = self.build_msg(record)
-            self.transport.transmit(syslog_msg)
         except Exception:
+            stats.record_build_error()
             self.handleError(record)
+            return
+        built = timer()
+        stats.record_build(built - start, len(syslog_msg))
+
+        try:
+            if self.writer is not None:
+                self.writer.put(syslog_msg, record.levelno)
+            else:
+                self.transport.transmit(syslog_msg)
+                if record.levelno >= self.flush_level:
+                    self.transport.flush()
+                stats.record_transmit(timer() - built)
+        except transport.ConnectionUnavailable:
+            # Counted by the transport, which reported the error once when the connection went down
+            pass
+        except Exception:
+            stats.record_send_error()
+            self.handleError(record)
+
+    def handle_batch(self, records):
+        """
+        Like ``handle()``, but for many records at once.
+
+        The records are filtered, then emitted with ``emit_many()`` while holding the lock
+        of the handler only once.
+        """
+        accepted = []
+        for record in records:
+            result = self.filter(record)
+            if not result:
+                continue
+            if isinstance(result, LogRecord):
+                # Since Python 3.12, filters can return a replacement record
+                record = result
+            accepted.append(record)
+        if not accepted:
+            return accepted
+        self.acquire()
+        try:
+            self.emit_many(accepted)
+        finally:
+            self.release()
+        return accepted
+
+    def emit_many(self, records):
+        """
+        Emit many records.
+
+        All records are formatted first and then sent with a single batched write.
+        A record that can't be formatted is passed to ``handleError()`` and skipped.
+        """
+        stats = self._stats
+        syslog_msgs = []
+        flush = False
+        for record in records:
+            start = timer()
+            try:
+                syslog_msg = self.build_msg(record)
+            except Exception:
+                stats.record_build_error()
+                self.handleError(record)
+                continue
+            stats.record_build(timer() - start, len(syslog_msg))
+            syslog_msgs.append((syslog_msg, record.levelno))
+            flush = flush or record.levelno >= self.flush_level
+        if not syslog_msgs:
+            return
+
+        try:
+            self._send_many(syslog_msgs, flush)
+        except transport.ConnectionUnavailable:
+            pass
+        except Exception:
+            self.handleError(records[-1])
+
+    def emit_prepared(self, prepared_records):
+        """
+        Assembles and sends the messages of many ``PreparedRecord`` objects with a single
+        batched write.
+
+        Unlike ``emit()``, errors are raised to the caller since there is no log record
+        to pass to ``handleError()``.
+        """
+        stats = self._stats
+        syslog_msgs = []
+        flush = False
+        for prepared in prepared_records:
+            start = timer()
+            syslog_msg = self.assemble_msg(prepared)
+            stats.record_build(timer() - start, len(syslog_msg))
+            syslog_msgs.append((syslog_msg, prepared.levelno))
+            flush = flush or prepared.levelno >= self.flush_level
+        if syslog_msgs:
+            self._send_many(syslog_msgs, flush)
+
+    def _send_many(self, syslog_msgs, flush):
+        stats = self._stats
+        start = timer()
+        try:
+            if self.writer is not None:
+                for syslog_msg, levelno in syslog_msgs:
+                    self.writer.put(syslog_msg, levelno)
+            else:
+                self.transport.transmit_many([syslog_msg for syslog_msg, _ in syslog_msgs])
+                if flush:
+                    self.transport.flush()
+                stats.record_transmit(timer() - start)
+        except transport.ConnectionUnavailable:
+            raise
+        except Exception:
+            stats.record_send_error()
+            raise
+
+    def stats(self):
+        """
+        Returns a snapshot of the counters and latency histograms of the handler and its transport.
+
+        ``records`` and ``bytes`` count the built messages, ``build_errors`` and ``send_errors``
+        the failures that were passed to ``handleError``. In queued mode ``send_errors`` counts failed
+        batches and ``dropped`` the messages discarded because the queue was full. ``rate_limited``
+        and ``sampled_out`` count the records dropped by the rate limit and by sampling. Transports add
+        their own counters, like ``reconnects``. The histograms hold the number of observations
+        per latency bucket in seconds along with the approximate 50th and 99th percentiles.
+        """
+        stats = self._stats.snapshot()
+        if self.writer is not None:
+            stats['dropped'] = self.writer.dropped
+        if self.rate_limit_filter is not None:
+            stats['rate_limited'] = self.rate_limit_filter.dropped
+        if self.sampling_filter is not None:
+            stats['sampled_out'] = self.sampling_filter.dropped
+        transport_stats = getattr(self.transport, 'stats', None)
+        if transport_stats is not None:
+            stats.update(transport_stats())
+        return stats
+
+    @staticmethod
+    def _report_send_error():
+        # Messages rejected while the connection is down were counted by the transport already
+        if not isinstance(sys.exc_info()[1], transport.ConnectionUnavailable):
+            writer.print_error()
+
+    def _report_stats(self):
+        try:
+            self.stats_callback(self.stats())
+        except Exception:
+            writer.print_error()
+
+    def reload_tls_context(self):
+        """
+        Loads the CA bundle and the client certificate from the ``tls_*`` attributes again,
+        for example after the certificates were rotated. They are used from the next
+        connection on.
+        """
+        target = self.transport
+        # Look through wrapping transports, like the spool
+        while getattr(target, 'transport', None) is not None:
+            target = target.transport
+        if isinstance(target, transport.MultiEndpointTransport):
+            targets = [endpoint.transport for endpoint in target.endpoints]
+        else:
+            targets = [target]
+
+        tls_transports = [target for target in targets if isinstance(target, transport.TLSSocketTransport)]
+        if not tls_transports and not self.tls_enable:
+            raise ValueError("The handler does not use TLS")
+        for target in tls_transports:
+            target.tls_ca_bundle = self.tls_ca_bundle
+            target.tls_verify = self.tls_verify
+            target.tls_client_cert = self.tls_client_cert
+            target.tls_client_key = self.tls_client_key
+            target.tls_key_password = self.tls_key_password
+            target.reload_context()
+
+    def flush(self):
+        """
+        Waits until all queued and batched messages are sent.
+        """
+        if self.writer is not None:
+            self.writer.flush()
+        if self.transport is not None:
+            self.transport.flush()
 
     def close(self):
         """
-        Closes the socket.
+        Sends the queued messages and closes the socket.
         """
         self.acquire()
         try:
+            if self._stats_timer is not None:
+                self._stats_timer.stop()
+                self._stats_timer = None
+            if self.writer is not None:
+                self.writer.close()
             if self.transport is not None:
                 self.transport.close()
             super(Rfc5424SysLogHandler, self).close()
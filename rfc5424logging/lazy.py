@@ -0,0 +1,69 @@
+# Where the values of a record are memoized
+RECORD_ATTRIBUTE = '_rfc5424_lazy_values'
+
+
+class LazyValue(object):
+    """
+    An SD-PARAM value that is only computed when a message is built.
+
+    Records that are dropped because of their level or a filter never call the function.
+    The value is computed once per record, even when several handlers send it, unless
+    ``memoize=False`` is passed.
+
+    Example:
+
+        >>> adapter.debug('Request', sd={'request@32473': {'headers': LazyValue(json.dumps, headers)}})
+    """
+    __slots__ = ('func', 'args', 'memoize')
+
+    def __init__(self, func, *args, **kwargs):
+        """
+        Args:
+            func (callable):
+                Returns the value when called with ``args``.
+            memoize (bool):
+                Whether to keep the value for other handlers of the same record.
+        """
+        self.func = func
+        self.args = args
+        self.memoize = kwargs.pop('memoize', True)
+        if kwargs:
+            raise TypeError("Unexpected keyword arguments: %s" % ', '.join(kwargs))
+
+    def __call__(self):
+        return self.func(*self.args)
+
+
+def is_lazy(value):
+    """
+    Returns whether the SD-PARAM value is computed by calling it.
+    """
+    return callable(value)
+
+
+def has_lazy_values(sd_params):
+    """
+    Returns whether any value of the SD-PARAMs of an SD-ELEMENT is lazy.
+    """
+    return isinstance(sd_params, dict) and any(is_lazy(value) for value in sd_params.values())
+
+
+def resolve(value, record=None):
+    """
+    Computes a lazy value. Plain callables are called without arguments.
+
+    With a record, the value is memoized on the record.
+    """
+    if record is None or (isinstance(value, LazyValue) and not value.memoize):
+        return value()
+    values = record.__dict__.get(RECORD_ATTRIBUTE)
+    if values is None:
+        values = record.__dict__[RECORD_ATTRIBUTE] = {}
+    try:
+        return values[value]
+    except KeyError:
+        result = values[value] = value()
+        return result
+    except TypeError:
+        # Not hashable
+        return value()
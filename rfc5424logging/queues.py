@@ -0,0 +1,136 @@
+import threading
+from logging import Handler, LogRecord
+
+from rfc5424logging.transport import ConnectionUnavailable
+from rfc5424logging.writer import print_error
+
+try:
+    import queue
+except ImportError:  # pragma: no cover
+    import Queue as queue  # noqa: N813
+
+# Put on the queue to stop the listener
+_sentinel = None
+
+
+class Rfc5424QueueHandler(Handler):
+    """
+    Puts log records on a queue for a ``Rfc5424QueueListener`` to send.
+
+    Unlike ``logging.handlers.QueueHandler``, the record isn't copied. The thread that logs formats
+    the message and encodes the header fields and structured data right away with
+    ``Rfc5424SysLogHandler.prepare_record()`` and only puts the resulting ``PreparedRecord``
+    on the queue. That spreads the work over the threads that log, while the listener thread
+    only has to add the timestamp and send the messages.
+
+    The filters of both handlers are applied, in the thread that logs. Set the level on this handler,
+    that of the syslog handler isn't checked.
+    """
+
+    def __init__(self, queue, handler):
+        """
+        Args:
+            queue:
+                The queue shared with the listener, like a ``queue.Queue``.
+            handler (rfc5424logging.Rfc5424SysLogHandler):
+                The handler that builds and sends the messages.
+        """
+        Handler.__init__(self)
+        self.queue = queue
+        self.handler = handler
+
+    def emit(self, record):
+        try:
+            result = self.handler.filter(record)
+            if not result:
+                return
+            if isinstance(result, LogRecord):
+                # Since Python 3.12, filters can return a replacement record
+                record = result
+            self.queue.put_nowait(self.handler.prepare_record(record))
+        except Exception:
+            self.handleError(record)
+
+
+class Rfc5424QueueListener(object):
+    """
+    Takes the records that a ``Rfc5424QueueHandler`` put on a queue off in batches and sends
+    each batch with ``Rfc5424SysLogHandler.emit_prepared()``.
+    """
+
+    def __init__(self, queue, handler, batch_size=100, error_handler=print_error):
+        """
+        Args:
+            queue:
+                The queue shared with the queue handler.
+            handler (rfc5424logging.Rfc5424SysLogHandler):
+                The handler that builds and sends the messages.
+            batch_size (int):
+                The maximum number of messages sent in a single batch.
+            error_handler (callable):
+                Called without arguments from within an ``except`` block when sending a batch fails.
+        """
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1")
+        self.queue = queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.error_handler = error_handler
+        self._thread = None
+
+    def start(self):
+        """
+        Starts the listener thread.
+        """
+        self._thread = threading.Thread(target=self._run, name='rfc5424logging-listener')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Sends all records that are on the queue and stops the listener thread.
+        """
+        if self._thread is not None:
+            self.queue.put(_sentinel)
+            self._thread.join()
+            self._thread = None
+
+    def _get_batch(self):
+        """
+        Returns the next batch of records, waiting for the first one, and whether the listener was stopped.
+        """
+        batch = []
+        item = self.queue.get()
+        while True:
+            if item is _sentinel:
+                return batch, True
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return batch, False
+
+    def _run(self):
+        has_task_done = hasattr(self.queue, 'task_done')
+        stopped = False
+        while not stopped:
+            batch, stopped = self._get_batch()
+            if batch:
+                self.handler.acquire()
+                try:
+                    self.handler.emit_prepared(batch)
+                    if self.handler.writer is None and self.queue.empty():
+                        # Nothing more to send for now, don't keep messages buffered in the transport
+                        self.handler.transport.flush()
+                except ConnectionUnavailable:
+                    # Counted by the transport, which reported the error once when the connection went down
+                    pass
+                except Exception:
+                    self.error_handler()
+                finally:
+                    self.handler.release()
+            if has_task_done:
+                for _ in range(len(batch) + stopped):
+                    self.queue.task_done()
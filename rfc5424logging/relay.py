@@ -0,0 +1,211 @@
+"""
+Relay that forwards syslog messages from local processes to a syslog server.
+
+Applications with many worker processes would otherwise open a connection to the
+server from every worker. Instead, the workers log to a Unix datagram socket of the
+relay and the relay sends everything over a single connection::
+
+    python -m rfc5424logging.relay /run/syslog-relay.sock --address syslog.example.com:6514 --tls
+
+The workers use a handler with the socket of the relay as address::
+
+    Rfc5424SysLogHandler(address='/run/syslog-relay.sock', socktype=socket.SOCK_DGRAM)
+"""
+import argparse
+import errno
+import os
+import select
+import signal
+import socket
+import stat
+import threading
+
+from rfc5424logging import transport
+from rfc5424logging.writer import print_error
+
+# Larger than any message a worker can send over a Unix datagram socket
+MAX_MESSAGE_SIZE = 256 * 1024
+
+
+class SyslogRelay(object):
+    """
+    Receives finished syslog messages on a Unix datagram socket and forwards them
+    in batches with ``upstream.transmit_many()``.
+
+    Each datagram holds exactly one message, as sent by ``UnixSocketTransport``.
+    Reconnecting is left up to the upstream transport.
+    """
+
+    def __init__(self, path, upstream, batch_size=100, receive_buffer=4 * 1024 * 1024, mode=None,
+                 poll_interval=0.5):
+        """
+        Args:
+            path (str):
+                Path of the Unix datagram socket to receive the messages on. A stale socket
+                left behind by a previous relay is removed.
+            upstream:
+                The transport that sends the messages to the syslog server.
+            batch_size (int):
+                The maximum number of messages forwarded together.
+            receive_buffer (int):
+                Size of the receive buffer of the socket in bytes. Messages wait in there while
+                the relay is sending.
+            mode (int):
+                Permissions of the socket file, for example ``0o660``.
+            poll_interval (float):
+                How often in seconds the relay checks whether it was stopped.
+        """
+        self.path = path
+        self.upstream = upstream
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.received = 0
+        self.send_errors = 0
+        self._stopped = threading.Event()
+
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+        self.socket.bind(path)
+        self.socket.setblocking(False)
+        if mode is not None:
+            os.chmod(path, mode)
+
+    def receive_batch(self):
+        """
+        Returns the messages that are waiting on the socket, at most ``batch_size``.
+        """
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.socket.recv(MAX_MESSAGE_SIZE))
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    break
+                raise
+        self.received += len(batch)
+        return batch
+
+    def forward(self, batch, flush=True):
+        try:
+            self.upstream.transmit_many(batch)
+            if flush:
+                self.upstream.flush()
+        except Exception:
+            self.send_errors += 1
+            print_error()
+
+    def serve_forever(self):
+        """
+        Forwards messages until ``stop()`` is called.
+        """
+        while not self._stopped.is_set():
+            try:
+                readable, _, _ = select.select([self.socket], [], [], self.poll_interval)
+            except (OSError, select.error) as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+            if not readable:
+                continue
+            batch = self.receive_batch()
+            if batch:
+                # A full batch means more messages are waiting, keep them buffered in the transport
+                self.forward(batch, flush=len(batch) < self.batch_size)
+
+    def stats(self):
+        stats = {'received': self.received, 'send_errors': self.send_errors}
+        upstream_stats = getattr(self.upstream, 'stats', None)
+        if upstream_stats is not None:
+            stats.update(upstream_stats())
+        return stats
+
+    def stop(self):
+        self._stopped.set()
+
+    def close(self):
+        """
+        Forwards the messages still waiting on the socket, removes it and closes the upstream transport.
+        """
+        self.stop()
+        try:
+            while True:
+                batch = self.receive_batch()
+                if not batch:
+                    break
+                self.forward(batch)
+            self.socket.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        finally:
+            self.upstream.close()
+
+
+def parse_address(value):
+    host, _, port = value.rpartition(':')
+    if not host:
+        return value, transport.SYSLOG_PORT
+    return host.strip('[]'), int(port)
+
+
+def build_upstream(args):
+    """
+    Returns the transport to the syslog server for the parsed command line arguments.
+    """
+    if args.tls or args.tcp:
+        framing = transport.FRAMING_NON_TRANSPARENT if args.framing == 'non-transparent' \
+            else transport.FRAMING_OCTET_COUNTING
+        if args.tls:
+            return transport.TLSSocketTransport(
+                args.address, args.timeout, framing, args.tls_ca_bundle, not args.no_tls_verify,
+                args.tls_client_cert, args.tls_client_key, None, args.buffer_size, args.flush_interval,
+            )
+        return transport.TCPSocketTransport(
+            args.address, args.timeout, framing, args.buffer_size, args.flush_interval
+        )
+    return transport.UDPSocketTransport(args.address, args.timeout, connect=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m rfc5424logging.relay', description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('socket', help='Path of the Unix datagram socket to receive messages on')
+    parser.add_argument('--address', type=parse_address, default=('localhost', transport.SYSLOG_PORT),
+                        help='host:port of the syslog server (default: localhost:514)')
+    parser.add_argument('--tcp', action='store_true', help='Send over TCP instead of UDP')
+    parser.add_argument('--tls', action='store_true', help='Send over TLS')
+    parser.add_argument('--framing', choices=['octet-counting', 'non-transparent'], default='octet-counting',
+                        help='RFC6587 framing over TCP and TLS (default: octet-counting)')
+    parser.add_argument('--tls-ca-bundle', help='CA certificates to verify the server with')
+    parser.add_argument('--no-tls-verify', action='store_true', help='Do not verify the server certificate')
+    parser.add_argument('--tls-client-cert', help='Client certificate')
+    parser.add_argument('--tls-client-key', help='Key of the client certificate')
+    parser.add_argument('--timeout', type=float, default=5, help='Connection timeout in seconds (default: 5)')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Maximum number of messages forwarded together (default: 100)')
+    parser.add_argument('--buffer-size', type=int, default=65536,
+                        help='Bytes collected before writing over TCP and TLS (default: 65536)')
+    parser.add_argument('--flush-interval', type=float, default=0.05,
+                        help='Seconds after which buffered messages are written (default: 0.05)')
+    parser.add_argument('--mode', type=lambda value: int(value, 8),
+                        help='Permissions of the socket file in octal, like 660')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    relay = SyslogRelay(args.socket, build_upstream(args), batch_size=args.batch_size, mode=args.mode)
+    signal.signal(signal.SIGTERM, lambda signum, frame: relay.stop())
+    try:
+        relay.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        relay.close()
+
+
+if __name__ == '__main__':
+    main()
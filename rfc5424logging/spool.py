@@ -0,0 +1,383 @@
+import errno
+import mmap
+import os
+import struct
+import threading
+from collections import deque
+
+from rfc5424logging.writer import print_error
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# When spooled messages are forced to disk
+FSYNC_NEVER = 1
+FSYNC_SEGMENT = 2
+FSYNC_ALWAYS = 3
+
+SEGMENT_SUFFIX = '.spool'
+# Held locked by the process that uses the spool directory
+LOCK_FILE = '.lock'
+# Every spooled message is prefixed with its length
+LENGTH = struct.Struct('>I')
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+class Spool(object):
+    """
+    Stores syslog messages on disk in append-only segment files.
+
+    Messages are appended to the active segment, which is sealed once it reaches
+    ``segment_size`` bytes. Sealed segments are replayed oldest first by reading them
+    through ``mmap`` and deleted once all of their messages are sent. When the spool
+    grows beyond ``max_size`` bytes, the oldest segments are evicted and their
+    messages are lost.
+
+    Segments left behind by a previous process are picked up and replayed as well.
+    Messages are sent at least once: a segment that was partly sent when the process
+    stopped is replayed from the start.
+
+    Only one process can use a spool directory at a time. It's locked with ``flock()``
+    where available and opening it in another process raises a ``ValueError``. Processes
+    that fork after creating the spool share the lock, so give each worker process its
+    own directory and create the spool after forking.
+    """
+
+    def __init__(self, directory, segment_size=16 * 1024 * 1024, max_size=1024 * 1024 * 1024, fsync=FSYNC_SEGMENT):
+        """
+        Args:
+            directory (str):
+                The directory the segment files are stored in. It's created when it doesn't exist.
+            segment_size (int):
+                The size in bytes from which on a segment is sealed and a new one is started.
+            max_size (int):
+                The maximum number of bytes in the spool.
+            fsync (int):
+                One of the ``FSYNC_*`` values. ``FSYNC_ALWAYS`` forces every message to disk,
+                ``FSYNC_SEGMENT`` forces a segment to disk when it's sealed and ``FSYNC_NEVER``
+                leaves it up to the operating system.
+        """
+        if fsync not in (FSYNC_NEVER, FSYNC_SEGMENT, FSYNC_ALWAYS):
+            raise ValueError("Fsync policy is not valid")
+        if segment_size < 1 or max_size < segment_size:
+            raise ValueError("Segment size must be at least 1 and not larger than the maximum size")
+
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_size = max_size
+        self.fsync = fsync
+        self.size = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.evicted = 0
+
+        self._lock = threading.Lock()
+        # Sealed segments, oldest first, and their sizes
+        self._segments = deque()
+        self._sizes = {}
+        # Position up to which the oldest segment was sent
+        self._offset = 0
+        self._file = None
+        self._active = None
+        self._active_size = 0
+        self._sequence = 0
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._lock_file = self._lock_directory(directory)
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith(SEGMENT_SUFFIX):
+                continue
+            try:
+                sequence = int(name[:-len(SEGMENT_SUFFIX)])
+            except ValueError:
+                continue
+            path = os.path.join(directory, name)
+            self._segments.append(path)
+            self._sizes[path] = os.path.getsize(path)
+            self.size += self._sizes[path]
+            self._sequence = max(self._sequence, sequence + 1)
+
+    @staticmethod
+    def _lock_directory(directory):
+        lock_file = open(os.path.join(directory, LOCK_FILE), 'a')
+        if fcntl is None:
+            return lock_file
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except (OSError, IOError) as e:
+            lock_file.close()
+            if e.errno in (errno.EAGAIN, errno.EACCES, errno.EWOULDBLOCK):
+                raise ValueError("Spool directory %s is used by another process" % directory)
+            raise
+        return lock_file
+
+    @property
+    def pending(self):
+        """
+        Whether there are messages waiting to be replayed.
+        """
+        return self.size > 0
+
+    def append(self, syslog_msg):
+        self.append_many([syslog_msg])
+
+    def append_many(self, syslog_msgs):
+        with self._lock:
+            if self._file is None:
+                self._active = os.path.join(self.directory, '%020d%s' % (self._sequence, SEGMENT_SUFFIX))
+                self._sequence += 1
+                self._file = open(self._active, 'ab')
+                self._active_size = 0
+            for syslog_msg in syslog_msgs:
+                self._file.write(LENGTH.pack(len(syslog_msg)))
+                self._file.write(syslog_msg)
+                size = LENGTH.size + len(syslog_msg)
+                self._active_size += size
+                self.size += size
+            self.spooled += len(syslog_msgs)
+
+            if self.fsync == FSYNC_ALWAYS:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            if self._active_size >= self.segment_size:
+                self._seal()
+            self._evict()
+
+    def _seal(self):
+        # Only called while holding the lock
+        if self._file is None:
+            return
+        self._file.flush()
+        if self.fsync != FSYNC_NEVER:
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        self._segments.append(self._active)
+        self._sizes[self._active] = self._active_size
+        self._active_size = 0
+
+    def _evict(self):
+        # Only called while holding the lock
+        while self.size > self.max_size and self._segments:
+            path = self._segments.popleft()
+            self.size -= self._sizes.pop(path)
+            self._offset = 0
+            self.evicted += 1
+            _remove(path)
+
+    def _next_segment(self):
+        with self._lock:
+            if not self._segments:
+                if not self._active_size:
+                    return None, 0
+                # Replay the messages in the active segment as well
+                self._seal()
+            return self._segments[0], self._offset
+
+    def _sent(self, path, offset, count):
+        """
+        Records that the messages of the segment up to offset are sent.
+
+        Returns ``False`` when the segment was evicted in the meantime.
+        """
+        with self._lock:
+            if not self._segments or self._segments[0] != path:
+                return False
+            self._offset = offset
+            self.replayed += count
+            return True
+
+    def _done(self, path):
+        with self._lock:
+            if self._segments and self._segments[0] == path:
+                self._segments.popleft()
+                self.size -= self._sizes.pop(path)
+                self._offset = 0
+                _remove(path)
+
+    def replay(self, send, batch_size=100, stopped=None):
+        """
+        Calls ``send`` with lists of at most ``batch_size`` spooled messages, oldest first,
+        until the spool is empty or ``stopped()`` returns True before a batch.
+
+        When ``send`` raises, the exception is propagated and the messages it was called
+        with are replayed again on the next call.
+        """
+        while True:
+            if stopped is not None and stopped():
+                return
+            path, offset = self._next_segment()
+            if path is None:
+                return
+            try:
+                segment = open(path, 'rb')
+            except (OSError, IOError) as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                # Evicted or removed by someone else
+                self._done(path)
+                continue
+            with segment:
+                size = os.fstat(segment.fileno()).st_size
+                if size > offset:
+                    data = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+                    try:
+                        if not self._replay_segment(path, data, offset, size, send, batch_size, stopped):
+                            continue
+                    finally:
+                        data.close()
+            self._done(path)
+
+    def _replay_segment(self, path, data, offset, size, send, batch_size, stopped):
+        while offset < size:
+            if stopped is not None and stopped():
+                # The rest of the segment is replayed later
+                return False
+            batch = []
+            end = offset
+            while len(batch) < batch_size and end + LENGTH.size <= size:
+                length, = LENGTH.unpack_from(data, end)
+                start = end + LENGTH.size
+                if start + length > size:
+                    # The last message was cut off, the process stopped while writing it
+                    break
+                batch.append(data[start:start + length])
+                end = start + length
+            if not batch:
+                break
+            send(batch)
+            if not self._sent(path, end, len(batch)):
+                return False
+            offset = end
+        return True
+
+    def stats(self):
+        return {
+            'spooled': self.spooled,
+            'replayed': self.replayed,
+            'evicted_segments': self.evicted,
+            'spool_bytes': self.size,
+        }
+
+    def close(self):
+        """
+        Seals the active segment and unlocks the directory. The spooled messages stay on disk.
+        """
+        with self._lock:
+            self._seal()
+            if self._lock_file is not None:
+                # Closing the file releases the lock
+                self._lock_file.close()
+                self._lock_file = None
+
+
+class SpoolingTransport(object):
+    """
+    Wraps a transport and spools the messages it fails to send.
+
+    A background thread replays the spool once the transport works again. While
+    there are spooled messages, new messages are spooled as well so they are sent in
+    order.
+    """
+
+    def __init__(self, transport, spool, retry_interval=1, batch_size=100, error_handler=print_error):
+        """
+        Args:
+            transport:
+                The transport used to send the messages.
+            spool (Spool):
+                Where messages are stored that can't be sent.
+            retry_interval (float):
+                The number of seconds to wait before replaying again after a failure.
+            batch_size (int):
+                The maximum number of messages replayed together.
+            error_handler (callable):
+                Called without arguments from within an ``except`` block when sending fails and
+                messages start being spooled.
+        """
+        self.transport = transport
+        self.spool = spool
+        self.retry_interval = retry_interval
+        self.batch_size = batch_size
+        self.error_handler = error_handler
+        self.replay_errors = 0
+
+        # Serializes the use of the transport between the logging threads and the replay thread
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rfc5424logging-spool')
+        self._thread.daemon = True
+        self._thread.start()
+        if spool.pending:
+            self._wakeup.set()
+
+    def transmit(self, syslog_msg):
+        self.transmit_many([syslog_msg])
+
+    def transmit_many(self, syslog_msgs):
+        if not self.spool.pending:
+            with self._lock:
+                try:
+                    self.transport.transmit_many(syslog_msgs)
+                    return
+                except Exception:
+                    self.error_handler()
+        self.spool.append_many(syslog_msgs)
+        self._wakeup.set()
+
+    def _send(self, syslog_msgs):
+        with self._lock:
+            self.transport.transmit_many(syslog_msgs)
+            self.transport.flush()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                return
+            try:
+                self.spool.replay(self._send, self.batch_size, self._stopped.is_set)
+            except Exception:
+                # Not reported, failing to send was already reported when spooling started
+                self.replay_errors += 1
+                self._stopped.wait(self.retry_interval)
+                self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            self.transport.flush()
+
+    def stats(self):
+        stats = self.spool.stats()
+        stats['replay_errors'] = self.replay_errors
+        transport_stats = getattr(self.transport, 'stats', None)
+        if transport_stats is not None:
+            stats.update(transport_stats())
+        return stats
+
+    def close(self):
+        """
+        Stops replaying and closes the transport. Spooled messages are replayed by the next
+        process using the same spool directory.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        try:
+            with self._lock:
+                self.transport.close()
+        finally:
+            self.spool.close()
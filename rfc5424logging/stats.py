@@ -0,0 +1,104 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+timer = getattr(time, 'perf_counter', time.time)
+
+# Upper bounds of the latency histogram buckets in seconds
+LATENCY_BUCKETS = (
+    0.000001, 0.0000025, 0.000005,
+    0.00001, 0.000025, 0.00005,
+    0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5,
+    1, 2.5, 5, 10,
+)
+
+
+class Histogram(object):
+    """
+    Counts observed values in fixed buckets.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # The last count is for values above the highest bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, fraction):
+        """
+        Returns the upper bound of the bucket holding the given fraction of the values.
+        """
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def snapshot(self):
+        return OrderedDict([
+            ('count', self.count),
+            ('sum', self.sum),
+            ('p50', self.percentile(0.5)),
+            ('p99', self.percentile(0.99)),
+            ('buckets', list(zip(self.buckets + (float('inf'),), self.counts))),
+        ])
+
+
+class HandlerStats(object):
+    """
+    Counters and latency histograms of a handler.
+
+    Updated by the thread that logs and, in queued mode, by the writer thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = 0
+        self.bytes = 0
+        self.build_errors = 0
+        self.send_errors = 0
+        self.build_latency = Histogram()
+        self.transmit_latency = Histogram()
+
+    def record_build(self, seconds, size):
+        with self._lock:
+            self.records += 1
+            self.bytes += size
+            self.build_latency.observe(seconds)
+
+    def record_build_error(self):
+        with self._lock:
+            self.build_errors += 1
+
+    def record_transmit(self, seconds):
+        with self._lock:
+            self.transmit_latency.observe(seconds)
+
+    def record_send_error(self):
+        with self._lock:
+            self.send_errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            return OrderedDict([
+                ('records', self.records),
+                ('bytes', self.bytes),
+                ('build_errors', self.build_errors),
+                ('send_errors', self.send_errors),
+                ('build_latency', self.build_latency.snapshot()),
+                ('transmit_latency', self.transmit_latency.snapshot()),
+            ])
@@ -0,0 +1,55 @@
+import math
+from datetime import datetime
+
+
+class TimestampFormatter(object):
+    """
+    Formats record timestamps as RFC5424 ``TIMESTAMP`` values in a fixed timezone.
+
+    Building a timezone aware datetime is by far the most expensive part of formatting
+    a timestamp, while the date, time and UTC offset only change once per second.
+    The formatted ``YYYY-MM-DDTHH:MM:SS`` part and the offset are therefore cached for
+    the last seen second and only the fractional part is formatted per record.
+    Because the offset is recomputed for every new second, DST transitions are
+    handled the same way as ``datetime.fromtimestamp()`` does.
+    """
+
+    def __init__(self, tz):
+        """
+        Args:
+            tz (datetime.tzinfo):
+                The timezone the timestamps are rendered in.
+        """
+        self.tz = tz
+        self._cache = (None, None, None)
+
+    def _format_second(self, seconds):
+        isoformat = datetime.fromtimestamp(seconds, self.tz).isoformat()
+        # Without microseconds, the isoformat is 'YYYY-MM-DDTHH:MM:SS' followed by the offset
+        return isoformat[:19], isoformat[19:]
+
+    def format(self, created):
+        """
+        Returns the encoded timestamp for a POSIX timestamp like ``LogRecord.created``.
+        """
+        # Same rounding as datetime.fromtimestamp()
+        fraction, seconds = math.modf(created)
+        seconds = int(seconds)
+        microsecond = int(round(fraction * 1e6))
+        if microsecond >= 1000000:
+            seconds += 1
+            microsecond -= 1000000
+        elif microsecond < 0:
+            seconds -= 1
+            microsecond += 1000000
+
+        cached_seconds, date_time, offset = self._cache
+        if cached_seconds != seconds:
+            date_time, offset = self._format_second(seconds)
+            self._cache = (seconds, date_time, offset)
+
+        if microsecond:
+            timestamp = '%s.%06d%s' % (date_time, microsecond, offset)
+        else:
+            timestamp = date_time + offset
+        return timestamp.encode('ascii')
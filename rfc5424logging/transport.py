@@ -1,7 +1,20 @@
+import errno
 import io
+import os
+import random
 import socket
 import ssl
 import sys
+import threading
+import time
+
+from rfc5424logging.writer import print_error
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:  # pragma: no cover
+    ctypes = None
 
 if sys.version_info.major == 3:
     text_stream_types = io.TextIOBase
@@ -16,17 +29,333 @@ SYSLOG_PORT = 514
 FRAMING_OCTET_COUNTING = 1
 FRAMING_NON_TRANSPARENT = 2
 
+# How MultiEndpointTransport spreads the messages over the servers
+BALANCE_ROUND_ROBIN = 1
+BALANCE_LEAST_BYTES = 2
+BALANCE_FAILOVER = 3
+
+monotonic = getattr(time, 'monotonic', time.time)
+
+# Maximum number of datagrams the kernel accepts in a single sendmmsg() call (UIO_MAXIOV)
+SENDMMSG_MAX_DATAGRAMS = 1024
+# Maximum number of buffers the kernel accepts in a single sendmsg() call (IOV_MAX)
+SENDMSG_MAX_BUFFERS = 1024
+# Messages of at least this many bytes are sent with sendmsg() instead of being copied
+# together with their framing first. For smaller messages, copying is cheaper.
+SCATTER_GATHER_MIN_SIZE = 8192
+
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+
+def _load_sendmmsg():
+    if ctypes is None or not sys.platform.startswith('linux'):
+        return None, None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        sendmmsg = libc.sendmmsg
+    except (OSError, AttributeError):
+        return None, None
+
+    class IOVec(ctypes.Structure):
+        _fields_ = [
+            ('iov_base', ctypes.c_void_p),
+            ('iov_len', ctypes.c_size_t),
+        ]
+
+    class MsgHdr(ctypes.Structure):
+        _fields_ = [
+            ('msg_name', ctypes.c_void_p),
+            ('msg_namelen', ctypes.c_uint32),
+            ('msg_iov', ctypes.POINTER(IOVec)),
+            ('msg_iovlen', ctypes.c_size_t),
+            ('msg_control', ctypes.c_void_p),
+            ('msg_controllen', ctypes.c_size_t),
+            ('msg_flags', ctypes.c_int),
+        ]
+
+    class MMsgHdr(ctypes.Structure):
+        _fields_ = [
+            ('msg_hdr', MsgHdr),
+            ('msg_len', ctypes.c_uint),
+        ]
+
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return sendmmsg, (IOVec, MMsgHdr)
+
+
+_sendmmsg, _sendmmsg_structs = _load_sendmmsg()
+HAS_SENDMMSG = _sendmmsg is not None
+
+
+def sendmmsg(sock, datagrams):
+    """
+    Sends datagrams over a connected socket with as few ``sendmmsg()`` system calls as possible.
+
+    Returns the number of datagrams that were sent. That's less than the number of datagrams
+    when the socket buffer is full, in which case the caller should send the rest some other way.
+    An ``OSError`` has a ``sent`` attribute with the number of datagrams sent before the error.
+    """
+    iovec_type, mmsghdr_type = _sendmmsg_structs
+    count = len(datagrams)
+    iovecs = (iovec_type * count)()
+    msgvec = (mmsghdr_type * count)()
+    for i, datagram in enumerate(datagrams):
+        # The datagrams list keeps the buffers alive during the call
+        iovecs[i].iov_base = ctypes.cast(ctypes.c_char_p(datagram), ctypes.c_void_p)
+        iovecs[i].iov_len = len(datagram)
+        msgvec[i].msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+        msgvec[i].msg_hdr.msg_iovlen = 1
+
+    fd = sock.fileno()
+    sent = 0
+    while sent < count:
+        vlen = min(count - sent, SENDMMSG_MAX_DATAGRAMS)
+        result = _sendmmsg(fd, ctypes.addressof(msgvec) + sent * ctypes.sizeof(mmsghdr_type), vlen, 0)
+        if result < 0:
+            error = ctypes.get_errno()
+            if error == errno.EINTR:
+                continue
+            if error in (errno.EAGAIN, errno.EWOULDBLOCK):
+                break
+            exception = OSError(error, os.strerror(error))
+            exception.sent = sent
+            raise exception
+        sent += result
+    return sent
+
+
+def frame_message(syslog_msg, framing):
+    # RFC6587 framing
+    if framing == FRAMING_NON_TRANSPARENT:
+        if b"\n" in syslog_msg:
+            syslog_msg = syslog_msg.replace(b"\n", b"\\n")
+        syslog_msg = b"".join((syslog_msg, b"\n"))
+    else:
+        syslog_msg = b" ".join((str(len(syslog_msg)).encode("ascii"), syslog_msg))
+    return syslog_msg
+
+
+def frame_buffers(syslog_msg, framing):
+    """
+    Same as ``frame_message()``, but returns the framing and the message as separate
+    buffers instead of copying them together.
+    """
+    if framing == FRAMING_NON_TRANSPARENT:
+        if b"\n" in syslog_msg:
+            syslog_msg = syslog_msg.replace(b"\n", b"\\n")
+        return syslog_msg, b"\n"
+    return str(len(syslog_msg)).encode("ascii") + b" ", syslog_msg
+
+
+def sendmsg_all(sock, buffers):
+    """
+    Sends all buffers like ``sock.sendall(b"".join(buffers))`` would, but without joining them.
+    """
+    buffers = [memoryview(buffer) for buffer in buffers]
+    index = 0
+    while index < len(buffers):
+        sent = sock.sendmsg(buffers[index:index + SENDMSG_MAX_BUFFERS])
+        # Skip what was sent, the kernel might not have taken everything
+        while index < len(buffers) and sent >= len(buffers[index]):
+            sent -= len(buffers[index])
+            index += 1
+        if sent:
+            buffers[index] = buffers[index][sent:]
+
+
+def build_ssl_context(tls_ca_bundle, tls_verify, tls_client_cert, tls_client_key, tls_key_password):
+    context = ssl.create_default_context(
+        purpose=ssl.Purpose.SERVER_AUTH, cafile=tls_ca_bundle
+    )
+    # Hostname checking has to be turned off before certificate verification can be
+    context.check_hostname = bool(tls_verify)
+    context.verify_mode = ssl.CERT_REQUIRED if tls_verify else ssl.CERT_NONE
+    if tls_client_cert:
+        context.load_cert_chain(
+            tls_client_cert, tls_client_key, tls_key_password
+        )
+    return context
+
+
+class RepeatingTimer(object):
+    """
+    Calls ``callback`` every ``interval`` seconds from a background thread until stopped.
+    """
+
+    def __init__(self, interval, callback):
+        self.interval = interval
+        self.callback = callback
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rfc5424logging-timer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.callback()
+            except Exception:
+                print_error()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+class ConnectionUnavailable(socket.error):
+    """
+    Raised instead of sending while the connection is down and being restored in the background.
+    """
+
+
+class CircuitBreaker(object):
+    """
+    Keeps logging threads from waiting on a connection that is down.
+
+    Once tripped, the breaker is open: ``check()`` raises ``ConnectionUnavailable`` right
+    away and a background thread calls ``connect`` with exponentially growing delays
+    until it succeeds, which closes the breaker again.
+
+    ``rejected`` counts the messages that were dropped while the breaker was open. Only the
+    error that tripped the breaker is reported, not every rejected message.
+    """
+
+    def __init__(self, connect, initial_delay=0.1, max_delay=30, jitter=0.5, error_handler=print_error):
+        """
+        Args:
+            connect (callable):
+                Restores the connection, raises when that fails.
+            initial_delay (float):
+                The number of seconds to wait before the first attempt to reconnect.
+            max_delay (float):
+                The maximum number of seconds between attempts. The delay doubles after every
+                failed attempt until it reaches this.
+            jitter (float):
+                The fraction by which each delay is randomly shortened, so many processes that
+                lost their connection at the same time don't all reconnect at the same time.
+            error_handler (callable):
+                Called while handling the error that opened the breaker.
+        """
+        self.connect = connect
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.error_handler = error_handler
+        self.trips = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._healthy = threading.Event()
+        self._healthy.set()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def is_open(self):
+        return not self._healthy.is_set()
+
+    def check(self, count=1):
+        """
+        Raises ``ConnectionUnavailable`` while the breaker is open, counting ``count`` rejected messages.
+        """
+        if not self._healthy.is_set():
+            with self._lock:
+                self.rejected += count
+            raise ConnectionUnavailable("Connection is down, reconnecting in the background")
+
+    def delay(self, attempt):
+        delay = min(self.max_delay, self.initial_delay * 2 ** attempt)
+        return delay * (1 - self.jitter * random.random())
+
+    def trip(self):
+        """
+        Opens the breaker and starts reconnecting in the background.
+
+        Call it while handling the error that broke the connection. That error is reported
+        when the breaker wasn't open yet.
+        """
+        opened = False
+        with self._lock:
+            self._healthy.clear()
+            if self._thread is None and not self._stopped.is_set():
+                self.trips += 1
+                self._thread = threading.Thread(target=self._run, name='rfc5424logging-reconnect')
+                self._thread.daemon = True
+                self._thread.start()
+                opened = True
+        if opened:
+            self.error_handler()
+
+    def _run(self):
+        attempt = 0
+        while not self._stopped.wait(self.delay(attempt)):
+            try:
+                self.connect()
+            except Exception:
+                attempt += 1
+                continue
+            with self._lock:
+                self._thread = None
+                self._healthy.set()
+            return
+
+    def stats(self):
+        return {'breaker_open': self.is_open, 'breaker_trips': self.trips, 'breaker_rejected': self.rejected}
+
+    def stop(self):
+        self._stopped.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
 
 class TCPSocketTransport:
-    def __init__(self, address, timeout, framing):
+    """
+    Sends framed messages over a TCP connection.
+
+    When ``buffer_size`` is set, framed messages are collected in a buffer that is sent
+    once it holds ``buffer_size`` bytes, when ``flush()`` is called or at the latest
+    after ``flush_interval`` seconds.
+
+    By default, a failed send reconnects right away and sends again. When ``reconnect_delay``
+    is set, a failed send trips a ``CircuitBreaker`` instead: the error is reported once and
+    messages are rejected with ``ConnectionUnavailable`` while a background thread reconnects
+    with exponential backoff.
+    """
+
+    def __init__(
+        self, address, timeout, framing, buffer_size=None, flush_interval=None,
+        reconnect_delay=None, reconnect_max_delay=30,
+    ):
         self.socket = None
         self.address = address
         self.timeout = timeout
         self.framing = framing
-        self.open()
+        self.buffer_size = buffer_size
+        self.reconnects = 0
+        self._buffer = bytearray()
+        self._lock = threading.RLock()
+        self.breaker = None
+        if reconnect_delay is None:
+            self.open()
+        else:
+            self.breaker = CircuitBreaker(self.reconnect, reconnect_delay, reconnect_max_delay)
+            try:
+                self.open()
+            except (OSError, IOError):
+                # The server might not be up yet, keep trying in the background
+                self.breaker.trip()
+        self._flush_timer = None
+        if buffer_size and flush_interval:
+            self._flush_timer = RepeatingTimer(flush_interval, self.flush)
 
-    def open(self):
+    def connect(self):
+        """
+        Returns a new socket that is connected to the server.
+        """
         error = None
+        sock = None
         host, port = self.address
         addrinfo = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
         if not addrinfo:
@@ -34,39 +363,166 @@ class TCPSocketTransport:
         for entry in addrinfo:
             family, socktype, _, _, sockaddr = entry
             try:
-                self.socket = socket.socket(family, socktype)
-                self.socket.settimeout(self.timeout)
-                self.socket.connect(sockaddr)
+                sock = socket.socket(family, socktype)
+                sock.settimeout(self.timeout)
+                sock.connect(sockaddr)
                 # Connected successfully. Erase any previous errors.
                 error = None
                 break
             except OSError as e:
                 error = e
-                if self.socket is not None:
-                    self.socket.close()
+                if sock is not None:
+                    sock.close()
         if error is not None:
             raise error
+        return sock
 
-    def transmit(self, syslog_msg):
-        # RFC6587 framing
+    def open(self):
+        self.socket = self.connect()
+
+    def frame(self, syslog_msg):
+        return frame_message(syslog_msg, self.framing)
+
+    def append_framed(self, syslog_msg):
+        # Same as frame(), but without creating intermediate strings
+        buffer = self._buffer
         if self.framing == FRAMING_NON_TRANSPARENT:
-            syslog_msg = syslog_msg.replace(b"\n", b"\\n")
-            syslog_msg = b"".join((syslog_msg, b"\n"))
+            if b"\n" in syslog_msg:
+                syslog_msg = syslog_msg.replace(b"\n", b"\\n")
+            buffer += syslog_msg
+            buffer += b"\n"
         else:
-            syslog_msg = b" ".join((str(len(syslog_msg)).encode("ascii"), syslog_msg))
+            buffer += str(len(syslog_msg)).encode("ascii")
+            buffer += b" "
+            buffer += syslog_msg
+
+    def close_socket(self):
+        if self.socket is not None:
+            self.socket.close()
+
+    def reconnect(self):
+        """
+        Replaces the socket with a new connection. Used by the background thread of the breaker.
+        """
+        with self._lock:
+            self.close_socket()
+        # Connect without holding the lock, a flush doesn't have to wait for the connection to time out
+        sock = self.connect()
+        with self._lock:
+            self.socket = sock
+            self.reconnects += 1
+
+    def scatter_gather(self, size):
+        """
+        Returns whether ``size`` bytes of messages should be sent as separate buffers with ``sendmsg()``.
+        """
+        # SSL sockets don't support sendmsg()
+        return size >= SCATTER_GATHER_MIN_SIZE and HAS_SENDMSG and not isinstance(self.socket, ssl.SSLSocket)
+
+    def write(self, data):
+        if isinstance(data, list):
+            sendmsg_all(self.socket, data)
+        else:
+            self.socket.sendall(data)
+
+    def send(self, data):
+        """
+        Sends bytes, or a list of buffers with ``sendmsg()``.
+        """
+        if self.breaker is not None:
+            # The lock keeps the background thread from swapping the socket while writing
+            with self._lock:
+                self.breaker.check()
+                try:
+                    self.write(data)
+                except (OSError, IOError):
+                    # The breaker reports the error
+                    self.breaker.trip()
+                    raise ConnectionUnavailable("Sending failed, reconnecting in the background")
+            return
 
         try:
-            self.socket.sendall(syslog_msg)
+            self.write(data)
         except (OSError, IOError):
-            self.close()
+            self.close_socket()
+            self.reconnects += 1
             self.open()
-            self.socket.sendall(syslog_msg)
+            self.write(data)
+
+    def transmit(self, syslog_msg):
+        if self.breaker is not None:
+            # Don't collect messages in the buffer while they can't be sent
+            self.breaker.check()
+        if self.buffer_size is None:
+            if self.scatter_gather(len(syslog_msg)):
+                self.send(list(frame_buffers(syslog_msg, self.framing)))
+            else:
+                self.send(self.frame(syslog_msg))
+            return
+        with self._lock:
+            self.append_framed(syslog_msg)
+            if len(self._buffer) >= self.buffer_size:
+                self.flush()
+
+    def transmit_many(self, syslog_msgs):
+        if self.breaker is not None:
+            self.breaker.check(len(syslog_msgs))
+        if self.buffer_size is None:
+            # Coalesce all framed messages into a single write
+            if self.scatter_gather(sum(len(syslog_msg) for syslog_msg in syslog_msgs)):
+                buffers = []
+                for syslog_msg in syslog_msgs:
+                    buffers.extend(frame_buffers(syslog_msg, self.framing))
+                self.send(buffers)
+            else:
+                self.send(b"".join([self.frame(syslog_msg) for syslog_msg in syslog_msgs]))
+            return
+        with self._lock:
+            for syslog_msg in syslog_msgs:
+                self.append_framed(syslog_msg)
+            if len(self._buffer) >= self.buffer_size:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._buffer:
+                return
+            try:
+                self.send(self._buffer)
+            finally:
+                # The buffer is reused. When sending failed, the messages are lost
+                # like they are when sending a single message fails.
+                del self._buffer[:]
+
+    def pending_bytes(self):
+        return len(self._buffer)
+
+    def stats(self):
+        stats = {'reconnects': self.reconnects}
+        if self.breaker is not None:
+            stats.update(self.breaker.stats())
+        return stats
 
     def close(self):
-        self.socket.close()
+        if self._flush_timer is not None:
+            self._flush_timer.stop()
+        if self.breaker is not None:
+            self.breaker.stop()
+        try:
+            self.flush()
+        finally:
+            self.close_socket()
 
 
 class TLSSocketTransport(TCPSocketTransport):
+    """
+    Sends framed messages over a TLS connection.
+
+    The ``SSLContext`` is built once and reused for every connection until
+    ``reload_context()`` is called. Reconnects resume the previous TLS session when
+    the server allows it, which saves the server a full handshake.
+    """
+
     def __init__(
         self,
         address,
@@ -77,47 +533,110 @@ class TLSSocketTransport(TCPSocketTransport):
         tls_client_cert,
         tls_client_key,
         tls_key_password,
+        buffer_size=None,
+        flush_interval=None,
+        reconnect_delay=None,
+        reconnect_max_delay=30,
     ):
         self.tls_ca_bundle = tls_ca_bundle
         self.tls_verify = tls_verify
         self.tls_client_cert = tls_client_cert
         self.tls_client_key = tls_client_key
         self.tls_key_password = tls_key_password
-        super(TLSSocketTransport, self).__init__(address, timeout, framing=framing)
+        self.context = None
+        self.session = None
+        self.sessions_reused = 0
+        super(TLSSocketTransport, self).__init__(
+            address, timeout, framing=framing, buffer_size=buffer_size, flush_interval=flush_interval,
+            reconnect_delay=reconnect_delay, reconnect_max_delay=reconnect_max_delay,
+        )
 
-    def open(self):
-        super(TLSSocketTransport, self).open()
-        context = ssl.create_default_context(
-            purpose=ssl.Purpose.SERVER_AUTH, cafile=self.tls_ca_bundle
+    def reload_context(self):
+        """
+        Builds the ``SSLContext`` again from the ``tls_*`` attributes, for example after the
+        certificates were rotated. The new context is used from the next connection on.
+        """
+        context = build_ssl_context(
+            self.tls_ca_bundle, self.tls_verify, self.tls_client_cert, self.tls_client_key, self.tls_key_password
         )
-        context.verify_mode = ssl.CERT_REQUIRED if self.tls_verify else ssl.CERT_NONE
+        # Sessions can't be resumed with another context
+        self.context, self.session = context, None
+
+    def connect(self):
+        if self.context is None:
+            self.reload_context()
+        context, session = self.context, self.session
+        sock = super(TLSSocketTransport, self).connect()
         server_hostname, _ = self.address
-        if self.tls_client_cert:
-            context.load_cert_chain(
-                self.tls_client_cert, self.tls_client_key, self.tls_key_password
-            )
-        self.socket = context.wrap_socket(self.socket, server_hostname=server_hostname)
+        kwargs = {'server_hostname': server_hostname}
+        if session is not None:
+            kwargs['session'] = session
+        try:
+            sock = context.wrap_socket(sock, **kwargs)
+        except Exception:
+            sock.close()
+            raise
+        if getattr(sock, 'session_reused', False):
+            self.sessions_reused += 1
+        self.save_session(sock)
+        return sock
+
+    def save_session(self, sock):
+        session = getattr(sock, 'session', None)
+        if session is not None and session.has_ticket:
+            self.session = session
 
+    def close_socket(self):
+        if isinstance(self.socket, ssl.SSLSocket):
+            # TLS 1.3 servers send the session ticket after the handshake. It's only
+            # processed when reading, which the transport otherwise never does.
+            try:
+                self.socket.setblocking(False)
+                self.socket.recv(1024)
+            except (OSError, IOError, ValueError):
+                pass
+            self.save_session(self.socket)
+        super(TLSSocketTransport, self).close_socket()
 
-class UDPSocketTransport:
-    def __init__(self, address, timeout):
+    def stats(self):
+        stats = super(TLSSocketTransport, self).stats()
+        stats['tls_sessions_reused'] = self.sessions_reused
+        return stats
+
+
+class UDPSocketTransport(object):
+    def __init__(self, address, timeout, connect=False, resolve_ttl=None):
         self.socket = None
+        self.host_address = address
         self.address = address
         self.timeout = timeout
+        self.connect = connect
+        self.resolve_ttl = resolve_ttl
+        self.connection_refused = 0
+        self.reconnects = 0
+        self.resolved_at = None
         self.open()
 
-    def open(self):
-        error = None
-        host, port = self.address
+    def resolve(self):
+        host, port = self.host_address
         addrinfo = socket.getaddrinfo(host, port, 0, socket.SOCK_DGRAM)
         if not addrinfo:
             raise OSError("getaddrinfo returns an empty list")
-        for entry in addrinfo:
+        self.resolved_at = monotonic()
+        return addrinfo
+
+    def open(self):
+        error = None
+        for entry in self.resolve():
             family, socktype, _, _, sockaddr = entry
             try:
                 self.socket = socket.socket(family, socktype)
                 self.socket.settimeout(self.timeout)
+                if self.connect:
+                    # Lets the kernel do the route lookup once and report ICMP errors
+                    self.socket.connect(sockaddr)
                 self.address = sockaddr
+                error = None
                 break
             except OSError as e:
                 error = e
@@ -126,23 +645,165 @@ class UDPSocketTransport:
         if error is not None:
             raise error
 
-    def transmit(self, syslog_msg):
+    def check_address(self):
+        """
+        Resolves the address again when it's older than ``resolve_ttl`` seconds.
+
+        This way, DNS changes are picked up without recreating the transport.
+        """
+        if self.resolve_ttl is None or monotonic() - self.resolved_at < self.resolve_ttl:
+            return
         try:
-            self.socket.sendto(syslog_msg, self.address)
+            addrinfo = self.resolve()
         except (OSError, IOError):
-            self.close()
+            # Keep using the current address and try again after the next TTL
+            self.resolved_at = monotonic()
+            return
+        family, _, _, _, sockaddr = addrinfo[0]
+        if sockaddr == self.address:
+            return
+        if family != self.socket.family:
+            # The socket can't send to an address of another family
+            self.socket.close()
             self.open()
+        elif self.connect:
+            self.socket.connect(sockaddr)
+            self.address = sockaddr
+        else:
+            self.address = sockaddr
+
+    def send(self, syslog_msg):
+        if self.connect:
+            self.socket.send(syslog_msg)
+        else:
             self.socket.sendto(syslog_msg, self.address)
 
+    def transmit(self, syslog_msg):
+        self.check_address()
+        try:
+            self.send(syslog_msg)
+        except (OSError, IOError) as e:
+            if e.errno == errno.ECONNREFUSED:
+                # A connected socket reports an ICMP port unreachable for an earlier datagram.
+                # This one wasn't sent yet.
+                self.connection_refused += 1
+                self.send(syslog_msg)
+            else:
+                self.close()
+                self.reconnects += 1
+                self.open()
+                self.send(syslog_msg)
+
+    def stats(self):
+        return {'reconnects': self.reconnects, 'connection_refused': self.connection_refused}
+
+    def transmit_many(self, syslog_msgs):
+        sent = 0
+        if self.connect and HAS_SENDMMSG and len(syslog_msgs) > 1:
+            self.check_address()
+            try:
+                sent = sendmmsg(self.socket, syslog_msgs)
+            except (OSError, IOError) as e:
+                # Sending the rest one by one handles the error
+                sent = getattr(e, 'sent', 0)
+        for syslog_msg in syslog_msgs[sent:]:
+            self.transmit(syslog_msg)
+
+    def flush(self):
+        pass
+
     def close(self):
         self.socket.close()
 
 
+class BatchedUDPSocketTransport(UDPSocketTransport):
+    """
+    UDP transport that collects datagrams and sends them in batches.
+
+    On Linux the batches are sent with the ``sendmmsg()`` system call, elsewhere each datagram
+    is still sent separately. A batch is sent when it holds ``batch_count`` datagrams or
+    ``batch_bytes`` bytes, when ``flush()`` is called or at the latest after ``flush_interval``
+    seconds.
+    """
+
+    def __init__(
+            self, address, timeout, batch_count=64, batch_bytes=65536, flush_interval=0.05, resolve_ttl=None
+    ):
+        self.batch_count = batch_count
+        self.batch_bytes = batch_bytes
+        self._batch = []
+        self._batch_size = 0
+        self._lock = threading.RLock()
+        # sendmmsg() is used without destination addresses, so the socket is always connected
+        super(BatchedUDPSocketTransport, self).__init__(address, timeout, connect=True, resolve_ttl=resolve_ttl)
+        self._flush_timer = RepeatingTimer(flush_interval, self.flush) if flush_interval else None
+
+    def transmit(self, syslog_msg):
+        with self._lock:
+            self._batch.append(syslog_msg)
+            self._batch_size += len(syslog_msg)
+            if len(self._batch) >= self.batch_count or self._batch_size >= self.batch_bytes:
+                self.flush()
+
+    def transmit_many(self, syslog_msgs):
+        with self._lock:
+            for syslog_msg in syslog_msgs:
+                self.transmit(syslog_msg)
+
+    def pending_bytes(self):
+        return self._batch_size
+
+    def send_batch(self, datagrams):
+        """
+        Sends the datagrams. An error has a ``sent`` attribute with the number of datagrams
+        that were sent before it.
+        """
+        sent = 0
+        try:
+            if HAS_SENDMMSG:
+                sent = sendmmsg(self.socket, datagrams)
+            for datagram in datagrams[sent:]:
+                self.socket.send(datagram)
+                sent += 1
+        except (OSError, IOError) as e:
+            e.sent = getattr(e, 'sent', 0) + sent
+            raise
+
+    def flush(self):
+        with self._lock:
+            datagrams = self._batch
+            if not datagrams:
+                return
+            self._batch = []
+            self._batch_size = 0
+            self.check_address()
+            try:
+                self.send_batch(datagrams)
+            except (OSError, IOError) as e:
+                if e.errno == errno.ECONNREFUSED:
+                    self.connection_refused += 1
+                else:
+                    self.socket.close()
+                    self.reconnects += 1
+                    self.open()
+                # Don't send the datagrams that went out before the error again
+                self.send_batch(datagrams[getattr(e, 'sent', 0):])
+
+    def close(self):
+        if self._flush_timer is not None:
+            self._flush_timer.stop()
+        try:
+            self.flush()
+        finally:
+            super(BatchedUDPSocketTransport, self).close()
+
+
 class UnixSocketTransport:
     def __init__(self, address, socket_type):
         self.socket = None
         self.address = address
         self.socket_type = socket_type
+        self.reconnects = 0
         self.open()
 
     def open(self):
@@ -168,9 +829,20 @@ class UnixSocketTransport:
             self.socket.send(syslog_msg)
         except (OSError, IOError):
             self.close()
+            self.reconnects += 1
             self.open()
             self.socket.send(syslog_msg)
 
+    def transmit_many(self, syslog_msgs):
+        for syslog_msg in syslog_msgs:
+            self.transmit(syslog_msg)
+
+    def flush(self):
+        pass
+
+    def stats(self):
+        return {'reconnects': self.reconnects}
+
     def close(self):
         self.socket.close()
 
@@ -195,6 +867,180 @@ class StreamTransport:
             syslog_msg = syslog_msg.decode(self.stream.encoding, "replace")
         self.stream.write(syslog_msg)
 
+    def transmit_many(self, syslog_msgs):
+        for syslog_msg in syslog_msgs:
+            self.transmit(syslog_msg)
+
+    def flush(self):
+        self.stream.flush()
+
     def close(self):
         # Closing the stream is left up to the user.
         pass
+
+
+class Endpoint(object):
+    """
+    A server of a ``MultiEndpointTransport`` and its health.
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.transport = None
+        self.failures = 0
+        self.errors = 0
+        self.bytes = 0
+        self.retry_at = 0
+
+    @property
+    def healthy(self):
+        return self.failures == 0
+
+    def pending_bytes(self):
+        pending_bytes = getattr(self.transport, 'pending_bytes', None)
+        return pending_bytes() if pending_bytes is not None else 0
+
+    def stats(self):
+        stats = {'address': self.address, 'healthy': self.healthy, 'bytes': self.bytes, 'errors': self.errors}
+        transport_stats = getattr(self.transport, 'stats', None)
+        if transport_stats is not None:
+            stats.update(transport_stats())
+        return stats
+
+
+class MultiEndpointTransport(object):
+    """
+    Spreads messages over several servers.
+
+    Every call to ``transmit()`` or ``transmit_many()`` goes to a single server, chosen by
+    the strategy:
+
+    * ``BALANCE_ROUND_ROBIN`` takes turns.
+    * ``BALANCE_LEAST_BYTES`` picks the server with the fewest bytes waiting in the buffer
+      of its transport and, among those, the fewest bytes sent.
+    * ``BALANCE_FAILOVER`` sends everything to the first server that works.
+
+    When sending to a server fails, the messages are sent to the next one and the failed
+    server is skipped for ``retry_delay`` seconds, doubling with every failure in a row
+    up to ``retry_max_delay`` seconds. While all servers are skipped, messages are rejected
+    with ``ConnectionUnavailable`` and counted in ``rejected``.
+    """
+
+    def __init__(self, addresses, factory, strategy=BALANCE_ROUND_ROBIN, retry_delay=1, retry_max_delay=30):
+        """
+        Args:
+            addresses (list):
+                The addresses of the servers.
+            factory (callable):
+                Called with an address, returns the transport to that server.
+            strategy (int):
+                One of the ``BALANCE_*`` values.
+            retry_delay (float):
+                The number of seconds a server is skipped after it failed for the first time.
+            retry_max_delay (float):
+                The maximum number of seconds a server is skipped.
+        """
+        if strategy not in (BALANCE_ROUND_ROBIN, BALANCE_LEAST_BYTES, BALANCE_FAILOVER):
+            raise ValueError("Load balancing strategy is not valid")
+        if not addresses:
+            raise ValueError("At least one address is needed")
+
+        self.factory = factory
+        self.strategy = strategy
+        self.rejected = 0
+        self.retry_delay = retry_delay
+        self.retry_max_delay = retry_max_delay
+        self.endpoints = [Endpoint(address) for address in addresses]
+        self._next = 0
+        self._lock = threading.RLock()
+        for endpoint in self.endpoints:
+            # Servers that are down are tried again later
+            self.open(endpoint)
+
+    def open(self, endpoint):
+        try:
+            endpoint.transport = self.factory(endpoint.address)
+        except Exception:
+            self.failed(endpoint)
+            return False
+        return True
+
+    def failed(self, endpoint):
+        endpoint.failures += 1
+        endpoint.errors += 1
+        delay = min(self.retry_max_delay, self.retry_delay * 2 ** (endpoint.failures - 1))
+        endpoint.retry_at = monotonic() + delay
+
+    def candidates(self):
+        """
+        Returns the servers to try, most preferred first.
+        """
+        now = monotonic()
+        endpoints = self.endpoints
+        if self.strategy == BALANCE_ROUND_ROBIN:
+            start = self._next % len(endpoints)
+            self._next += 1
+            endpoints = endpoints[start:] + endpoints[:start]
+        available = [endpoint for endpoint in endpoints if endpoint.healthy or endpoint.retry_at <= now]
+        if self.strategy == BALANCE_LEAST_BYTES:
+            available.sort(key=lambda endpoint: (endpoint.pending_bytes(), endpoint.bytes))
+        return available
+
+    def send(self, send, size, count=1):
+        with self._lock:
+            error = None
+            for endpoint in self.candidates():
+                if endpoint.transport is None and not self.open(endpoint):
+                    continue
+                try:
+                    send(endpoint.transport)
+                except Exception as e:
+                    error = e
+                    self.failed(endpoint)
+                    continue
+                endpoint.failures = 0
+                endpoint.bytes += size
+                return
+            if error is not None:
+                raise error
+            self.rejected += count
+            raise ConnectionUnavailable("All servers are down")
+
+    def transmit(self, syslog_msg):
+        self.send(lambda transport: transport.transmit(syslog_msg), len(syslog_msg))
+
+    def transmit_many(self, syslog_msgs):
+        self.send(
+            lambda transport: transport.transmit_many(syslog_msgs),
+            sum(len(syslog_msg) for syslog_msg in syslog_msgs),
+            len(syslog_msgs),
+        )
+
+    def flush(self):
+        with self._lock:
+            error = None
+            for endpoint in self.endpoints:
+                if endpoint.transport is None:
+                    continue
+                try:
+                    endpoint.transport.flush()
+                except Exception as e:
+                    error = e
+                    self.failed(endpoint)
+            if error is not None:
+                raise error
+
+    def stats(self):
+        return {'endpoints': [endpoint.stats() for endpoint in self.endpoints], 'rejected': self.rejected}
+
+    def close(self):
+        error = None
+        for endpoint in self.endpoints:
+            if endpoint.transport is None:
+                continue
+            try:
+                endpoint.transport.close()
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
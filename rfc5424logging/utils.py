@@ -0,0 +1,40 @@
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    A small, bounded mapping that evicts the least recently used entry.
+
+    Only meant for the internal caches of the handler. Lookups and inserts are
+    safe to use from multiple threads in the sense that they never raise or
+    corrupt the cache; a concurrent eviction simply results in a cache miss.
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            return default
+        self._data[key] = value
+        return value
+
+    def set(self, key, value):
+        self._data[key] = value
+        while len(self._data) > self.maxsize:
+            try:
+                self._data.popitem(last=False)
+            except KeyError:
+                break
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
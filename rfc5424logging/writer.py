@@ -0,0 +1,190 @@
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from rfc5424logging.stats import timer
+
+# What to do when the queue of the writer is full
+OVERFLOW_BLOCK = 1
+OVERFLOW_DROP_NEWEST = 2
+OVERFLOW_DROP_OLDEST = 3
+OVERFLOW_DROP_BELOW_LEVEL = 4
+
+
+def print_error():
+    """
+    Default error handler of the writer. Like ``logging.Handler.handleError``, it only reports
+    the error on stderr when ``logging.raiseExceptions`` is set.
+    """
+    if logging.raiseExceptions and sys.stderr:
+        try:
+            sys.stderr.write('--- Logging error in syslog writer thread ---\n')
+            traceback.print_exc(file=sys.stderr)
+        except (OSError, IOError):
+            pass
+
+
+class QueuedWriter(object):
+    """
+    Sends syslog messages from a background thread.
+
+    Messages are put on a bounded queue and a writer thread takes them off in batches,
+    handing each batch to ``transport.transmit_many()`` so stream transports can send
+    them with a single write.
+    """
+
+    def __init__(
+            self,
+            transport,
+            capacity=10000,
+            overflow=OVERFLOW_BLOCK,
+            overflow_level=logging.WARNING,
+            batch_size=100,
+            error_handler=print_error,
+            stats=None,
+            flush_level=None,
+    ):
+        """
+        Args:
+            transport:
+                The transport used to send the messages.
+            capacity (int):
+                The maximum number of messages waiting to be sent.
+            overflow (int):
+                One of the ``OVERFLOW_*`` values. What to do with a message when the queue is full.
+                ``OVERFLOW_BLOCK`` waits until there is room, ``OVERFLOW_DROP_NEWEST`` discards
+                the message, ``OVERFLOW_DROP_OLDEST`` discards the oldest message in the queue and
+                ``OVERFLOW_DROP_BELOW_LEVEL`` discards the message when its level is below
+                ``overflow_level`` and waits otherwise.
+            overflow_level (int):
+                The level used by ``OVERFLOW_DROP_BELOW_LEVEL``.
+            batch_size (int):
+                The maximum number of messages sent in a single batch.
+            error_handler (callable):
+                Called without arguments from within an ``except`` block when sending a batch fails.
+            stats (rfc5424logging.stats.HandlerStats):
+                Optionally where to record the send latency and errors.
+            flush_level (int):
+                Batches with a message of this level or higher are flushed from the transport right away
+                instead of once the queue is empty. Defaults to ``None``.
+        """
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_BELOW_LEVEL):
+            raise ValueError("Overflow policy is not valid")
+        if capacity < 1 or batch_size < 1:
+            raise ValueError("Capacity and batch size must be at least 1")
+
+        self.transport = transport
+        self.capacity = capacity
+        self.overflow = overflow
+        self.overflow_level = overflow_level
+        self.batch_size = batch_size
+        self.error_handler = error_handler
+        self.stats = stats
+        self.flush_level = flush_level
+        self.dropped = 0
+
+        self._queue = deque()
+        self._in_flight = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+
+        self._thread = threading.Thread(target=self._run, name='rfc5424logging-writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def put(self, syslog_msg, levelno=logging.NOTSET):
+        """
+        Queues a message for sending.
+
+        Returns ``False`` when the message was dropped because the queue was full.
+        """
+        with self._lock:
+            if self._closed:
+                raise ValueError("Writer is closed")
+            if len(self._queue) >= self.capacity:
+                if self.overflow == OVERFLOW_DROP_NEWEST or (
+                        self.overflow == OVERFLOW_DROP_BELOW_LEVEL and levelno < self.overflow_level):
+                    self.dropped += 1
+                    return False
+                elif self.overflow == OVERFLOW_DROP_OLDEST:
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._queue) >= self.capacity and not self._closed:
+                        self._not_full.wait()
+                    if self._closed:
+                        raise ValueError("Writer is closed")
+            # The level decides whether the batch is flushed right away
+            self._queue.append((syslog_msg, levelno))
+            self._not_empty.notify()
+        return True
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._closed:
+                    self._not_empty.wait()
+                if not self._queue:
+                    # Closed and fully drained
+                    return
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._in_flight = len(batch)
+                self._not_full.notify_all()
+
+            start = timer()
+            try:
+                self.transport.transmit_many([syslog_msg for syslog_msg, _ in batch])
+                if not self._queue or self._is_urgent(batch):
+                    # Nothing more to send for now or an important message,
+                    # don't keep messages buffered in the transport
+                    self.transport.flush()
+            except Exception:
+                if self.stats is not None:
+                    self.stats.record_send_error()
+                self.error_handler()
+            else:
+                if self.stats is not None:
+                    self.stats.record_transmit(timer() - start)
+
+            with self._lock:
+                self._in_flight = 0
+                if not self._queue:
+                    self._idle.notify_all()
+
+    def _is_urgent(self, batch):
+        flush_level = self.flush_level
+        return flush_level is not None and any(levelno >= flush_level for _, levelno in batch)
+
+    def flush(self, timeout=None):
+        """
+        Waits until all queued messages have been handed to the transport.
+
+        Returns ``False`` if that did not happen within ``timeout`` seconds.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._lock:
+            while self._queue or self._in_flight:
+                if not self._thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._idle.wait(remaining)
+            return True
+
+    def close(self, timeout=None):
+        """
+        Sends all queued messages and stops the writer thread.
+        """
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout)
@@ -41,5 +41,10 @@ setup(
         'pytest',
         'mock',
     ],
+    entry_points={
+        'console_scripts': [
+            'rfc5424-relay = rfc5424logging.relay:main',
+        ],
+    },
     zip_safe=False,
 )
@@ -1,5 +1,6 @@
 import logging
 import socket
+import sys
 from collections import OrderedDict
 from six import python_2_unicode_compatible
 import pytest
@@ -8,6 +9,10 @@ from mock import patch
 
 from rfc5424logging import Rfc5424SysLogHandler, Rfc5424SysLogAdapter
 
+collect_ignore = []
+if sys.version_info < (3, 7):
+    collect_ignore.append('test_aio.py')
+
 
 class SomeClass:
     def __init__(self):
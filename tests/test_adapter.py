@@ -213,3 +213,25 @@ def test_extras(logger_with_udp_handler):
     # Test invalid extra argument
     with pytest.raises(TypeError):
         adapter = Rfc5424SysLogAdapter(logger, enable_extra_levels=True, extra="i_am_not_a_dict")
+
+
+def test_process_without_overrides(logger_with_udp_handler):
+    logger, _ = logger_with_udp_handler
+    adapter = Rfc5424SysLogAdapter(logger, extra={"a": 1})
+    # The extra dictionary of the adapter isn't copied
+    assert adapter.process("aaaa", {})[1]['extra'] is adapter.extra
+    assert adapter.process("aaaa", {'exc_info': False})[1]['extra'] is adapter.extra
+
+    msg, kwargs = adapter.process("aaaa", {'msgid': 'my_msgid', 'sd': sd1, 'structured_data': sd2})
+    assert kwargs == {'extra': {"a": 1, 'msgid': 'my_msgid', 'structured_data': sd1}}
+    assert adapter.extra == {"a": 1}
+
+
+def test_process_skipped_when_disabled(logger_with_udp_handler):
+    logger, syslog_socket = logger_with_udp_handler
+    logger.setLevel(logging.INFO)
+    adapter = Rfc5424SysLogAdapter(logger)
+    with patch.object(adapter, 'process') as process:
+        adapter.debug(message, msgid='my_msgid')
+    assert process.call_count == 0
+    assert syslog_socket.sendto.call_count == 0
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import socket
+import threading
+
+import pytest
+
+from rfc5424logging import AsyncRfc5424SysLogHandler
+
+
+def get_logger(name, handler):
+    # Not using the logger fixture, it disables connecting sockets
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+    return logger
+
+
+def test_tcp():
+    async def main():
+        received = []
+
+        async def collect(reader, writer):
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                received.append(line)
+
+        server = await asyncio.start_server(collect, '127.0.0.1', 0)
+        sh = AsyncRfc5424SysLogHandler(address=server.sockets[0].getsockname(), socktype=socket.SOCK_STREAM)
+        logger = get_logger('test_aio_tcp', sh)
+        logger.info('from the loop')
+        thread = threading.Thread(target=logger.info, args=('from a thread',))
+        thread.start()
+        thread.join()
+        await sh.drain()
+        await sh.aclose()
+        logger.removeHandler(sh)
+        for _ in range(100):
+            if len(received) == 2:
+                break
+            await asyncio.sleep(0.01)
+        server.close()
+        return received
+
+    received = asyncio.run(main())
+    assert [line.split(b'\xef\xbb\xbf')[1] for line in received] == [b'from the loop\n', b'from a thread\n']
+
+
+def test_udp():
+    async def main():
+        loop = asyncio.get_running_loop()
+        received = loop.create_future()
+
+        class Collector(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                received.set_result(data)
+
+        server, _ = await loop.create_datagram_endpoint(Collector, local_addr=('127.0.0.1', 0))
+        sh = AsyncRfc5424SysLogHandler(address=server.get_extra_info('sockname'))
+        logger = get_logger('test_aio_udp', sh)
+        logger.info('message')
+        data = await asyncio.wait_for(received, 2)
+        await sh.aclose()
+        logger.removeHandler(sh)
+        server.close()
+        return data
+
+    assert asyncio.run(main()).endswith(b'\xef\xbb\xbfmessage')
+
+
+def test_buffer_full():
+    async def main():
+        sh = AsyncRfc5424SysLogHandler(address=('127.0.0.1', 9), socktype=socket.SOCK_STREAM, buffer_size=2)
+        logger = get_logger('test_aio_buffer_full', sh)
+        for _ in range(5):
+            logger.info('message')
+        stats = sh.stats()
+        sh.close()
+        logger.removeHandler(sh)
+        return stats
+
+    stats = asyncio.run(main())
+    assert stats['dropped'] == 3
+    assert stats['records'] == 5
+
+
+def test_no_loop():
+    sh = AsyncRfc5424SysLogHandler(address=('127.0.0.1', 514))
+    with pytest.raises(RuntimeError):
+        sh._in_loop()
+
+
+@pytest.mark.parametrize("kwargs", [{'queue_size': 10}, {'udp_connect': True}])
+def test_unsupported_arguments(kwargs):
+    with pytest.raises(ValueError):
+        AsyncRfc5424SysLogHandler(address=('127.0.0.1', 514), **kwargs)
+
+
+def test_aclose_timeout():
+    async def main():
+        sh = AsyncRfc5424SysLogHandler(address=('127.0.0.1', 9), socktype=socket.SOCK_STREAM, retry_interval=1)
+        logger = get_logger('test_aio_aclose_timeout', sh)
+        logger.info('message')
+        logger.info('message')
+        # The server is down, the messages are dropped instead of waiting forever
+        await sh.aclose(timeout=0.2)
+        logger.removeHandler(sh)
+        return sh.stats()
+
+    assert asyncio.run(main())['dropped'] == 2
+
+
+def test_aclose_stops_stats_timer():
+    reported = threading.Event()
+
+    async def main():
+        sh = AsyncRfc5424SysLogHandler(
+            address=('127.0.0.1', 514), stats_callback=lambda stats: reported.set(), stats_interval=0.01
+        )
+        assert reported.wait(5)
+        timer = sh._stats_timer
+        await sh.aclose()
+        return timer
+
+    timer = asyncio.run(main())
+    assert not timer._thread.is_alive()
@@ -0,0 +1,108 @@
+import logging
+import threading
+
+import pytest
+from conftest import address, message, sd1
+from mock import patch
+
+from rfc5424logging import Rfc5424SysLogHandler, ContextStructuredData
+
+contextvars = pytest.importorskip('contextvars')
+
+request_sd = ContextStructuredData('request', enterprise_id=32473)
+user_sd = ContextStructuredData('user', enterprise_id=32473)
+
+
+@pytest.fixture
+def handler(logger):
+    sh = Rfc5424SysLogHandler(
+        address=address, structured_data=sd1, enterprise_id=32473, structured_data_providers=[request_sd, user_sd]
+    )
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        yield sh, syslog_socket
+    logger.removeHandler(sh)
+
+
+def sent_sd(syslog_socket):
+    msg = syslog_socket.sendto.call_args[0][0]
+    return msg.split(b' - ', 1)[1].split(b' \xef\xbb\xbf', 1)[0]
+
+
+def test_context_structured_data(logger, handler):
+    sh, syslog_socket = handler
+    logger.info(message)
+    assert sent_sd(syslog_socket) == b'[my_sd_id1@32473 my_key1="my_value1"]'
+
+    with request_sd.using({'request': {'id': 'abc'}}):
+        logger.info(message)
+        assert sent_sd(syslog_socket) == b'[my_sd_id1@32473 my_key1="my_value1"][request@32473 id="abc"]'
+        with user_sd.using({'request': {'id': 'replaced'}, 'user': {'name': 'jan'}}):
+            logger.info(message)
+            assert sent_sd(syslog_socket) == (
+                b'[my_sd_id1@32473 my_key1="my_value1"][request@32473 id="replaced"][user@32473 name="jan"]'
+            )
+        # The record wins over the context, the context over the handler
+        logger.info(message, extra={'structured_data': {
+            'request': {'id': 'record'}, 'my_sd_id1@32473': {'my_key1': 'context'}
+        }})
+        assert sent_sd(syslog_socket) == b'[my_sd_id1@32473 my_key1="context"][request@32473 id="record"]'
+
+    logger.info(message)
+    assert sent_sd(syslog_socket) == b'[my_sd_id1@32473 my_key1="my_value1"]'
+
+
+def test_encoded_once(logger, handler):
+    sh, syslog_socket = handler
+    logger.info(message)
+    token = request_sd.set({'request': {'id': 'abc'}})
+    try:
+        with patch('rfc5424logging.encoding.sd_element') as sd_element:
+            logger.info(message)
+            logger.info(message)
+        assert sd_element.call_count == 0
+        assert b'[request@32473 id="abc"]' in syslog_socket.sendto.call_args[0][0]
+    finally:
+        request_sd.reset(token)
+
+
+def test_context_is_isolated(logger, handler):
+    sh, syslog_socket = handler
+    sent = []
+    syslog_socket.sendto.side_effect = lambda msg, address: sent.append(msg)
+
+    def log(request_id):
+        with request_sd.using({'request': {'id': request_id}}):
+            logger.info(message)
+
+    with request_sd.using({'request': {'id': 'main'}}):
+        thread = threading.Thread(target=log, args=('thread',))
+        thread.start()
+        thread.join()
+        contextvars.copy_context().run(log, 'copy')
+        logger.info(message)
+    assert [b'id="thread"' in sent[0], b'id="copy"' in sent[1], b'id="main"' in sent[2]] == [True, True, True]
+
+
+class ForwardingHandler(Rfc5424SysLogHandler):
+    def get_structured_data(self, record):
+        return super(ForwardingHandler, self).get_structured_data(record)
+
+
+def test_get_structured_data_overridden(logger):
+    sh = ForwardingHandler(address=address, enterprise_id=32473, structured_data_providers=[request_sd])
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        with request_sd.using({'request': {'id': 'abc'}}):
+            logger.info(message)
+            assert sent_sd(syslog_socket) == b'[request@32473 id="abc"]'
+            # The record still wins over the context
+            logger.info(message, extra={'structured_data': {'request': {'id': 'record'}}})
+            assert sent_sd(syslog_socket) == b'[request@32473 id="record"]'
+    logger.removeHandler(sh)
+
+
+def test_missing_enterprise_id():
+    provider = ContextStructuredData('missing_enterprise_id')
+    with pytest.raises(ValueError):
+        provider.set({'request': {'id': 'abc'}})
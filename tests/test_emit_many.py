@@ -0,0 +1,92 @@
+import errno
+import logging
+import socket
+
+import pytest
+from conftest import address, message
+from mock import patch
+
+from rfc5424logging import Rfc5424SysLogHandler
+from rfc5424logging.transport import HAS_SENDMMSG, UDPSocketTransport, sendmmsg
+
+
+def make_records(logger, count, level=logging.INFO):
+    return [
+        logger.makeRecord(logger.name, level, __file__, 0, '%s %d', (message, i), None) for i in range(count)
+    ]
+
+
+def test_emit_many(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        sh.emit_many(make_records(logger, 3))
+    # A single write for all records
+    assert syslog_socket.sendall.call_count == 1
+    data = syslog_socket.sendall.call_args[0][0]
+    for i in range(3):
+        assert ('%s %d' % (message, i)).encode('ascii') in data
+    assert sh.stats()['records'] == 3
+    assert sh.stats()['transmit_latency']['count'] == 1
+    sh.close()
+
+
+def test_handle_batch_filters(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM)
+    sh.addFilter(lambda record: record.args[1] != 1)
+    with patch.object(sh, 'acquire') as acquire, patch.object(sh, 'release'):
+        with patch.object(sh, 'emit_many') as emit_many:
+            accepted = sh.handle_batch(make_records(logger, 3))
+    assert acquire.call_count == 1
+    assert [record.args[1] for record in accepted] == [0, 2]
+    emit_many.assert_called_once_with(accepted)
+    sh.close()
+
+
+def test_build_error_skips_record(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM)
+    records = make_records(logger, 2)
+    records[0].msg = '%d'
+    with patch.object(sh.transport, 'socket') as syslog_socket, patch.object(sh, 'handleError') as handle_error:
+        sh.emit_many(records)
+    handle_error.assert_called_once_with(records[0])
+    assert syslog_socket.sendall.call_count == 1
+    assert sh.stats()['build_errors'] == 1
+    sh.close()
+
+
+def test_emit_many_queued(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM, queue_size=10)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        sh.emit_many(make_records(logger, 3))
+        sh.flush()
+    data = b''.join(call[0][0] for call in syslog_socket.sendall.call_args_list)
+    assert data.count(message.encode('ascii')) == 3
+    sh.close()
+
+
+@pytest.mark.skipif(not HAS_SENDMMSG, reason="Needs sendmmsg()")
+def test_udp_transmit_many():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    server.settimeout(5)
+    udp = UDPSocketTransport(server.getsockname(), 5, connect=True)
+    with patch('rfc5424logging.transport.sendmmsg', wraps=sendmmsg) as wrapped:
+        udp.transmit_many([b'one', b'two'])
+    assert wrapped.call_count == 1
+    assert server.recv(1024) == b'one'
+    assert server.recv(1024) == b'two'
+    udp.close()
+    server.close()
+
+
+def test_udp_transmit_many_partial_send():
+    udp = UDPSocketTransport(('127.0.0.1', 514), 5, connect=True)
+    error = OSError(errno.ENOBUFS, 'No buffer space available')
+    error.sent = 1
+    with patch('rfc5424logging.transport.HAS_SENDMMSG', True), \
+            patch('rfc5424logging.transport.sendmmsg', side_effect=error), \
+            patch.object(udp, 'transmit') as transmit:
+        udp.transmit_many([b'one', b'two', b'three'])
+    # The datagram that was sent isn't sent again
+    assert [call[0][0] for call in transmit.call_args_list] == [b'two', b'three']
+    udp.close()
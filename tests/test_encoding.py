@@ -0,0 +1,69 @@
+# coding=utf-8
+import pytest
+
+from rfc5424logging import encoding
+
+
+@pytest.mark.parametrize("text,expected", [
+    ('clean', 'clean'),
+    ('with space', 'withspace'),
+    ('tab\tand\nnewline', 'tabandnewline'),
+    (u'ünïcödé', u'ncd'),
+    ('\x7fdel', 'del'),
+    ('', ''),
+])
+def test_filter_printusascii(text, expected):
+    assert encoding.filter_printusascii(text) == expected
+
+
+def test_filter_printusascii_clean_is_untouched():
+    text = 'already-clean'
+    assert encoding.filter_printusascii(text) is text
+
+
+@pytest.mark.parametrize("name,expected", [
+    ('my_sd_id', 'my_sd_id'),
+    ('my "sd"=id]', 'mysdid'),
+    (u'ключ_key', '_key'),
+    (None, 'None'),
+    (42, '42'),
+])
+def test_sd_name(name, expected):
+    assert encoding.sd_name(name) == expected
+
+
+def test_sd_name_is_cached():
+    name = 'cached name'
+    cleaned = encoding.sd_name(name)
+    assert encoding.sd_name(name) is cleaned
+    assert name in encoding._sd_names
+
+
+class Value(object):
+    def __str__(self):
+        return 'obj]ect'
+
+
+@pytest.mark.parametrize("value,expected", [
+    ('plain', b'plain'),
+    ('back\\slash "quoted" [bracket]', b'back\\\\slash \\"quoted\\" [bracket\\]'),
+    (u'ünïcödé', u'ünïcödé'.encode('utf-8')),
+    (None, b''),
+    (True, b'True'),
+    (42, b'42'),
+    (1.5, b'1.5'),
+    (b'raw "bytes"', b'raw \\"bytes\\"'),
+    (u'ünï]'.encode('utf-8'), u'ünï\\]'.encode('utf-8')),
+    (Value(), b'obj\\]ect'),
+])
+def test_sd_param_value(value, expected):
+    assert encoding.sd_param_value(value) == expected
+
+
+def test_sd_param_value_is_cached():
+    value = 'cached "value"'
+    encoded = encoding.sd_param_value(value)
+    assert encoding.sd_param_value(value) is encoded
+    long_value = 'x' * (encoding.SD_VALUE_CACHE_MAX_LENGTH + 1)
+    encoding.sd_param_value(long_value)
+    assert long_value not in encoding._sd_values
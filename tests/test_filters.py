@@ -0,0 +1,169 @@
+import logging
+
+import pytest
+from conftest import address, message, sd1
+from mock import Mock, patch
+
+from rfc5424logging import Rfc5424SysLogHandler, RateLimitFilter, SamplingFilter
+
+
+def make_record(logger, msg=message, level=logging.ERROR, **extra):
+    return logger.makeRecord(logger.name, level, __file__, 0, msg, (), None, extra=extra)
+
+
+def test_rate_limit(logger):
+    rate_limit = RateLimitFilter(rate=1, burst=2)
+    with patch('rfc5424logging.filters.clock', return_value=100.0) as clock:
+        assert [rate_limit.filter(make_record(logger)) for _ in range(5)] == [True, True, False, False, False]
+        # Other keys have their own bucket
+        assert rate_limit.filter(make_record(logger, 'Other message'))
+        assert rate_limit.filter(make_record(logger, msgid='other_msgid'))
+
+        clock.return_value = 101.0
+        record = make_record(logger, structured_data=sd1)
+        assert rate_limit.filter(record)
+        assert rate_limit.get_sd_params(record) == {'count': 3}
+        # The structured data of the record is left alone
+        assert record.structured_data == sd1
+        assert not rate_limit.filter(make_record(logger))
+
+        clock.return_value = 102.0
+        record = make_record(logger)
+        assert rate_limit.filter(record)
+        assert rate_limit.get_sd_params(record) == {'count': 1}
+
+        # Passing the filter again clears the count
+        clock.return_value = 103.0
+        assert rate_limit.filter(record)
+        assert rate_limit.get_sd_params(record) is None
+    assert rate_limit.dropped == 4
+
+
+def test_max_keys(logger):
+    rate_limit = RateLimitFilter(rate=1, burst=1, max_keys=2)
+    for i in range(3):
+        assert rate_limit.filter(make_record(logger, 'Message %d' % i))
+    # The bucket of the first message was forgotten
+    assert rate_limit.filter(make_record(logger, 'Message 0'))
+    assert not rate_limit.filter(make_record(logger, 'Message 2'))
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        RateLimitFilter(rate=0)
+    with pytest.raises(ValueError):
+        RateLimitFilter(burst=0)
+
+
+def test_handler_rate_limit(logger):
+    sh = Rfc5424SysLogHandler(address=address, enterprise_id=32473, rate_limit=1, rate_limit_burst=1)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket, patch.object(sh, 'build_msg') as build_msg:
+        build_msg.return_value = b'message'
+        for _ in range(10):
+            logger.error(message)
+    # Dropped before the message was built
+    assert build_msg.call_count == 1
+    assert syslog_socket.sendto.call_count == 1
+    assert sh.stats()['rate_limited'] == 9
+    logger.removeHandler(sh)
+
+
+def test_rate_limit_count_only_sent_by_its_handler(logger):
+    limited = Rfc5424SysLogHandler(address=address, enterprise_id=32473, rate_limit=1, rate_limit_burst=1)
+    other = Rfc5424SysLogHandler(address=address, enterprise_id=32473)
+    logger.addHandler(limited)
+    logger.addHandler(other)
+    with patch('rfc5424logging.filters.clock', return_value=100.0) as clock:
+        with patch.object(limited.transport, 'socket') as limited_socket, \
+                patch.object(other.transport, 'socket') as other_socket:
+            logger.error(message)
+            logger.error(message)
+            clock.return_value = 101.0
+            logger.error(message)
+    assert b'[repeated@32473 count="1"]' in limited_socket.sendto.call_args[0][0]
+    assert other_socket.sendto.call_count == 3
+    assert all(b'repeated' not in call[0][0] for call in other_socket.sendto.call_args_list)
+    logger.removeHandler(limited)
+    logger.removeHandler(other)
+
+
+def test_rate_limit_needs_enterprise_id():
+    with pytest.raises(ValueError):
+        Rfc5424SysLogHandler(address=address, rate_limit=1)
+
+
+def test_sampling_by_level(logger):
+    sampling = SamplingFilter({logging.INFO: 0.25, logging.DEBUG: 0})
+    sampling._random = Mock(side_effect=[0.1, 0.5])
+    record = make_record(logger, level=logging.INFO)
+    assert sampling.filter(record)
+    assert sampling.get_sd_params(record) == {'rate': 0.25}
+    assert not sampling.filter(make_record(logger, level=logging.INFO))
+    assert not sampling.filter(make_record(logger, level=logging.DEBUG))
+
+    record = make_record(logger, level=logging.WARNING)
+    assert sampling.filter(record)
+    assert sampling.get_sd_params(record) is None
+    assert not hasattr(record, 'structured_data')
+    assert sampling.dropped == 2
+
+
+def test_sampling_by_msgid(logger):
+    sampling = SamplingFilter(msgid_rates={'noisy': 0}, keep_level=logging.ERROR)
+    assert not sampling.filter(make_record(logger, level=logging.WARNING, msgid='noisy'))
+    assert sampling.filter(make_record(logger, level=logging.WARNING, msgid='other'))
+    assert sampling.filter(make_record(logger, level=logging.ERROR, msgid='noisy'))
+
+
+def test_sampling_by_trace_id(logger):
+    sampling = SamplingFilter({logging.INFO: 0.5}, trace_id='trace')
+    sampling._random = Mock(side_effect=AssertionError)
+    for trace_id in ('a', 'b', 'c', 'd'):
+        kept = [
+            sampling.filter(make_record(logger, level=logging.INFO, structured_data={'request': {'trace': trace_id}}))
+            for _ in range(3)
+        ]
+        # All records of a trace are kept or dropped together
+        assert kept in ([True] * 3, [False] * 3)
+
+
+def test_sampling_invalid_rate():
+    with pytest.raises(ValueError):
+        SamplingFilter({logging.INFO: 2})
+
+
+def test_handler_sampling(logger):
+    sh = Rfc5424SysLogHandler(address=address, enterprise_id=32473, sample_rates={logging.INFO: 0})
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket, patch.object(sh, 'build_msg') as build_msg:
+        build_msg.return_value = b'message'
+        logger.info(message)
+        logger.warning(message)
+    assert build_msg.call_count == 1
+    assert syslog_socket.sendto.call_count == 1
+    assert sh.stats()['sampled_out'] == 1
+    logger.removeHandler(sh)
+
+
+def test_sample_rate_only_sent_by_its_handler(logger):
+    sampled = Rfc5424SysLogHandler(address=address, enterprise_id=32473, sample_rates={logging.INFO: 0.5})
+    sampled.sampling_filter._random = Mock(return_value=0.1)
+    other = Rfc5424SysLogHandler(address=address, enterprise_id=32473)
+    logger.addHandler(sampled)
+    logger.addHandler(other)
+    with patch.object(sampled.transport, 'socket') as sampled_socket, \
+            patch.object(other.transport, 'socket') as other_socket:
+        logger.info(message, extra={'structured_data': sd1})
+    assert b'[sample@32473 rate="0.5"]' in sampled_socket.sendto.call_args[0][0]
+    assert b'sample' not in other_socket.sendto.call_args[0][0]
+    assert b'my_sd_id1@32473' in other_socket.sendto.call_args[0][0]
+    logger.removeHandler(sampled)
+    logger.removeHandler(other)
+
+
+def test_handler_sampling_invalid_arguments():
+    with pytest.raises(ValueError):
+        Rfc5424SysLogHandler(address=address, sample_rates={logging.INFO: 0.5})
+    with pytest.raises(ValueError):
+        Rfc5424SysLogHandler(address=address, enterprise_id=32473, sample_trace_id='trace_id')
@@ -0,0 +1,74 @@
+# coding=utf-8
+import logging
+
+from conftest import address, message, SomeClass
+from mock import patch
+
+from rfc5424logging import Rfc5424SysLogHandler
+
+
+def test_header_fragments_are_cached(logger):
+    sh = Rfc5424SysLogHandler(address=address, appname='my_appname')
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        with patch.object(sh, 'filter_printusascii', wraps=sh.filter_printusascii) as filter_mock:
+            logger.info(message)
+            first_calls = filter_mock.call_count
+            logger.info(message)
+            # Only the msgid is filtered for the second record
+            assert filter_mock.call_count == first_calls + 1
+        assert syslog_socket.sendto.call_count == 2
+        assert len(sh._header_cache) == 1
+    logger.removeHandler(sh)
+
+
+def test_header_cache_respects_record_overrides(logger):
+    sh = Rfc5424SysLogHandler(address=address)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        logger.info(message)
+        logger.info(message, extra={'appname': 'other_app', 'procid': 42})
+        logger.warning(message)
+        expected = [
+            b'<14>1 2000-01-01T17:11:11.111111+06:00 testhostname root 111'
+            b' - - \xef\xbb\xbfThis is an interesting message',
+            b'<14>1 2000-01-01T17:11:11.111111+06:00 testhostname other_app 42'
+            b' - - \xef\xbb\xbfThis is an interesting message',
+            b'<12>1 2000-01-01T17:11:11.111111+06:00 testhostname root 111'
+            b' - - \xef\xbb\xbfThis is an interesting message',
+        ]
+        assert [c[0][0] for c in syslog_socket.sendto.call_args_list] == expected
+        assert len(sh._header_cache) == 3
+    logger.removeHandler(sh)
+
+
+def test_header_not_cached_for_objects(logger):
+    sh = Rfc5424SysLogHandler(address=address, hostname=SomeClass())
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        logger.log(logging.INFO, message)
+        syslog_socket.sendto.assert_called_once_with(
+            b'<14>1 2000-01-01T17:11:11.111111+06:00 MyClassObject root 111'
+            b' - - \xef\xbb\xbfThis is an interesting message',
+            address
+        )
+        assert len(sh._header_cache) == 0
+    logger.removeHandler(sh)
+
+
+class OverriddenHostnameHandler(Rfc5424SysLogHandler):
+    def get_hostname(self, record):
+        return 'OVERRIDDEN'
+
+
+def test_overridden_getters_are_called(logger):
+    sh = OverriddenHostnameHandler(address=address)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        logger.info(message)
+        syslog_socket.sendto.assert_called_once_with(
+            b'<14>1 2000-01-01T17:11:11.111111+06:00 OVERRIDDEN root 111'
+            b' - - \xef\xbb\xbfThis is an interesting message',
+            address
+        )
+    logger.removeHandler(sh)
@@ -0,0 +1,133 @@
+import socket
+
+import pytest
+from conftest import message
+from mock import patch
+
+from rfc5424logging import (
+    Rfc5424SysLogHandler, BALANCE_ROUND_ROBIN, BALANCE_LEAST_BYTES, BALANCE_FAILOVER
+)
+from rfc5424logging.transport import ConnectionUnavailable, MultiEndpointTransport, TCPSocketTransport
+
+addresses = [('10.0.0.1', 514), ('10.0.0.2', 514), ('10.0.0.3', 514)]
+
+
+class RecordingTransport(object):
+    def __init__(self, address):
+        self.address = address
+        self.sent = []
+        self.failing = False
+        self.buffered = 0
+
+    def transmit(self, syslog_msg):
+        self.transmit_many([syslog_msg])
+
+    def transmit_many(self, syslog_msgs):
+        if self.failing:
+            raise OSError("Connection refused")
+        self.sent.extend(syslog_msgs)
+
+    def pending_bytes(self):
+        return self.buffered
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def transports(multi):
+    return [endpoint.transport for endpoint in multi.endpoints]
+
+
+def test_round_robin():
+    multi = MultiEndpointTransport(addresses, RecordingTransport, BALANCE_ROUND_ROBIN)
+    for msg in (b'1', b'2', b'3', b'4'):
+        multi.transmit(msg)
+    assert [transport.sent for transport in transports(multi)] == [[b'1', b'4'], [b'2'], [b'3']]
+
+
+def test_least_bytes():
+    multi = MultiEndpointTransport(addresses, RecordingTransport, BALANCE_LEAST_BYTES)
+    first, second, third = transports(multi)
+    first.buffered = 100
+    multi.transmit_many([b'long message'])
+    multi.transmit(b'short')
+    multi.transmit(b'next')
+    assert first.sent == []
+    assert second.sent == [b'long message']
+    assert third.sent == [b'short', b'next']
+
+
+def test_failover():
+    multi = MultiEndpointTransport(addresses, RecordingTransport, BALANCE_FAILOVER, retry_delay=60)
+    primary, secondary, _ = transports(multi)
+    multi.transmit(b'1')
+    primary.failing = True
+    multi.transmit(b'2')
+    multi.transmit(b'3')
+    assert primary.sent == [b'1']
+    assert secondary.sent == [b'2', b'3']
+
+    stats = multi.stats()['endpoints']
+    assert [endpoint['healthy'] for endpoint in stats] == [False, True, True]
+    assert stats[0]['errors'] == 1
+
+    # Tried again once the retry delay passed
+    primary.failing = False
+    multi.endpoints[0].retry_at = 0
+    multi.transmit(b'4')
+    assert primary.sent == [b'1', b'4']
+    assert multi.endpoints[0].healthy
+
+
+def test_all_down():
+    multi = MultiEndpointTransport(addresses, RecordingTransport, retry_delay=60)
+    for transport in transports(multi):
+        transport.failing = True
+    with pytest.raises(OSError):
+        multi.transmit(b'lost')
+    with pytest.raises(ConnectionUnavailable):
+        multi.transmit_many([b'rejected', b'rejected'])
+    assert multi.stats()['rejected'] == 2
+
+
+def test_server_down_at_start():
+    def factory(address):
+        if address == addresses[0]:
+            raise OSError("Connection refused")
+        return RecordingTransport(address)
+
+    multi = MultiEndpointTransport(addresses, factory, BALANCE_FAILOVER, retry_delay=60)
+    assert multi.endpoints[0].transport is None
+    multi.transmit(b'message')
+    assert multi.endpoints[1].transport.sent == [b'message']
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        MultiEndpointTransport(addresses, RecordingTransport, strategy=0)
+    with pytest.raises(ValueError):
+        MultiEndpointTransport([], RecordingTransport)
+
+
+def test_handler(logger):
+    sh = Rfc5424SysLogHandler(address=addresses, socktype=socket.SOCK_STREAM, load_balancing=BALANCE_FAILOVER)
+    logger.addHandler(sh)
+    assert isinstance(sh.transport, MultiEndpointTransport)
+    primary = sh.transport.endpoints[0].transport
+    assert isinstance(primary, TCPSocketTransport)
+    assert primary.address == addresses[0]
+
+    with patch.object(primary, 'socket') as syslog_socket:
+        logger.info(message)
+    assert syslog_socket.sendall.call_count == 1
+    assert len(sh.stats()['endpoints']) == 3
+    sh.close()
+
+
+def test_single_address_list(logger):
+    sh = Rfc5424SysLogHandler(address=['127.0.0.1', 514])
+    assert not isinstance(sh.transport, MultiEndpointTransport)
+    sh.close()
@@ -0,0 +1,98 @@
+import logging
+import socket
+
+import pytest
+from conftest import address, message, sd1
+from mock import Mock, patch
+
+from rfc5424logging import Rfc5424SysLogHandler, Rfc5424QueueHandler, Rfc5424QueueListener
+from rfc5424logging.handler import PreparedRecord
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+def make_record(logger, msg=message, **extra):
+    return logger.makeRecord(logger.name, logging.INFO, __file__, 0, msg, (), None, extra=extra)
+
+
+@pytest.mark.parametrize("msg", [message, '', 'ünicode %'])
+def test_assemble_matches_build(logger, msg):
+    sh = Rfc5424SysLogHandler(address=address, structured_data=sd1, enterprise_id=32473)
+    record = make_record(logger, msg, msgid='some_msgid', structured_data={'my_sd_id2': {'key': 'value'}})
+    prepared = sh.prepare_record(record)
+    assert isinstance(prepared, PreparedRecord)
+    assert sh.assemble_msg(prepared) == sh.build_msg(record)
+    sh.close()
+
+
+def test_queue_listener(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM)
+    q = queue.Queue()
+    logger.addHandler(Rfc5424QueueHandler(q, sh))
+    listener = Rfc5424QueueListener(q, sh, batch_size=10)
+
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        for i in range(5):
+            logger.info('%s %d', message, i)
+        listener.start()
+        listener.stop()
+    # All records that were waiting went out in a single write
+    assert syslog_socket.sendall.call_count == 1
+    data = syslog_socket.sendall.call_args[0][0]
+    assert data.count(message.encode('ascii')) == 5
+    assert sh.stats()['records'] == 5
+    assert q.unfinished_tasks == 0
+    sh.close()
+
+
+def test_queue_handler_applies_handler_filters(logger):
+    sh = Rfc5424SysLogHandler(address=address, enterprise_id=32473, rate_limit=1, rate_limit_burst=1)
+    q = queue.Queue()
+    logger.addHandler(Rfc5424QueueHandler(q, sh))
+    for _ in range(3):
+        logger.info(message)
+    # Dropped before reaching the queue
+    assert q.qsize() == 1
+    assert sh.stats()['rate_limited'] == 2
+    sh.close()
+
+
+def test_queue_listener_batch_size(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM)
+    q = queue.Queue()
+    for i in range(5):
+        q.put(sh.prepare_record(make_record(logger)))
+    listener = Rfc5424QueueListener(q, sh, batch_size=2)
+    with patch.object(sh, 'emit_prepared') as emit_prepared:
+        listener.start()
+        listener.stop()
+    assert [len(call[0][0]) for call in emit_prepared.call_args_list] == [2, 2, 1]
+    sh.close()
+
+
+def test_queue_listener_error(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM)
+    q = queue.Queue()
+    q.put(sh.prepare_record(make_record(logger)))
+    error_handler = Mock()
+    listener = Rfc5424QueueListener(q, sh, error_handler=error_handler)
+    with patch.object(sh.transport, 'transmit_many', side_effect=OSError):
+        listener.start()
+        listener.stop()
+    assert error_handler.call_count == 1
+    assert sh.stats()['send_errors'] == 1
+    sh.close()
+
+
+def test_queue_handler_full(logger):
+    sh = Rfc5424SysLogHandler(address=address)
+    queue_handler = Rfc5424QueueHandler(queue.Queue(maxsize=1), sh)
+    logger.addHandler(queue_handler)
+    with patch.object(queue_handler, 'handleError') as handle_error:
+        logger.info(message)
+        logger.info(message)
+    assert handle_error.call_count == 1
+    sh.close()
@@ -0,0 +1,115 @@
+import logging
+import socket
+import threading
+import time
+
+import pytest
+from mock import Mock
+
+from rfc5424logging import FRAMING_OCTET_COUNTING, Rfc5424SysLogHandler
+from rfc5424logging.transport import CircuitBreaker, ConnectionUnavailable, TCPSocketTransport
+
+
+@pytest.fixture
+def server():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(5)
+    server.settimeout(5)
+    yield server
+    server.close()
+
+
+def unused_address():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    address = sock.getsockname()
+    sock.close()
+    return address
+
+
+def wait_closed(breaker):
+    deadline = time.time() + 5
+    while breaker.is_open and time.time() < deadline:
+        time.sleep(0.01)
+    return not breaker.is_open
+
+
+def test_backoff_delay():
+    breaker = CircuitBreaker(None, initial_delay=1, max_delay=10, jitter=0.5)
+    for attempt, expected in [(0, 1), (1, 2), (3, 8), (10, 10)]:
+        delay = breaker.delay(attempt)
+        assert expected * 0.5 <= delay <= expected
+
+
+def test_breaker():
+    attempts = []
+    succeed = threading.Event()
+
+    def connect():
+        attempts.append(time.time())
+        if not succeed.is_set():
+            raise OSError
+
+    error_handler = Mock()
+    breaker = CircuitBreaker(connect, initial_delay=0.01, max_delay=0.02, error_handler=error_handler)
+    breaker.check()
+    breaker.trip()
+    breaker.trip()
+    # Reported once per outage
+    assert error_handler.call_count == 1
+    with pytest.raises(ConnectionUnavailable):
+        breaker.check()
+    while len(attempts) < 3:
+        time.sleep(0.01)
+    succeed.set()
+    assert wait_closed(breaker)
+    breaker.check()
+    assert breaker.stats() == {'breaker_open': False, 'breaker_trips': 1, 'breaker_rejected': 1}
+    breaker.stop()
+
+
+def test_reconnect_in_background(server):
+    tcp = TCPSocketTransport(server.getsockname(), 1, FRAMING_OCTET_COUNTING, reconnect_delay=0.2)
+    server.accept()[0].close()
+
+    # Assigned instead of patched, so the reconnected socket is not put back afterwards
+    tcp.socket.close()
+    tcp.socket = Mock(**{'sendall.side_effect': OSError})
+    with pytest.raises(OSError):
+        tcp.transmit(b'lost')
+    with pytest.raises(ConnectionUnavailable):
+        tcp.transmit(b'rejected')
+    assert wait_closed(tcp.breaker)
+
+    tcp.transmit(b'message')
+    conn, _ = server.accept()
+    assert conn.recv(1024) == b'7 message'
+    conn.close()
+    assert tcp.stats()['reconnects'] == 1
+    tcp.close()
+
+
+def test_server_down_at_start():
+    tcp = TCPSocketTransport(unused_address(), 1, FRAMING_OCTET_COUNTING, reconnect_delay=10)
+    assert tcp.breaker.is_open
+    with pytest.raises(ConnectionUnavailable):
+        tcp.transmit_many([b'one', b'two'])
+    assert tcp.stats()['breaker_rejected'] == 2
+    tcp.close()
+
+
+def test_handler_drops_rejected_records():
+    logger = logging.getLogger('test_reconnect')
+    logger.setLevel(logging.INFO)
+    sh = Rfc5424SysLogHandler(address=unused_address(), socktype=socket.SOCK_STREAM, reconnect_delay=10)
+    sh.handleError = Mock()
+    logger.addHandler(sh)
+    for _ in range(3):
+        logger.info('rejected')
+    # Counted instead of reported for every record
+    assert not sh.handleError.called
+    assert sh.stats()['breaker_rejected'] == 3
+    assert sh.stats()['send_errors'] == 0
+    logger.removeHandler(sh)
+    sh.close()
@@ -0,0 +1,104 @@
+import logging
+import os
+import socket
+import threading
+
+import pytest
+from mock import patch
+
+from rfc5424logging import Rfc5424SysLogHandler, transport
+from rfc5424logging.relay import SyslogRelay, build_upstream, parse_address, parse_args
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="Needs Unix sockets")
+
+
+class ListTransport(object):
+    def __init__(self):
+        self.messages = []
+        self.flushes = 0
+        self.closed = False
+        self.received = threading.Event()
+
+    def transmit_many(self, syslog_msgs):
+        self.messages.extend(syslog_msgs)
+        self.received.set()
+
+    def flush(self):
+        self.flushes += 1
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def relay(tmpdir):
+    relay = SyslogRelay(str(tmpdir.join('relay.sock')), ListTransport(), poll_interval=0.01)
+    thread = threading.Thread(target=relay.serve_forever)
+    thread.start()
+    yield relay
+    relay.stop()
+    thread.join()
+
+
+def test_forward(relay):
+    # Not using the logger fixture, it disables connecting sockets
+    logger = logging.getLogger('test_relay')
+    sh = Rfc5424SysLogHandler(address=relay.path, socktype=socket.SOCK_DGRAM)
+    logger.addHandler(sh)
+    logger.warning('message')
+    assert relay.upstream.received.wait(5)
+    logger.removeHandler(sh)
+    sh.close()
+
+    assert len(relay.upstream.messages) == 1
+    assert relay.upstream.messages[0].endswith(b'message')
+    assert relay.upstream.flushes == 1
+    assert relay.stats() == {'received': 1, 'send_errors': 0}
+
+
+def test_close(tmpdir):
+    relay = SyslogRelay(str(tmpdir.join('relay.sock')), ListTransport(), batch_size=2)
+    sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    for msg in (b'one', b'two', b'three'):
+        sender.sendto(msg, relay.path)
+    sender.close()
+
+    relay.close()
+    assert relay.upstream.messages == [b'one', b'two', b'three']
+    assert relay.upstream.closed
+    assert not os.path.exists(relay.path)
+
+
+def test_send_error(tmpdir):
+    upstream = ListTransport()
+    upstream.transmit_many = None
+    relay = SyslogRelay(str(tmpdir.join('relay.sock')), upstream)
+    with patch('rfc5424logging.relay.print_error') as print_error:
+        relay.forward([b'message'])
+    assert print_error.call_count == 1
+    assert relay.send_errors == 1
+    relay.close()
+
+
+def test_stale_socket(tmpdir):
+    path = str(tmpdir.join('relay.sock'))
+    SyslogRelay(path, ListTransport()).socket.close()
+    assert os.path.exists(path)
+    SyslogRelay(path, ListTransport()).close()
+
+
+@pytest.mark.parametrize("value,expected", [
+    ('syslog.example.com:6514', ('syslog.example.com', 6514)),
+    ('[::1]:514', ('::1', 514)),
+    ('syslog.example.com', ('syslog.example.com', 514)),
+])
+def test_parse_address(value, expected):
+    assert parse_address(value) == expected
+
+
+def test_build_upstream():
+    args = parse_args(['/tmp/relay.sock', '--address', '127.0.0.1:514'])
+    upstream = build_upstream(args)
+    assert isinstance(upstream, transport.UDPSocketTransport)
+    assert upstream.connect
+    upstream.close()
@@ -0,0 +1,75 @@
+import socket
+import ssl
+
+import pytest
+from mock import Mock
+
+from rfc5424logging import FRAMING_NON_TRANSPARENT, FRAMING_OCTET_COUNTING
+from rfc5424logging.transport import (
+    HAS_SENDMSG, SCATTER_GATHER_MIN_SIZE, TCPSocketTransport, frame_buffers, frame_message, sendmsg_all
+)
+
+large_message = b'Traceback (most recent call last):\n' * (SCATTER_GATHER_MIN_SIZE // 16)
+
+
+@pytest.mark.parametrize("framing", [FRAMING_OCTET_COUNTING, FRAMING_NON_TRANSPARENT])
+@pytest.mark.parametrize("msg", [b'message', b'multi\nline\nmessage'])
+def test_frame_buffers(framing, msg):
+    assert b''.join(frame_buffers(msg, framing)) == frame_message(msg, framing)
+
+
+def test_sendmsg_all_partial_sends():
+    received = []
+
+    def sendmsg(buffers):
+        # Takes at most 5 bytes at a time
+        data = b''.join(bytes(buffer) for buffer in buffers)[:5]
+        received.append(data)
+        return len(data)
+
+    sock = Mock()
+    sock.sendmsg.side_effect = sendmsg
+    buffers = [b'12 ', b'first message', b'', b'6 ', b'second']
+    sendmsg_all(sock, buffers)
+    assert b''.join(received) == b''.join(buffers)
+
+
+@pytest.mark.skipif(not HAS_SENDMSG, reason="Needs socket.sendmsg()")
+@pytest.mark.parametrize("framing", [FRAMING_OCTET_COUNTING, FRAMING_NON_TRANSPARENT])
+def test_large_messages(framing):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    tcp = TCPSocketTransport(server.getsockname(), 5, framing)
+    conn, _ = server.accept()
+    conn.settimeout(5)
+    tcp.socket = Mock(wraps=tcp.socket)
+
+    tcp.transmit(large_message)
+    tcp.transmit_many([b'small', large_message])
+    tcp.close()
+
+    expected = b''.join(frame_message(msg, framing) for msg in (large_message, b'small', large_message))
+    received = b''
+    while len(received) < len(expected):
+        data = conn.recv(65536)
+        if not data:
+            break
+        received += data
+    assert received == expected
+    assert tcp.socket.sendmsg.call_count >= 2
+    assert tcp.socket.sendall.call_count == 0
+    conn.close()
+    server.close()
+
+
+def test_small_messages_are_joined():
+    tcp = TCPSocketTransport.__new__(TCPSocketTransport)
+    tcp.socket = Mock(spec=socket.socket)
+    assert not tcp.scatter_gather(10)
+
+
+def test_no_scatter_gather_over_ssl():
+    tcp = TCPSocketTransport.__new__(TCPSocketTransport)
+    tcp.socket = Mock(spec=ssl.SSLSocket)
+    assert not tcp.scatter_gather(len(large_message))
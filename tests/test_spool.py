@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+
+import pytest
+from conftest import address, message
+from mock import Mock, patch
+
+from rfc5424logging import Rfc5424SysLogHandler, FSYNC_ALWAYS
+from rfc5424logging.spool import Spool, SpoolingTransport
+
+
+class FlakyTransport(object):
+    def __init__(self):
+        self.failing = True
+        self.sent = []
+        self.received = threading.Event()
+        self.closed = False
+
+    def transmit_many(self, syslog_msgs):
+        if self.failing:
+            raise OSError("Connection refused")
+        self.sent.extend(syslog_msgs)
+        self.received.set()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def replay_all(spool):
+    replayed = []
+    spool.replay(replayed.extend, batch_size=2)
+    return replayed
+
+
+def test_replay_in_order(tmpdir):
+    spool = Spool(str(tmpdir), segment_size=20)
+    messages = [('message %d' % i).encode('ascii') for i in range(5)]
+    for msg in messages:
+        spool.append(msg)
+    assert spool.pending
+    assert replay_all(spool) == messages
+    assert not spool.pending
+    assert spool.stats() == {'spooled': 5, 'replayed': 5, 'evicted_segments': 0, 'spool_bytes': 0}
+    assert os.listdir(str(tmpdir)) == ['.lock']
+
+
+def test_replay_resumes_after_failure(tmpdir):
+    spool = Spool(str(tmpdir))
+    spool.append_many([b'one', b'two', b'three'])
+    sent = []
+
+    def send(batch):
+        if len(sent) == 1:
+            raise OSError
+        sent.append(batch)
+
+    with pytest.raises(OSError):
+        spool.replay(send, batch_size=2)
+    assert sent == [[b'one', b'two']]
+    assert replay_all(spool) == [b'three']
+
+
+def test_eviction(tmpdir):
+    spool = Spool(str(tmpdir), segment_size=10, max_size=30)
+    for i in range(6):
+        spool.append(('message %d' % i).encode('ascii'))
+    # Every message fills a segment, only two fit in the spool
+    assert spool.evicted == 4
+    assert replay_all(spool) == [b'message 4', b'message 5']
+
+
+def test_segments_survive_restart(tmpdir):
+    spool = Spool(str(tmpdir), fsync=FSYNC_ALWAYS)
+    spool.append_many([b'one', b'two'])
+    spool.close()
+
+    spool = Spool(str(tmpdir))
+    spool.append(b'three')
+    assert replay_all(spool) == [b'one', b'two', b'three']
+
+
+def test_directory_locked(tmpdir):
+    spool = Spool(str(tmpdir))
+    with pytest.raises(ValueError):
+        Spool(str(tmpdir))
+    spool.close()
+    Spool(str(tmpdir)).close()
+
+
+def test_truncated_message(tmpdir):
+    spool = Spool(str(tmpdir))
+    spool.append_many([b'one', b'two'])
+    spool.close()
+    segment = str(tmpdir.join(os.listdir(str(tmpdir))[0]))
+    with open(segment, 'r+b') as segment_file:
+        segment_file.truncate(os.path.getsize(segment) - 1)
+
+    assert replay_all(Spool(str(tmpdir))) == [b'one']
+
+
+def test_replay_stops_between_batches(tmpdir):
+    spool = Spool(str(tmpdir))
+    spool.append_many([b'one', b'two', b'three'])
+    sent = []
+    spool.replay(sent.append, batch_size=1, stopped=lambda: len(sent) == 2)
+    assert sent == [[b'one'], [b'two']]
+    assert replay_all(spool) == [b'three']
+
+
+def test_close_stops_replay(tmpdir):
+    spool = Spool(str(tmpdir))
+    spool.append_many([('message %d' % i).encode('ascii') for i in range(1000)])
+    upstream = FlakyTransport()
+    upstream.failing = False
+    replaying = threading.Event()
+
+    def transmit_many(syslog_msgs):
+        replaying.set()
+        time.sleep(0.01)
+        upstream.sent.extend(syslog_msgs)
+
+    upstream.transmit_many = transmit_many
+    spooling = SpoolingTransport(upstream, spool, batch_size=1)
+    assert replaying.wait(5)
+    start = time.time()
+    spooling.close()
+    # Doesn't wait for the whole spool to be replayed
+    assert time.time() - start < 1
+    assert 0 < len(upstream.sent) < 1000
+    assert Spool(str(tmpdir)).pending
+
+
+def test_invalid_arguments(tmpdir):
+    with pytest.raises(ValueError):
+        Spool(str(tmpdir), fsync=0)
+    with pytest.raises(ValueError):
+        Spool(str(tmpdir), segment_size=100, max_size=10)
+
+
+def test_spooling_transport(tmpdir):
+    upstream = FlakyTransport()
+    error_handler = Mock()
+    spooling = SpoolingTransport(upstream, Spool(str(tmpdir)), retry_interval=0.01, error_handler=error_handler)
+    spooling.transmit(b'one')
+    spooling.transmit_many([b'two', b'three'])
+    assert error_handler.call_count == 1
+    assert spooling.spool.spooled == 3
+
+    upstream.failing = False
+    assert upstream.received.wait(5)
+    spooling.close()
+    assert upstream.sent == [b'one', b'two', b'three']
+    assert upstream.closed
+    assert spooling.stats()['replayed'] == 3
+
+
+def test_handler_spool(logger, tmpdir):
+    sh = Rfc5424SysLogHandler(address=address, spool_directory=str(tmpdir))
+    logger.addHandler(sh)
+    with patch.object(sh.transport.transport, 'socket') as syslog_socket:
+        syslog_socket.sendto.side_effect = OSError
+        with patch.object(sh.transport.transport, 'open'), patch.object(sh.transport, 'error_handler'):
+            logger.info(message)
+    assert sh.stats()['spooled'] == 1
+    sh.close()
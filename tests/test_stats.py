@@ -0,0 +1,97 @@
+import socket
+import threading
+
+from conftest import address, message
+from mock import patch
+
+from rfc5424logging import Rfc5424SysLogHandler
+from rfc5424logging.stats import Histogram
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(1, 10, 100))
+    assert histogram.percentile(0.5) is None
+    for value in (0.5, 5, 5, 50, 500):
+        histogram.observe(value)
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 5
+    assert snapshot['sum'] == 560.5
+    assert snapshot['p50'] == 10
+    assert snapshot['p99'] == float('inf')
+    assert snapshot['buckets'] == [(1, 1), (10, 2), (100, 1), (float('inf'), 1)]
+
+
+def test_handler_stats(logger):
+    sh = Rfc5424SysLogHandler(address=address)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        logger.info(message)
+        logger.info(message)
+        sent = sum(len(call[0][0]) for call in syslog_socket.sendto.call_args_list)
+
+    stats = sh.stats()
+    assert stats['records'] == 2
+    assert stats['bytes'] == sent
+    assert stats['build_errors'] == 0
+    assert stats['send_errors'] == 0
+    assert stats['reconnects'] == 0
+    assert stats['build_latency']['count'] == 2
+    assert stats['transmit_latency']['count'] == 2
+    sh.close()
+
+
+def test_send_errors(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket, \
+            patch.object(sh.transport, 'open', side_effect=OSError), \
+            patch.object(sh, 'handleError') as handle_error:
+        syslog_socket.sendall.side_effect = OSError
+        logger.info(message)
+    assert handle_error.call_count == 1
+
+    stats = sh.stats()
+    assert stats['records'] == 1
+    assert stats['send_errors'] == 1
+    assert stats['reconnects'] == 1
+    assert stats['transmit_latency']['count'] == 0
+    sh.close()
+
+
+def test_build_errors(logger):
+    sh = Rfc5424SysLogHandler(address=address)
+    logger.addHandler(sh)
+    with patch.object(sh, 'build_msg', side_effect=ValueError), patch.object(sh, 'handleError'):
+        logger.info(message)
+    stats = sh.stats()
+    assert stats['records'] == 0
+    assert stats['build_errors'] == 1
+    sh.close()
+
+
+def test_queued_stats(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM, queue_size=10)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket'):
+        logger.info(message)
+        sh.flush()
+    stats = sh.stats()
+    assert stats['records'] == 1
+    assert stats['dropped'] == 0
+    assert stats['transmit_latency']['count'] == 1
+    sh.close()
+
+
+def test_stats_callback(logger):
+    reported = threading.Event()
+    snapshots = []
+
+    def callback(stats):
+        snapshots.append(stats)
+        reported.set()
+
+    sh = Rfc5424SysLogHandler(address=address, stats_callback=callback, stats_interval=0.01)
+    assert reported.wait(5)
+    sh.close()
+    assert snapshots[0]['records'] == 0
+    assert sh._stats_timer is None
@@ -9,7 +9,7 @@ from conftest import (
 from mock import patch
 import pytest
 
-from rfc5424logging import Rfc5424SysLogHandler
+from rfc5424logging import Rfc5424SysLogHandler, LazyValue
 
 
 @pytest.mark.parametrize("handler_kwargs,logger_kwargs,expected", [
@@ -180,3 +180,114 @@ def test_sd_in_message_with_adapter(adapter_with_udp_handler):
     syslog_socket.sendto.assert_called_once_with(expected_msg, address)
 
 
+def test_handler_sd_compiled_once(logger):
+    sh = Rfc5424SysLogHandler(address=address, structured_data=sd_multi_id)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        with patch.object(sh, 'build_sd_element', wraps=sh.build_sd_element) as build_sd_element:
+            logger.info(message)
+            logger.info(message)
+            assert build_sd_element.call_count == 2
+            logger.info(message, extra={'structured_data': {'my_sd_id3@32473': {'my_key3': 'my_value3'}}})
+            assert build_sd_element.call_count == 3
+        expected = (b'<14>1 2000-01-01T17:11:11.111111+06:00 testhostname root 111'
+                    b' - [my_sd_id1@32473 my_key1="my_value1"][my_sd_id2@32473 my_key2="my_value2"]'
+                    b'[my_sd_id3@32473 my_key3="my_value3"] \xef\xbb\xbfThis is an interesting message')
+        assert syslog_socket.sendto.call_args[0][0] == expected
+    logger.removeHandler(sh)
+
+
+def test_handler_sd_overridden_in_place(logger):
+    sh = Rfc5424SysLogHandler(address=address, structured_data=sd_multi_id)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        logger.info(message, extra={'structured_data': {'my_sd_id1@32473': {'my_key1': 'other'}}})
+        expected = (b'<14>1 2000-01-01T17:11:11.111111+06:00 testhostname root 111'
+                    b' - [my_sd_id1@32473 my_key1="other"][my_sd_id2@32473 my_key2="my_value2"]'
+                    b' \xef\xbb\xbfThis is an interesting message')
+        syslog_socket.sendto.assert_called_once_with(expected, address)
+    logger.removeHandler(sh)
+
+
+def test_handler_sd_recompiled_when_replaced(logger):
+    sh = Rfc5424SysLogHandler(address=address, structured_data=sd1)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        logger.info(message)
+        sh.structured_data = sd2
+        logger.info(message)
+        expected = (b'<14>1 2000-01-01T17:11:11.111111+06:00 testhostname root 111'
+                    b' - [my_sd_id2@32473 my_key2="my_value2"] \xef\xbb\xbfThis is an interesting message')
+        assert syslog_socket.sendto.call_args[0][0] == expected
+    logger.removeHandler(sh)
+
+
+def test_lazy_values(logger):
+    sh1 = Rfc5424SysLogHandler(address=address)
+    sh2 = Rfc5424SysLogHandler(address=address)
+    logger.addHandler(sh1)
+    logger.addHandler(sh2)
+    calls = []
+
+    def headers():
+        calls.append(1)
+        return 'expensive'
+
+    with patch.object(sh1.transport, 'socket') as socket1, patch.object(sh2.transport, 'socket') as socket2:
+        logger.debug(message, extra={'structured_data': {'my_sd_id1@32473': {'key': LazyValue(headers)}}})
+        logger.setLevel(logging.INFO)
+        logger.debug(message, extra={'structured_data': {'my_sd_id1@32473': {'key': LazyValue(headers)}}})
+        logger.info(message, extra={'structured_data': {'my_sd_id1@32473': {'key': headers}}})
+    # Computed once per record that was sent
+    assert len(calls) == 2
+    expected = (b'<14>1 2000-01-01T17:11:11.111111+06:00 testhostname root 111'
+                b' - [my_sd_id1@32473 key="expensive"] \xef\xbb\xbfThis is an interesting message')
+    assert socket1.sendto.call_args[0][0] == expected
+    assert socket2.sendto.call_args[0][0] == expected
+    logger.removeHandler(sh1)
+    logger.removeHandler(sh2)
+
+
+def test_lazy_values_without_memoization(logger):
+    sh = Rfc5424SysLogHandler(address=address)
+    record = logger.makeRecord(logger.name, logging.INFO, __file__, 0, message, (), None, extra={
+        'structured_data': {'my_sd_id1@32473': {'key': LazyValue(next, iter(range(5)), memoize=False)}}
+    })
+    assert sh.build_structured_data(record) == b'[my_sd_id1@32473 key="0"]'
+    assert sh.build_structured_data(record) == b'[my_sd_id1@32473 key="1"]'
+    sh.close()
+
+
+def test_handler_sd_lazy_values(logger):
+    counter = iter(range(10))
+    sh = Rfc5424SysLogHandler(
+        address=address,
+        structured_data={'static@32473': {'key': 'value'}, 'dynamic@32473': {'count': lambda: next(counter)}},
+    )
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        logger.info(message)
+        logger.info(message)
+    messages = [call[0][0] for call in syslog_socket.sendto.call_args_list]
+    assert b'[dynamic@32473 count="0"]' in messages[0]
+    assert b'[dynamic@32473 count="1"]' in messages[1]
+    assert all(b'[static@32473 key="value"]' in msg for msg in messages)
+    logger.removeHandler(sh)
+
+
+def test_get_structured_data_overridden(logger):
+    class CustomHandler(Rfc5424SysLogHandler):
+        def get_structured_data(self, record):
+            structured_data = super(CustomHandler, self).get_structured_data(record)
+            structured_data['custom@32473'] = {'level': record.levelname}
+            return structured_data
+
+    sh = CustomHandler(address=address, structured_data=sd1)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        logger.info(message, extra={'structured_data': sd2})
+        expected = (b'<14>1 2000-01-01T17:11:11.111111+06:00 testhostname root 111'
+                    b' - [my_sd_id1@32473 my_key1="my_value1"][my_sd_id2@32473 my_key2="my_value2"]'
+                    b'[custom@32473 level="INFO"] \xef\xbb\xbfThis is an interesting message')
+        syslog_socket.sendto.assert_called_once_with(expected, address)
+    logger.removeHandler(sh)
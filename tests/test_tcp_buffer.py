@@ -0,0 +1,78 @@
+import socket
+import time
+
+import pytest
+from conftest import address, message
+from mock import patch
+
+from rfc5424logging import Rfc5424SysLogHandler, FRAMING_NON_TRANSPARENT, FRAMING_OCTET_COUNTING
+
+expected_msg = (b'<14>1 2000-01-01T17:11:11.111111+06:00 testhostname root 111'
+                b' - - \xef\xbb\xbfThis is an interesting message\n')
+
+
+def record_sent(syslog_socket):
+    # The buffer is reused, so copy what was sent
+    sent = []
+    syslog_socket.sendall.side_effect = lambda data: sent.append(bytes(data))
+    return sent
+
+
+expected_error_msg = (b'<11>1 2000-01-01T17:11:11.111111+06:00 testhostname root 111'
+                      b' - - \xef\xbb\xbfThis is an interesting message\n')
+
+
+def test_flush_level(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM, tcp_buffer_size=10000)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        sent = record_sent(syslog_socket)
+        logger.info(message)
+        logger.info(message)
+        assert sent == []
+        logger.error(message)
+        assert sent == [expected_msg * 2 + expected_error_msg]
+    logger.removeHandler(sh)
+
+
+def test_buffer_size(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM, tcp_buffer_size=len(expected_msg) * 2)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        sent = record_sent(syslog_socket)
+        for _ in range(3):
+            logger.info(message)
+        assert sent == [expected_msg * 2]
+        sh.flush()
+        assert sent == [expected_msg * 2, expected_msg]
+    logger.removeHandler(sh)
+
+
+def test_flush_interval(logger):
+    sh = Rfc5424SysLogHandler(
+        address=address, socktype=socket.SOCK_STREAM, tcp_buffer_size=10000, flush_interval=0.01
+    )
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        sent = record_sent(syslog_socket)
+        logger.info(message)
+        for _ in range(200):
+            if sent:
+                break
+            time.sleep(0.01)
+        assert sent == [expected_msg]
+        logger.removeHandler(sh)
+        sh.close()
+
+
+@pytest.mark.parametrize("framing", [FRAMING_NON_TRANSPARENT, FRAMING_OCTET_COUNTING])
+def test_buffered_framing(logger, framing):
+    sh = Rfc5424SysLogHandler(
+        address=address, socktype=socket.SOCK_STREAM, framing=framing, tcp_buffer_size=10000
+    )
+    msgs = [b'first\nline', b'second']
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        sent = record_sent(syslog_socket)
+        sh.transport.transmit_many(msgs)
+        sh.flush()
+        assert sent == [b''.join(sh.transport.frame(msg) for msg in msgs)]
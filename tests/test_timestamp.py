@@ -1,13 +1,16 @@
 # coding=utf-8
 import logging
+from datetime import datetime
 
 import pytest
+import pytz
 from conftest import (
     address, message
 )
 from mock import patch
 
 from rfc5424logging import Rfc5424SysLogHandler
+from rfc5424logging.timestamp import TimestampFormatter
 
 
 @pytest.mark.parametrize("handler_kwargs,expected", [
@@ -37,3 +40,50 @@ def test_timestamp(logger, handler_kwargs, expected):
         syslog_socket.sendto.assert_called_once_with(expected, address)
         syslog_socket.sendto.reset_mock()
     logger.removeHandler(sh)
+
+
+@pytest.mark.parametrize("created", [
+    946725071.111111,
+    946725071.0,
+    946725071.9999997,
+    946725071.5000005,
+    # Around the DST transitions of 2019 in Europe/Brussels
+    1553994000.25,
+    1553993999.75,
+    1572138000.5,
+    1572137999.5,
+    1572141599.5,
+    1572141600.5,
+])
+@pytest.mark.parametrize("tz", [
+    pytz.utc,
+    pytz.timezone('Europe/Brussels'),
+    pytz.timezone('America/St_Johns'),
+])
+def test_timestamp_formatter(created, tz):
+    formatter = TimestampFormatter(tz)
+    expected = datetime.fromtimestamp(created, tz).isoformat().encode('ascii')
+    # The first call fills the cache, the second one uses it
+    assert formatter.format(created) == expected
+    assert formatter.format(created) == expected
+
+
+def test_timestamp_formatter_reused_within_second():
+    formatter = TimestampFormatter(pytz.utc)
+    with patch.object(formatter, '_format_second', wraps=formatter._format_second) as format_second:
+        formatter.format(946725071.1)
+        formatter.format(946725071.2)
+        formatter.format(946725072.3)
+    assert format_second.call_count == 2
+
+
+def test_timestamp_utc_changed_after_init(logger):
+    sh = Rfc5424SysLogHandler(address=address)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        logger.info(message)
+        sh.utc_timestamp = True
+        logger.info(message)
+        timestamps = [c[0][0].split(b' ')[1] for c in syslog_socket.sendto.call_args_list]
+        assert timestamps == [b'2000-01-01T17:11:11.111111+06:00', b'2000-01-01T11:11:11.111111+00:00']
+    logger.removeHandler(sh)
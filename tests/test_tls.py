@@ -0,0 +1,127 @@
+import socket
+import ssl
+import subprocess
+import threading
+import time
+
+import pytest
+
+from rfc5424logging import Rfc5424SysLogHandler, FRAMING_OCTET_COUNTING
+from rfc5424logging.transport import TLSSocketTransport
+
+
+@pytest.fixture(scope='module')
+def certfile(tmpdir_factory):
+    path = str(tmpdir_factory.mktemp('tls').join('server.pem'))
+    try:
+        subprocess.check_call(
+            ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=localhost',
+             '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1', '-keyout', path, '-out', path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("The openssl command is needed to create a certificate")
+    return path
+
+
+class TLSServer(object):
+    def __init__(self, certfile):
+        self.context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.context.load_cert_chain(certfile)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.address = self.sock.getsockname()
+        self.received = []
+        self.connections = []
+        thread = threading.Thread(target=self._accept)
+        thread.daemon = True
+        thread.start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+                conn = self.context.wrap_socket(conn, server_side=True)
+            except (OSError, ssl.SSLError):
+                if self.sock.fileno() == -1:
+                    return
+                continue
+            self.connections.append(conn)
+            thread = threading.Thread(target=self._read, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def _read(self, conn):
+        while True:
+            try:
+                data = conn.recv(1024)
+            except (OSError, ssl.SSLError):
+                return
+            if not data:
+                return
+            self.received.append(data)
+
+    def close(self):
+        self.sock.close()
+        for conn in self.connections:
+            conn.close()
+
+
+@pytest.fixture
+def server(certfile):
+    server = TLSServer(certfile)
+    yield server
+    server.close()
+
+
+def test_without_verification(server):
+    tls = TLSSocketTransport(server.address, 5, FRAMING_OCTET_COUNTING, None, False, None, None, None)
+    tls.transmit(b'message')
+    tls.close()
+
+
+def test_context_is_reused(server, certfile):
+    tls = TLSSocketTransport(server.address, 5, FRAMING_OCTET_COUNTING, certfile, True, None, None, None)
+    context = tls.context
+    tls.reconnect()
+    assert tls.context is context
+
+    tls.reload_context()
+    assert tls.context is not context
+    assert tls.session is None
+    tls.close()
+
+
+@pytest.mark.skipif(not hasattr(ssl, 'SSLSession'), reason="Needs Python 3.6+")
+def test_session_resumption(server, certfile):
+    tls = TLSSocketTransport(server.address, 5, FRAMING_OCTET_COUNTING, certfile, True, None, None, None)
+    tls.transmit(b'message')
+    # The server sent its session tickets by the time it reads the message
+    deadline = time.time() + 5
+    while not server.received and time.time() < deadline:
+        time.sleep(0.01)
+    tls.reconnect()
+    assert tls.session is not None
+    assert tls.socket.session_reused
+    assert tls.stats()['tls_sessions_reused'] == 1
+    tls.close()
+
+
+def test_handler_reload(server, certfile):
+    sh = Rfc5424SysLogHandler(
+        address=server.address, socktype=socket.SOCK_STREAM, tls_enable=True, tls_ca_bundle=certfile,
+    )
+    context = sh.transport.context
+    sh.tls_verify = False
+    sh.reload_tls_context()
+    assert sh.transport.context is not context
+    assert sh.transport.context.verify_mode == ssl.CERT_NONE
+    sh.close()
+
+
+def test_handler_reload_without_tls():
+    sh = Rfc5424SysLogHandler(address=('127.0.0.1', 514))
+    with pytest.raises(ValueError):
+        sh.reload_tls_context()
+    sh.close()
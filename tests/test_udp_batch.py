@@ -0,0 +1,92 @@
+import errno
+import logging
+import socket
+
+import pytest
+from mock import Mock, patch
+
+from rfc5424logging import Rfc5424SysLogHandler
+from rfc5424logging import transport
+from rfc5424logging.transport import BatchedUDPSocketTransport
+
+
+@pytest.fixture
+def udp_server():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    server.settimeout(2)
+    yield server
+    server.close()
+
+
+def receive(server, count):
+    return [server.recv(1024) for _ in range(count)]
+
+
+@pytest.mark.parametrize("has_sendmmsg", [transport.HAS_SENDMMSG, False])
+def test_batch_count(udp_server, has_sendmmsg):
+    with patch.object(transport, 'HAS_SENDMMSG', has_sendmmsg):
+        udp = BatchedUDPSocketTransport(udp_server.getsockname(), 5, batch_count=3, flush_interval=None)
+        with patch.object(udp, 'send_batch', wraps=udp.send_batch) as send_batch:
+            for i in range(4):
+                udp.transmit(('msg%d' % i).encode('ascii'))
+            assert send_batch.call_count == 1
+            assert receive(udp_server, 3) == [b'msg0', b'msg1', b'msg2']
+            udp.flush()
+            assert send_batch.call_count == 2
+            assert receive(udp_server, 1) == [b'msg3']
+        udp.close()
+
+
+def test_batch_bytes(udp_server):
+    udp = BatchedUDPSocketTransport(udp_server.getsockname(), 5, batch_bytes=10, flush_interval=None)
+    udp.transmit_many([b'123456', b'7890', b'abc'])
+    assert receive(udp_server, 2) == [b'123456', b'7890']
+    udp.close()
+    assert receive(udp_server, 1) == [b'abc']
+
+
+def test_flush_interval(udp_server):
+    udp = BatchedUDPSocketTransport(udp_server.getsockname(), 5, flush_interval=0.01)
+    udp.transmit(b'msg')
+    assert receive(udp_server, 1) == [b'msg']
+    udp.close()
+
+
+def test_handler_udp_batch(udp_server):
+    # Not using the logger fixture, it disables connecting sockets
+    logger = logging.getLogger('test_udp_batch')
+    logger.setLevel(logging.INFO)
+    sh = Rfc5424SysLogHandler(address=udp_server.getsockname(), udp_batch_count=10, flush_interval=None)
+    assert isinstance(sh.transport, BatchedUDPSocketTransport)
+    logger.addHandler(sh)
+    logger.info('first')
+    logger.info('second')
+    sh.flush()
+    assert [msg.split(b'\xef\xbb\xbf')[1] for msg in receive(udp_server, 2)] == [b'first', b'second']
+    logger.removeHandler(sh)
+    sh.close()
+
+
+def test_partial_send_not_repeated(udp_server):
+    udp = BatchedUDPSocketTransport(udp_server.getsockname(), 5, flush_interval=None)
+    udp.transmit_many([b'one', b'two', b'three'])
+    error = OSError(errno.ECONNREFUSED, 'Connection refused')
+    error.sent = 1
+    with patch.object(udp, 'send_batch', side_effect=[error, None]) as send_batch:
+        udp.flush()
+    # Only the datagrams after the one that was sent are tried again
+    assert send_batch.call_args_list[1][0][0] == [b'two', b'three']
+    udp.close()
+
+
+def test_send_batch_counts_sent_datagrams(udp_server):
+    udp = BatchedUDPSocketTransport(udp_server.getsockname(), 5, flush_interval=None)
+    real_socket = udp.socket
+    udp.socket = Mock(**{'send.side_effect': [1, OSError(errno.ENOBUFS, 'No buffer space available')]})
+    with patch.object(transport, 'HAS_SENDMMSG', False):
+        with pytest.raises(OSError) as e:
+            udp.send_batch([b'one', b'two', b'three'])
+    assert e.value.sent == 1
+    udp.socket = real_socket
+    udp.close()
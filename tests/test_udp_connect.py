@@ -0,0 +1,98 @@
+import logging
+import socket
+
+import pytest
+from mock import patch
+
+from rfc5424logging import Rfc5424SysLogHandler
+from rfc5424logging.transport import UDPSocketTransport
+
+
+def udp_server():
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    server.settimeout(2)
+    return server
+
+
+@pytest.fixture
+def server():
+    server = udp_server()
+    yield server
+    server.close()
+
+
+def test_connected_send(server):
+    udp = UDPSocketTransport(server.getsockname(), 5, connect=True)
+    assert udp.socket.getpeername() == server.getsockname()
+    udp.transmit(b'msg')
+    assert server.recv(1024) == b'msg'
+    udp.close()
+
+
+def test_connection_refused_counted():
+    closed = udp_server()
+    address = closed.getsockname()
+    closed.close()
+
+    udp = UDPSocketTransport(address, 5, connect=True)
+    for _ in range(5):
+        udp.transmit(b'msg')
+    assert udp.stats()['connection_refused'] >= 1
+    udp.close()
+
+
+def test_resolve_ttl(server):
+    other_server = udp_server()
+    udp = UDPSocketTransport(('localhost', server.getsockname()[1]), 5, connect=True, resolve_ttl=0)
+    udp.transmit(b'first')
+    assert server.recv(1024) == b'first'
+
+    addrinfo = [(socket.AF_INET, socket.SOCK_DGRAM, 17, '', other_server.getsockname())]
+    with patch('rfc5424logging.transport.socket.getaddrinfo', return_value=addrinfo):
+        udp.transmit(b'second')
+    assert other_server.recv(1024) == b'second'
+    udp.close()
+    other_server.close()
+
+
+@pytest.mark.parametrize("connect", [True, False])
+def test_resolve_other_family(server, connect):
+    try:
+        ipv6_server = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+        ipv6_server.bind(('::1', 0))
+    except (OSError, IOError):
+        pytest.skip("IPv6 is not available")
+    ipv6_server.settimeout(2)
+    udp = UDPSocketTransport(server.getsockname(), 5, connect=connect, resolve_ttl=0)
+
+    addrinfo = [(socket.AF_INET6, socket.SOCK_DGRAM, 17, '', ipv6_server.getsockname())]
+    with patch('rfc5424logging.transport.socket.getaddrinfo', return_value=addrinfo):
+        udp.transmit(b'msg')
+    # The socket was opened again for the other address family
+    assert udp.socket.family == socket.AF_INET6
+    assert ipv6_server.recv(1024) == b'msg'
+    udp.close()
+    ipv6_server.close()
+
+
+def test_resolve_failure_keeps_address(server):
+    udp = UDPSocketTransport(server.getsockname(), 5, resolve_ttl=0)
+    with patch('rfc5424logging.transport.socket.getaddrinfo', side_effect=socket.gaierror):
+        udp.transmit(b'msg')
+    assert server.recv(1024) == b'msg'
+    udp.close()
+
+
+def test_handler_stats(server):
+    # Not using the logger fixture, it disables connecting sockets
+    logger = logging.getLogger('test_udp_connect')
+    sh = Rfc5424SysLogHandler(address=server.getsockname(), udp_connect=True)
+    logger.addHandler(sh)
+    logger.warning('message')
+    assert server.recv(1024).endswith(b'message')
+    stats = sh.stats()
+    assert stats['connection_refused'] == 0
+    assert stats['reconnects'] == 0
+    logger.removeHandler(sh)
+    sh.close()
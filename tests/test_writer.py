@@ -0,0 +1,142 @@
+import logging
+import socket
+import threading
+
+import pytest
+from conftest import address, message
+from mock import patch
+
+from rfc5424logging import (
+    Rfc5424SysLogHandler, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_BELOW_LEVEL
+)
+from rfc5424logging.writer import QueuedWriter
+
+
+class BlockingTransport(object):
+    def __init__(self):
+        self.batches = []
+        self.unblocked = threading.Event()
+        self.started = threading.Event()
+
+    def transmit_many(self, syslog_msgs):
+        self.started.set()
+        self.unblocked.wait(5)
+        self.batches.append(list(syslog_msgs))
+
+    def flush(self):
+        pass
+
+
+def fill(writer, transport):
+    # The first message is taken by the writer thread, which then blocks in the transport
+    writer.put(b'first')
+    assert transport.started.wait(5)
+
+
+def test_queued_handler(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM, queue_size=100)
+    logger.addHandler(sh)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        logger.info(message)
+        logger.info(message)
+        sh.flush()
+        data = b''.join(c[0][0] for c in syslog_socket.sendall.call_args_list)
+        expected = (b'<14>1 2000-01-01T17:11:11.111111+06:00 testhostname root 111'
+                    b' - - \xef\xbb\xbfThis is an interesting message\n')
+        assert data == expected * 2
+    logger.removeHandler(sh)
+    sh.close()
+
+
+def test_tcp_transmit_many_single_write(logger):
+    sh = Rfc5424SysLogHandler(address=address, socktype=socket.SOCK_STREAM)
+    with patch.object(sh.transport, 'socket') as syslog_socket:
+        sh.transport.transmit_many([b'first\nline', b'second'])
+        syslog_socket.sendall.assert_called_once_with(b'first\\nline\nsecond\n')
+
+
+def test_writer_batches():
+    transport = BlockingTransport()
+    writer = QueuedWriter(transport, capacity=10, batch_size=3)
+    fill(writer, transport)
+    for i in range(5):
+        writer.put(str(i).encode('ascii'))
+    transport.unblocked.set()
+    assert writer.flush(5)
+    assert transport.batches == [[b'first'], [b'0', b'1', b'2'], [b'3', b'4']]
+    writer.close()
+
+
+@pytest.mark.parametrize("overflow,levels,expected", [
+    (OVERFLOW_DROP_NEWEST, [logging.INFO] * 3, [b'0', b'1']),
+    (OVERFLOW_DROP_OLDEST, [logging.INFO] * 3, [b'1', b'2']),
+    (OVERFLOW_DROP_BELOW_LEVEL, [logging.INFO, logging.INFO, logging.DEBUG], [b'0', b'1']),
+])
+def test_writer_overflow(overflow, levels, expected):
+    transport = BlockingTransport()
+    writer = QueuedWriter(transport, capacity=2, overflow=overflow, overflow_level=logging.INFO)
+    fill(writer, transport)
+    for i, level in enumerate(levels):
+        writer.put(str(i).encode('ascii'), level)
+    assert writer.dropped == 1
+    transport.unblocked.set()
+    writer.close(5)
+    assert transport.batches == [[b'first'], expected]
+
+
+def test_writer_blocks_when_full():
+    transport = BlockingTransport()
+    writer = QueuedWriter(transport, capacity=1)
+    fill(writer, transport)
+    writer.put(b'0')
+    putter = threading.Thread(target=writer.put, args=(b'1',))
+    putter.start()
+    putter.join(0.1)
+    assert putter.is_alive()
+    transport.unblocked.set()
+    putter.join(5)
+    assert not putter.is_alive()
+    writer.close(5)
+    assert [msg for batch in transport.batches for msg in batch] == [b'first', b'0', b'1']
+
+
+def test_writer_close_drains():
+    transport = BlockingTransport()
+    transport.unblocked.set()
+    writer = QueuedWriter(transport)
+    for i in range(50):
+        writer.put(str(i).encode('ascii'))
+    writer.close()
+    assert len([msg for batch in transport.batches for msg in batch]) == 50
+    with pytest.raises(ValueError):
+        writer.put(b'too late')
+
+
+def test_writer_reports_errors():
+    class FailingTransport(object):
+        def transmit_many(self, syslog_msgs):
+            raise OSError("Connection refused")
+
+        def flush(self):
+            pass
+
+    errors = []
+    writer = QueuedWriter(FailingTransport(), error_handler=lambda: errors.append(1))
+    writer.put(b'0')
+    writer.close(5)
+    assert errors == [1]
+
+
+def test_flush_level():
+    transport = BlockingTransport()
+    flushes = []
+    transport.flush = lambda: flushes.append(len(transport.batches))
+    writer = QueuedWriter(transport, batch_size=1, flush_level=logging.ERROR)
+    fill(writer, transport)
+    writer.put(b'error', logging.ERROR)
+    writer.put(b'info', logging.INFO)
+    transport.unblocked.set()
+    writer.close(5)
+    # Flushed after the batch with the error, although more messages were queued
+    assert transport.batches == [[b'first'], [b'error'], [b'info']]
+    assert flushes == [2, 3]